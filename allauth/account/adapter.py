@@ -4,11 +4,13 @@ import re
 import warnings
 import json
 
+import django
 from django.core.urlresolvers import reverse
 from django.conf import settings
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.template import Context, TemplateDoesNotExist
+from django.dispatch import receiver
 from django.core.mail import EmailMultiAlternatives, EmailMessage
 from django.utils.translation import ugettext_lazy as _
 from django import forms
@@ -19,20 +21,58 @@ try:
 except ImportError:
     from django.utils.encoding import force_unicode as force_text
 
-from ..utils import (import_attribute, get_user_model,
-                     generate_unique_username,
+from ..utils import (get_adapter_instance, get_user_model,
+                     generate_unique_username, generate_random_username,
                      resolve_url, get_current_site,
-                     build_absolute_uri)
+                     build_absolute_uri, setting_changed)
 
 from . import app_settings
+from .outbox import get_outbox
 
 # Don't bother turning this into a setting, as changing this also
 # requires changing the accompanying form error message. So if you
 # need to change any of this, simply override clean_username().
 USERNAME_REGEX = re.compile(r'^[\w.@+-]+$', re.UNICODE)
 
+# Maps template names to compiled templates (or `None` for templates
+# that do not exist), so that rendering mails and messages does not
+# search all template loaders over and over again.
+_template_cache = {}
+
+
+def _get_template(template_name):
+    if settings.DEBUG:
+        # Pick up template changes during development.
+        return get_template(template_name)
+    try:
+        template = _template_cache[template_name]
+    except KeyError:
+        try:
+            template = get_template(template_name)
+        except TemplateDoesNotExist:
+            template = None
+        _template_cache[template_name] = template
+    if template is None:
+        raise TemplateDoesNotExist(template_name)
+    return template
+
+
+def _render_to_string(template_name, context):
+    template = _get_template(template_name)
+    if django.VERSION < (1, 8):
+        context = Context(context)
+    return template.render(context)
+
+
+@receiver(setting_changed)
+def _clear_template_cache(**kwargs):
+    _template_cache.clear()
+
 
 class DefaultAccountAdapter(object):
+    # Adapters are instantiated once per process. Set this to `True` in
+    # adapters that keep request specific state.
+    per_request = False
 
     def stash_verified_email(self, request, email):
         request.session['account_verified_email'] = email
@@ -69,8 +109,9 @@ class DefaultAccountAdapter(object):
         Renders an e-mail to `email`.  `template_prefix` identifies the
         e-mail that is to be sent, e.g. "account/email/email_confirmation"
         """
-        subject = render_to_string('{0}_subject.txt'.format(template_prefix),
-                                   context)
+        subject = _render_to_string(
+            '{0}_subject.txt'.format(template_prefix),
+            context)
         # remove superfluous line breaks
         subject = " ".join(subject.splitlines()).strip()
         subject = self.format_email_subject(subject)
@@ -81,8 +122,8 @@ class DefaultAccountAdapter(object):
         for ext in ['html', 'txt']:
             try:
                 template_name = '{0}_message.{1}'.format(template_prefix, ext)
-                bodies[ext] = render_to_string(template_name,
-                                               context).strip()
+                bodies[ext] = _render_to_string(template_name,
+                                                context).strip()
             except TemplateDoesNotExist:
                 if ext == 'txt' and not bodies:
                     # We need at least one body
@@ -104,7 +145,7 @@ class DefaultAccountAdapter(object):
 
     def send_mail(self, template_prefix, email, context, request):
         msg = self.render_mail(template_prefix, email, context, request)
-        msg.send()
+        get_outbox().enqueue(msg)
 
     def get_login_redirect_url(self, request):
         """
@@ -172,12 +213,15 @@ class DefaultAccountAdapter(object):
         email = user_email(user)
         username = user_username(user)
         if app_settings.USER_MODEL_USERNAME_FIELD:
-            user_username(user,
-                          username
-                          or self.generate_unique_username([first_name,
-                                                            last_name,
-                                                            email,
-                                                            'user']))
+            if not username:
+                txts = [first_name, last_name, email, 'user']
+                try:
+                    username = self.generate_unique_username(txts)
+                except ValueError:
+                    # E.g. the blacklist rejects all candidates. Not a
+                    # reason to fail an (automatic) signup.
+                    username = generate_random_username(txts)
+            user_username(user, username)
 
     def generate_unique_username(self, txts, regex=None):
         return generate_unique_username(txts, regex)
@@ -220,10 +264,8 @@ class DefaultAccountAdapter(object):
             raise forms.ValidationError(_("Usernames can only contain "
                                           "letters, digits and @/./+/-/_."))
 
-        # TODO: Add regexp support to USERNAME_BLACKLIST
-        username_blacklist_lower = [ub.lower()
-                                    for ub in app_settings.USERNAME_BLACKLIST]
-        if username.lower() in username_blacklist_lower:
+        from .utils import is_username_blacklisted
+        if is_username_blacklisted(username):
             raise forms.ValidationError(_("Username can not be used. "
                                           "Please use other username."))
         username_field = app_settings.USER_MODEL_USERNAME_FIELD
@@ -265,8 +307,8 @@ class DefaultAccountAdapter(object):
             try:
                 if message_context is None:
                     message_context = {}
-                message = render_to_string(message_template,
-                                           message_context).strip()
+                message = _render_to_string(message_template,
+                                            message_context).strip()
                 if message:
                     messages.add_message(request, level, message,
                                          extra_tags=extra_tags)
@@ -324,6 +366,13 @@ class DefaultAccountAdapter(object):
         from django.utils.http import is_safe_url
         return is_safe_url(url)
 
+    def get_client_ip(self, request):
+        """
+        The IP address rate limits are scoped by. Override this when
+        running behind a (trusted) reverse proxy.
+        """
+        return request.META.get('REMOTE_ADDR')
+
     def get_email_confirmation_url(self, request, emailconfirmation):
         """Constructs the email confirmation (activation) url.
 
@@ -355,11 +404,20 @@ class DefaultAccountAdapter(object):
             email_template = 'account/email/email_confirmation_signup'
         else:
             email_template = 'account/email/email_confirmation'
-        get_adapter().send_mail(email_template,
-                                emailconfirmation.email_address.email,
-                                ctx,
-                                request)
+        get_adapter(request).send_mail(email_template,
+                                       emailconfirmation.email_address.email,
+                                       ctx,
+                                       request)
+
+
+_adapters = {}
+
+
+@receiver(setting_changed)
+def _clear_adapter_cache(setting, **kwargs):
+    if setting in ('ACCOUNT_ADAPTER', 'ALLAUTH_SETTING_GETTER'):
+        _adapters.clear()
 
 
-def get_adapter():
-    return import_attribute(app_settings.ADAPTER)()
+def get_adapter(request=None):
+    return get_adapter_instance(app_settings.ADAPTER, _adapters, request)
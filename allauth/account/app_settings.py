@@ -1,4 +1,7 @@
-class AppSettings(object):
+from ..app_settings import SettingsSnapshotMixin
+
+
+class AppSettings(SettingsSnapshotMixin):
 
     class AuthenticationMethod:
         USERNAME = 'username'
@@ -17,6 +20,7 @@ class AppSettings(object):
 
     def __init__(self, prefix):
         self.prefix = prefix
+        self._init_snapshot()
         # If login is by email, email must be required
         assert (not self.AUTHENTICATION_METHOD
                 == self.AuthenticationMethod.EMAIL) or self.EMAIL_REQUIRED
@@ -32,13 +36,6 @@ class AppSettings(object):
                 not in (self.AuthenticationMethod.USERNAME,
                         self.AuthenticationMethod.USERNAME_EMAIL)
 
-    def _setting(self, name, dflt):
-        from django.conf import settings
-        getter = getattr(settings,
-                         'ALLAUTH_SETTING_GETTER',
-                         lambda name, dflt: getattr(settings, name, dflt))
-        return getter(self.prefix + name, dflt)
-
     @property
     def DEFAULT_HTTP_PROTOCOL(self):
         return self._setting("DEFAULT_HTTP_PROTOCOL", "http")
@@ -53,6 +50,14 @@ class AppSettings(object):
         return self._setting("EMAIL_CONFIRMATION_EXPIRE_DAYS",
                              getattr(settings, "EMAIL_CONFIRMATION_DAYS", 3))
 
+    @property
+    def EMAIL_CONFIRMATION_HMAC(self):
+        """
+        Use stateless, signed (HMAC) e-mail confirmation keys instead of
+        storing `EmailConfirmation` records
+        """
+        return self._setting("EMAIL_CONFIRMATION_HMAC", False)
+
     @property
     def EMAIL_CONFIRMATION_AUTHENTICATED_REDIRECT_URL(self):
         """
@@ -72,6 +77,14 @@ class AppSettings(object):
         return self._setting("EMAIL_CONFIRMATION_ANONYMOUS_REDIRECT_URL",
                              settings.LOGIN_URL)
 
+    @property
+    def EMAIL_OUTBOX(self):
+        """
+        The outbox used for sending e-mail, see `allauth.account.outbox`
+        """
+        return self._setting("EMAIL_OUTBOX",
+                             "allauth.account.outbox.ImmediateOutbox")
+
     @property
     def EMAIL_REQUIRED(self):
         """
@@ -131,6 +144,29 @@ class AppSettings(object):
         """
         return self._setting("PASSWORD_MIN_LENGTH", 6)
 
+    @property
+    def RATE_LIMITS(self):
+        """
+        Per action rate limits, see `allauth.account.ratelimit`. Actions
+        not mentioned fall back to the defaults, an action mapped to
+        `None` is not limited. None of the defaults are scoped by IP
+        address, as behind a reverse proxy all requests share the
+        proxy's address.
+        """
+        ret = {
+            # Failed login attempts
+            'login_failed': '5/5m/key',
+            # Sending an e-mail confirmation mail (cooldown)
+            'confirm_email': '1/3m/key',
+            # Requesting a password reset mail, per client and address
+            'reset_password': '5/5m/key',
+        }
+        rate_limits = self._setting("RATE_LIMITS", {})
+        if rate_limits is False:
+            return {}
+        ret.update(rate_limits)
+        return ret
+
     @property
     def EMAIL_SUBJECT_PREFIX(self):
         """
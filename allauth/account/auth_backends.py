@@ -1,7 +1,10 @@
+from functools import reduce
+import operator
+
 from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
 
 from ..utils import get_user_model
-from .utils import filter_users_by_email
 
 from .app_settings import AuthenticationMethod
 from . import app_settings
@@ -10,47 +13,75 @@ from . import app_settings
 class AuthenticationBackend(ModelBackend):
 
     def authenticate(self, **credentials):
-        ret = None
-        if app_settings.AUTHENTICATION_METHOD == AuthenticationMethod.EMAIL:
-            ret = self._authenticate_by_email(**credentials)
-        elif app_settings.AUTHENTICATION_METHOD \
-                == AuthenticationMethod.USERNAME_EMAIL:
-            ret = self._authenticate_by_email(**credentials)
-            if not ret:
-                ret = self._authenticate_by_username(**credentials)
-        else:
-            ret = self._authenticate_by_username(**credentials)
-        return ret
+        method = app_settings.AUTHENTICATION_METHOD
+        email = username = None
+        if method in (AuthenticationMethod.EMAIL,
+                      AuthenticationMethod.USERNAME_EMAIL):
+            # Even though allauth will pass along `email`, other apps may
+            # not respect this setting. For example, when using
+            # django-tastypie basic authentication, the login is always
+            # passed as `username`.  So let's place nice with other apps
+            # and use username as fallback
+            email = credentials.get('email', credentials.get('username'))
+        if method in (AuthenticationMethod.USERNAME,
+                      AuthenticationMethod.USERNAME_EMAIL):
+            username = credentials.get('username')
+        return self._authenticate(credentials.get('password'),
+                                  email=email,
+                                  username=username)
 
     def _authenticate_by_username(self, **credentials):
-        username_field = app_settings.USER_MODEL_USERNAME_FIELD
-        username = credentials.get('username')
-        password = credentials.get('password')
+        return self._authenticate(credentials.get('password'),
+                                  username=credentials.get('username'))
 
-        User = get_user_model()
+    def _authenticate_by_email(self, **credentials):
+        email = credentials.get('email', credentials.get('username'))
+        return self._authenticate(credentials.get('password'),
+                                  email=email)
 
-        if not username_field or username is None or password is None:
+    def _authenticate(self, password, email=None, username=None):
+        """
+        Resolves all candidate users matching either `email` or
+        `username` in a single query, and checks the password against
+        each distinct candidate. Candidates found by e-mail address take
+        precedence over those found by username.
+        """
+        if password is None:
             return None
-        try:
-            # Username query is case insensitive
-            query = {username_field+'__iexact': username}
-            user = User.objects.get(**query)
+        candidates = self._get_candidate_users(email=email,
+                                               username=username)
+        if not candidates:
+            # Run the password hasher once to reduce the timing
+            # difference between an existing and a non-existing login.
+            get_user_model()().set_password(password)
+            return None
+        for user in candidates:
             if user.check_password(password):
                 return user
-        except User.DoesNotExist:
-            return None
+        return None
 
-    def _authenticate_by_email(self, **credentials):
-        # Even though allauth will pass along `email`, other apps may
-        # not respect this setting. For example, when using
-        # django-tastypie basic authentication, the login is always
-        # passed as `username`.  So let's place nice with other apps
-        # and use username as fallback
-        User = get_user_model()
+    def _get_candidate_users(self, email=None, username=None):
+        from .models import EmailAddress
 
-        email = credentials.get('email', credentials.get('username'))
+        User = get_user_model()
+        username_field = app_settings.USER_MODEL_USERNAME_FIELD
+        email_field = app_settings.USER_MODEL_EMAIL_FIELD
+        conditions = []
         if email:
-            for user in filter_users_by_email(email):
-                if user.check_password(credentials["password"]):
-                    return user
-        return None
+            conditions.append(Q(pk__in=EmailAddress.objects
+                                .filter(email_lower=email.lower())
+                                .values('user')))
+            if email_field:
+                conditions.append(Q(**{email_field + '__iexact': email}))
+        if username and username_field:
+            # Username query is case insensitive
+            conditions.append(Q(**{username_field + '__iexact': username}))
+        if not conditions:
+            return []
+        # Being a single table query, each user is returned only once.
+        users = list(User.objects.filter(reduce(operator.or_, conditions)))
+        if username and username_field:
+            username = username.lower()
+            users.sort(key=lambda user: (getattr(user, username_field)
+                                         or '').lower() == username)
+        return users
@@ -25,8 +25,7 @@ def verified_email_required(function=None,
         @login_required(redirect_field_name=redirect_field_name,
                         login_url=login_url)
         def _wrapped_view(request, *args, **kwargs):
-            if not EmailAddress.objects.filter(user=request.user,
-                                               verified=True).exists():
+            if not EmailAddress.objects.has_verified_email(request.user):
                 send_email_confirmation(request, request.user)
                 return render(request,
                               'account/verified_email_required.html')
@@ -22,6 +22,7 @@ from .utils import (perform_login, setup_user_email, url_str_to_user_pk,
                     get_user_model)
 from .app_settings import AuthenticationMethod
 from . import app_settings
+from . import ratelimit
 from .adapter import get_adapter
 
 try:
@@ -67,10 +68,14 @@ class LoginForm(forms.Form):
         _("The username and/or password you specified are not correct."),
 
         'username_email_password_mismatch':
-        _("The login and/or password you specified are not correct.")
+        _("The login and/or password you specified are not correct."),
+
+        'too_many_login_attempts':
+        _("Too many failed login attempts. Try again later.")
     }
 
     def __init__(self, *args, **kwargs):
+        self.request = kwargs.pop('request', None)
         super(LoginForm, self).__init__(*args, **kwargs)
         if app_settings.AUTHENTICATION_METHOD == AuthenticationMethod.EMAIL:
             login_widget = forms.TextInput(attrs={'type': 'email',
@@ -128,8 +133,19 @@ class LoginForm(forms.Form):
     def clean(self):
         if self._errors:
             return
+        login = self.cleaned_data['login']
+        # The attempt is counted before authenticating, so that neither
+        # an exhausted budget nor a burst of concurrent attempts gets to
+        # hash more passwords than the budget allows. A successful
+        # attempt is taken off again.
+        if not ratelimit.consume(self.request,
+                                 action='login_failed',
+                                 key=login):
+            raise forms.ValidationError(
+                self.error_messages['too_many_login_attempts'])
         user = authenticate(**self.user_credentials())
         if user:
+            ratelimit.clear(self.request, action='login_failed', key=login)
             self.user = user
         else:
             raise forms.ValidationError(
@@ -401,8 +417,28 @@ class ResetPasswordForm(forms.Form):
         required=True,
         widget=forms.TextInput(attrs={"type": "email", "size": "30"}))
 
+    def __init__(self, *args, **kwargs):
+        self.request = kwargs.pop('request', None)
+        super(ResetPasswordForm, self).__init__(*args, **kwargs)
+
+    def _get_rate_limit_key(self, email):
+        """
+        Reset requests are counted per client and e-mail address, so that
+        requesting resets for someone else's address does not lock them
+        out of resetting their password.
+        """
+        client_ip = None
+        if self.request is not None:
+            client_ip = get_adapter(self.request).get_client_ip(self.request)
+        return '%s/%s' % (client_ip or '', email)
+
     def clean_email(self):
         email = self.cleaned_data["email"]
+        if not ratelimit.consume(self.request,
+                                 action='reset_password',
+                                 key=self._get_rate_limit_key(email)):
+            raise forms.ValidationError(_("Too many password reset requests."
+                                          " Try again later."))
         email = get_adapter().clean_email(email)
         self.users = filter_users_by_email(email)
         if not self.users:
@@ -0,0 +1,40 @@
+from optparse import make_option
+
+import django
+from django.core.management.base import BaseCommand
+
+from allauth.account.models import EmailAddress
+
+
+class Command(BaseCommand):
+    help = ('Populates EmailAddress.email_lower for existing rows, e.g.'
+            ' for rows written by means that bypass EmailAddress.save()')
+
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + (
+            make_option('--batch-size', type='int', default=1000,
+                        dest='batch_size'),)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            dest='batch_size')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(EmailAddress.objects
+                         .filter(pk__gt=last_pk)
+                         .order_by('pk')
+                         .values_list('pk', 'email', 'email_lower')
+                         [:batch_size])
+            if not batch:
+                break
+            for pk, email, email_lower in batch:
+                if email.lower() != email_lower:
+                    EmailAddress.objects.filter(pk=pk).update(
+                        email_lower=email.lower())
+                    updated += 1
+            last_pk = batch[-1][0]
+        self.stdout.write('Updated %d e-mail address(es)\n' % updated)
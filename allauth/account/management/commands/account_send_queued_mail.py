@@ -0,0 +1,48 @@
+from optparse import make_option
+import logging
+import time
+
+import django
+from django.core.management.base import BaseCommand
+
+from allauth.account.outbox import DatabaseOutbox
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Sends the e-mails queued by'
+            ' allauth.account.outbox.DatabaseOutbox')
+
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + (
+            make_option('--batch-size', type='int', default=100,
+                        dest='batch_size'),
+            make_option('--loop', type='int', default=0, dest='loop',
+                        help='Keep draining the queue, sleeping this'
+                        ' many seconds in between'))
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            dest='batch_size')
+        parser.add_argument('--loop', type=int, default=0, dest='loop',
+                            help='Keep draining the queue, sleeping this'
+                            ' many seconds in between')
+
+    def handle(self, *args, **options):
+        outbox = DatabaseOutbox()
+        while True:
+            try:
+                count = outbox.drain(batch_size=options['batch_size'])
+            except Exception:
+                if not options['loop']:
+                    raise
+                # E.g. the database went away, try again next round
+                logger.exception('Error draining the e-mail queue')
+            else:
+                if int(options['verbosity']) > 1:
+                    self.stdout.write('Sent %d e-mail(s)\n' % count)
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
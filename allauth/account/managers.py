@@ -1,18 +1,108 @@
 from datetime import timedelta
 
+from django.core.cache import cache
 from django.utils import timezone
 from django.db import models
 from django.db.models import Q
 
 from . import app_settings
 
+# Saving and deleting addresses updates the cached state, but queryset
+# updates (and raw SQL) bypass that, so do not trust it for long.
+VERIFIED_CACHE_TIMEOUT = 60
 
-class EmailAddressManager(models.Manager):
+
+class UserCacheManagerMixin(object):
+    """
+    Maintains an identity map of all records belonging to a user on the
+    user instance itself. Given that `request.user` lives exactly as
+    long as the request does, this effectively is a request scoped
+    cache: the records of a user are loaded from the database at most
+    once, after which lookups are served from memory. Saving and
+    deleting records keeps the map up to date (see `cache_instance()`
+    and `uncache_instance()`).
+    """
+    user_cache_attr = None
+
+    def all_for_user(self, user):
+        instances = getattr(user, self.user_cache_attr, None)
+        if instances is None:
+            if user.pk is None:
+                return []
+            instances = list(self.filter(user=user))
+            for instance in instances:
+                # Avoid additional lookups when e.g.
+                # EmailAddress.set_as_primary() starts touching self.user
+                instance.user = user
+            setattr(user, self.user_cache_attr, instances)
+        return instances
+
+    def prefetch_for_users(self, users, fields=None):
+        """
+        Loads the records of all of the given users by means of a single
+        query, and caches them on the user instances, so that
+        `all_for_user()` no longer needs to hit the database. Pass
+        `fields` to load only those fields (and `user`). Returns the users
+        as a list, which (contrary to a queryset) can be iterated over
+        without fetching fresh user instances.
+        """
+        users = list(users)
+        pending = {}
+        for user in users:
+            if (user.pk is not None
+                    and getattr(user, self.user_cache_attr, None) is None):
+                pending.setdefault(user.pk, []).append(user)
+        if pending:
+            instances = dict((pk, []) for pk in pending)
+            qs = self.filter(user__in=list(pending))
+            if fields:
+                qs = qs.only('user', *fields)
+            for instance in qs:
+                instance.user = pending[instance.user_id][0]
+                instances[instance.user_id].append(instance)
+            for pk, pk_users in pending.items():
+                for user in pk_users:
+                    setattr(user, self.user_cache_attr, instances[pk])
+        return users
+
+    def clear_cache_for_user(self, user):
+        if getattr(user, self.user_cache_attr, None) is not None:
+            delattr(user, self.user_cache_attr)
+
+    def _get_cached_instances(self, instance):
+        # Only consider the user instance the record already points to,
+        # fetching the user here would defeat the purpose.
+        cache_name = self.model._meta.get_field('user').get_cache_name()
+        user = getattr(instance, cache_name, None)
+        return getattr(user, self.user_cache_attr, None)
+
+    def cache_instance(self, instance):
+        instances = self._get_cached_instances(instance)
+        if instances is None:
+            return
+        for i, cached in enumerate(instances):
+            if cached.pk == instance.pk:
+                instances[i] = instance
+                break
+        else:
+            instances.append(instance)
+
+    def uncache_instance(self, instance, pk):
+        instances = self._get_cached_instances(instance)
+        if instances is not None:
+            # Note that Django resets the pk of deleted instances.
+            instances[:] = [cached for cached in instances
+                            if cached is not instance and cached.pk != pk]
+
+
+class EmailAddressManager(UserCacheManagerMixin, models.Manager):
+
+    user_cache_attr = '_emailaddress_cache'
 
     def add_email(self, request, user, email,
                   confirm=False, signup=False):
         try:
-            email_address = self.get(user=user, email__iexact=email)
+            email_address = self.get_for_user(user, email)
         except self.model.DoesNotExist:
             email_address = self.create(user=user, email=email)
             if confirm:
@@ -21,16 +111,47 @@ class EmailAddressManager(models.Manager):
         return email_address
 
     def get_primary(self, user):
-        try:
-            return self.get(user=user, primary=True)
-        except self.model.DoesNotExist:
-            return None
+        for address in self.all_for_user(user):
+            if address.primary:
+                return address
+        return None
+
+    def has_verified_email(self, user):
+        """
+        Whether or not `user` has at least one verified e-mail address.
+        Unless the addresses of the user are already loaded, this state
+        is served from the cache, which is kept up to date whenever an
+        address is saved or deleted (see `update_verified_cache()`), and
+        expires after `VERIFIED_CACHE_TIMEOUT` seconds.
+        """
+        if (getattr(user, self.user_cache_attr, None) is not None
+                or user.pk is None):
+            return any(address.verified
+                       for address in self.all_for_user(user))
+        cache_key = self._verified_cache_key(user.pk)
+        ret = cache.get(cache_key)
+        if ret is None:
+            ret = self.filter(user=user, verified=True).exists()
+            cache.set(cache_key, ret, VERIFIED_CACHE_TIMEOUT)
+        return ret
+
+    def update_verified_cache(self, address, deleted=False):
+        cache_key = self._verified_cache_key(address.user_id)
+        if address.verified and not deleted:
+            cache.set(cache_key, True, VERIFIED_CACHE_TIMEOUT)
+        else:
+            # Other addresses of the user may still be verified
+            cache.delete(cache_key)
+
+    def _verified_cache_key(self, user_pk):
+        return 'allauth.account.has_verified_email.%s' % user_pk
 
     def get_users_for(self, email):
         # this is a list rather than a generator because we probably want to
         # do a len() on it right away
-        return [address.user for address in self.filter(verified=True,
-                                                        email__iexact=email)]
+        return [address.user
+                for address in self.filter(verified=True,
+                                           email_lower=email.lower())]
 
     def fill_cache_for_user(self, user, addresses):
         """
@@ -39,23 +160,14 @@ class EmailAddressManager(models.Manager):
         records. Therefore, we maintain a cache for the user so that
         we can avoid database access when we need to re-read..
         """
-        user._emailaddress_cache = addresses
+        setattr(user, self.user_cache_attr, addresses)
 
     def get_for_user(self, user, email):
-        cache_key = '_emailaddress_cache'
-        addresses = getattr(user, cache_key, None)
-        if addresses is None:
-            ret = self.get(user=user,
-                           email__iexact=email)
-            # To avoid additional lookups when e.g.
-            # EmailAddress.set_as_primary() starts touching self.user
-            ret.user = user
-            return ret
-        else:
-            for address in addresses:
-                if address.email.lower() == email.lower():
-                    return address
-            raise self.model.DoesNotExist()
+        email = email.lower()
+        for address in self.all_for_user(user):
+            if address.email.lower() == email:
+                return address
+        raise self.model.DoesNotExist()
 
 
 class EmailConfirmationManager(models.Manager):
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def populate_email_lower(apps, schema_editor):
+    # Lowercasing is done in Python (not SQL `LOWER()`) so that the
+    # stored value matches `email.lower()` as used by the lookups,
+    # also for non-ASCII addresses.
+    EmailAddress = apps.get_model('account', 'EmailAddress')
+    last_pk = 0
+    while True:
+        batch = list(EmailAddress.objects
+                     .filter(pk__gt=last_pk)
+                     .order_by('pk')
+                     .values_list('pk', 'email', 'email_lower')[:BATCH_SIZE])
+        if not batch:
+            break
+        for pk, email, email_lower in batch:
+            if email.lower() != email_lower:
+                EmailAddress.objects.filter(pk=pk).update(
+                    email_lower=email.lower())
+        last_pk = batch[-1][0]
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_emailaddress_email_lower'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_email_lower, noop),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_populate_email_lower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEmail',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True,
+                                        serialize=False, auto_created=True)),
+                ('created', models.DateTimeField(
+                    verbose_name='created',
+                    default=django.utils.timezone.now)),
+                ('data', models.TextField(verbose_name='data')),
+            ],
+            options={
+                'verbose_name': 'queued email',
+                'verbose_name_plural': 'queued emails',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_queuedemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedemail',
+            name='attempts',
+            field=models.PositiveIntegerField(verbose_name='attempts',
+                                              default=0),
+        ),
+        migrations.AddField(
+            model_name='queuedemail',
+            name='claimed',
+            field=models.DateTimeField(verbose_name='claimed', null=True,
+                                       blank=True),
+        ),
+    ]
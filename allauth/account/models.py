@@ -2,8 +2,11 @@ from __future__ import unicode_literals
 
 import datetime
 
+from django.core import signing
 from django.db import models
 from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
@@ -26,6 +29,14 @@ class EmailAddress(models.Model):
     email = models.EmailField(unique=app_settings.UNIQUE_EMAIL,
                               max_length=254,
                               verbose_name=_('e-mail address'))
+    # Lowercased copy of `email`, kept in sync on save(). Case
+    # insensitive lookups go through this (indexed) column instead of
+    # `email__iexact`, which cannot make use of an index on most
+    # databases.
+    email_lower = models.CharField(max_length=254,
+                                   db_index=True,
+                                   editable=False,
+                                   default='')
     verified = models.BooleanField(verbose_name=_('verified'), default=False)
     primary = models.BooleanField(verbose_name=_('primary'), default=False)
 
@@ -40,6 +51,19 @@ class EmailAddress(models.Model):
     def __str__(self):
         return "%s (%s)" % (self.email, self.user)
 
+    def save(self, *args, **kwargs):
+        self.email_lower = (self.email or '').lower()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(['email_lower'])
+        super(EmailAddress, self).save(*args, **kwargs)
+        EmailAddress.objects.cache_instance(self)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        super(EmailAddress, self).delete(*args, **kwargs)
+        EmailAddress.objects.uncache_instance(self, pk)
+
     def set_as_primary(self, conditional=False):
         old_primary = EmailAddress.objects.get_primary(self.user)
         if old_primary:
@@ -54,7 +78,10 @@ class EmailAddress(models.Model):
         return True
 
     def send_confirmation(self, request=None, signup=False):
-        confirmation = EmailConfirmation.create(self)
+        if app_settings.EMAIL_CONFIRMATION_HMAC:
+            confirmation = EmailConfirmationHMAC(self)
+        else:
+            confirmation = EmailConfirmation.create(self)
         confirmation.send(request, signup=signup)
         return confirmation
 
@@ -77,8 +104,34 @@ class EmailAddress(models.Model):
                 self.send_confirmation(request)
 
 
+@receiver(post_save, sender=EmailAddress)
+@receiver(post_delete, sender=EmailAddress)
+def _update_verified_cache(sender, instance, signal, **kwargs):
+    # Signal receivers, contrary to save() and delete(), also cover
+    # cascading and queryset deletes.
+    EmailAddress.objects.update_verified_cache(
+        instance, deleted=signal is post_delete)
+
+
+class EmailConfirmationMixin(object):
+
+    def confirm(self, request):
+        if not self.key_expired() and not self.email_address.verified:
+            email_address = self.email_address
+            get_adapter(request).confirm_email(request, email_address)
+            signals.email_confirmed.send(sender=self.__class__,
+                                         request=request,
+                                         email_address=email_address)
+            return email_address
+
+    def send(self, request=None, signup=False):
+        get_adapter(request).send_confirmation_mail(request, self, signup)
+        signals.email_confirmation_sent.send(sender=self.__class__,
+                                             confirmation=self)
+
+
 @python_2_unicode_compatible
-class EmailConfirmation(models.Model):
+class EmailConfirmation(EmailConfirmationMixin, models.Model):
 
     email_address = models.ForeignKey(EmailAddress,
                                       verbose_name=_('e-mail address'))
@@ -109,18 +162,71 @@ class EmailConfirmation(models.Model):
         return expiration_date <= timezone.now()
     key_expired.boolean = True
 
-    def confirm(self, request):
-        if not self.key_expired() and not self.email_address.verified:
-            email_address = self.email_address
-            get_adapter().confirm_email(request, email_address)
-            signals.email_confirmed.send(sender=self.__class__,
-                                         request=request,
-                                         email_address=email_address)
-            return email_address
-
     def send(self, request=None, signup=False):
-        get_adapter().send_confirmation_mail(request, self, signup)
+        get_adapter(request).send_confirmation_mail(request, self, signup)
         self.sent = timezone.now()
         self.save()
         signals.email_confirmation_sent.send(sender=self.__class__,
                                              confirmation=self)
+
+
+class EmailConfirmationHMAC(EmailConfirmationMixin):
+    """
+    Stateless alternative to `EmailConfirmation` (see
+    `ACCOUNT_EMAIL_CONFIRMATION_HMAC`): the key is a signed, timestamped
+    token of the e-mail address (pk and address), so that nothing needs
+    to be stored when sending, and confirming only requires checking the
+    signature and fetching the e-mail address by primary key.
+    """
+    salt = 'allauth.account.EmailConfirmationHMAC'
+
+    def __init__(self, email_address):
+        self.email_address = email_address
+
+    @property
+    def key(self):
+        return signing.dumps(obj=[self.email_address.pk,
+                                  self.email_address.email.lower()],
+                             salt=self.salt)
+
+    @classmethod
+    def from_key(cls, key):
+        try:
+            max_age = (60 * 60 * 24
+                       * app_settings.EMAIL_CONFIRMATION_EXPIRE_DAYS)
+            pk, email = signing.loads(key,
+                                      max_age=max_age,
+                                      salt=cls.salt)
+            email_address = EmailAddress.objects \
+                .select_related('user').get(pk=pk)
+        except (signing.SignatureExpired,
+                signing.BadSignature,
+                ValueError,
+                EmailAddress.DoesNotExist):
+            return None
+        if email_address.email.lower() != email:
+            # The address changed after the key was sent
+            return None
+        return cls(email_address)
+
+    def key_expired(self):
+        # Expired keys do not make it past `from_key()`
+        return False
+
+
+class QueuedEmail(models.Model):
+    """
+    An e-mail waiting to be sent, see `allauth.account.outbox.DatabaseOutbox`.
+    """
+    created = models.DateTimeField(verbose_name=_('created'),
+                                   default=timezone.now)
+    data = models.TextField(verbose_name=_('data'))
+    attempts = models.PositiveIntegerField(verbose_name=_('attempts'),
+                                           default=0)
+    claimed = models.DateTimeField(verbose_name=_('claimed'),
+                                   null=True,
+                                   blank=True)
+
+    class Meta:
+        verbose_name = _("queued email")
+        verbose_name_plural = _("queued emails")
@@ -0,0 +1,326 @@
+"""
+Outboxes decouple rendering an e-mail (which happens during the
+request) from actually delivering it. The outbox in use is configured
+by means of `ACCOUNT_EMAIL_OUTBOX`:
+
+- `ImmediateOutbox` (default): sends the mail right away, within the
+  request, as allauth always did.
+
+- `ThreadPoolOutbox`: hands the mail over to a pool of background
+  threads once the current transaction commits (Django 1.9+). The
+  threads deliver the mails in batches, reusing a single connection
+  per batch. Mails still queued when the process exits are sent
+  before exiting.
+
+- `DatabaseOutbox`: stores the mail in a queue table, as part of the
+  current transaction, so that a rolled back signup never sends a
+  mail. The queue is drained by the `account_send_queued_mail`
+  management command. Mails that keep failing are given up on after
+  `max_attempts` attempts.
+"""
+import atexit
+from datetime import timedelta
+import json
+import logging
+import threading
+import time
+
+from django.core import mail
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.six.moves import queue
+
+from ..utils import import_attribute
+
+from . import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def _on_commit(func):
+    # `transaction.on_commit` is only available as of Django 1.9. On
+    # older versions, there is no way to defer until after commit: `func`
+    # only runs after the fact when in autocommit mode.
+    on_commit = getattr(transaction, 'on_commit', None)
+    if on_commit:
+        on_commit(func)
+    else:
+        if transaction.get_connection().in_atomic_block:
+            logger.warning('Cannot defer sending e-mail until the'
+                           ' transaction commits, Django 1.9 or later'
+                           ' is required for that')
+        func()
+
+
+def send_messages(messages):
+    """
+    Sends the given messages over a single connection. Failure to send
+    one message does not prevent the others from being sent. Returns the
+    list of messages that were sent successfully.
+    """
+    sent = []
+    connection = mail.get_connection()
+    try:
+        connection.open()
+    except Exception:
+        logger.exception('Error connecting to the mail server')
+        return sent
+    try:
+        for message in messages:
+            message.connection = connection
+            try:
+                message.send()
+                sent.append(message)
+            except Exception:
+                logger.exception('Error sending e-mail to %s',
+                                 ', '.join(message.to))
+    finally:
+        connection.close()
+    return sent
+
+
+class BaseOutbox(object):
+
+    def enqueue(self, message):
+        raise NotImplementedError()
+
+
+class ImmediateOutbox(BaseOutbox):
+
+    def enqueue(self, message):
+        message.send()
+
+
+class ThreadPoolOutbox(BaseOutbox):
+    workers = 2
+    batch_size = 50
+    # Seconds to wait for the queued messages to be sent on exit
+    shutdown_timeout = 30
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads = []
+        atexit.register(self.stop)
+
+    def enqueue(self, message):
+        _on_commit(lambda: self.put(message))
+
+    def put(self, message):
+        self.start()
+        self.queue.put(message)
+
+    def start(self):
+        """
+        Starts the worker threads, replacing any that died.
+        """
+        with self.lock:
+            self.threads = [thread for thread in self.threads
+                            if thread.is_alive()]
+            for i in range(len(self.threads), self.workers):
+                thread = threading.Thread(target=self.run,
+                                          name='allauth-outbox-%d' % i)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+
+    def join(self):
+        """
+        Blocks until all messages queued so far are sent.
+        """
+        self.queue.join()
+
+    def stop(self, timeout=None):
+        """
+        Lets the worker threads exit once the messages queued so far are
+        sent, waiting at most `timeout` seconds for that (the worker
+        threads are daemons, so as not to block the process from exiting
+        on a mail server that hangs).
+        """
+        if timeout is None:
+            timeout = self.shutdown_timeout
+        with self.lock:
+            threads = self.threads
+            self.threads = []
+            for thread in threads:
+                # Tells one worker to exit
+                self.queue.put(None)
+        deadline = time.time() + timeout
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+
+    def run(self):
+        stop = False
+        while not stop:
+            messages = [self.queue.get()]
+            while len(messages) < self.batch_size:
+                try:
+                    messages.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in messages:
+                # Exit after sending the messages queued before the exit
+                # request. Those queued after it are put back, for the
+                # remaining workers.
+                stop = True
+                index = messages.index(None)
+                for message in messages[index + 1:]:
+                    self.queue.put(message)
+                    self.queue.task_done()
+                messages = messages[:index]
+                self.queue.task_done()
+                if not messages:
+                    break
+            try:
+                send_messages(messages)
+            except Exception:
+                # Keep the worker alive for the messages that follow.
+                logger.exception('Error sending e-mail to %s',
+                                 ', '.join(address
+                                           for message in messages
+                                           for address in message.to))
+            finally:
+                for message in messages:
+                    self.queue.task_done()
+
+
+class DatabaseOutbox(BaseOutbox):
+    # Number of attempts after which a message is given up on
+    max_attempts = 5
+    # Seconds after which a message claimed by a (presumably crashed)
+    # drain is up for grabs again
+    claim_timeout = 600
+
+    def enqueue(self, message):
+        from .models import QueuedEmail
+
+        QueuedEmail.objects.create(data=json.dumps(
+            self.serialize_message(message)))
+
+    def drain(self, batch_size=100):
+        """
+        Sends all queued messages, `batch_size` messages (and connections)
+        at a time. Messages that could not be sent remain queued, until
+        `max_attempts` attempts have been made. Returns the number of
+        messages sent.
+        """
+        count = 0
+        last_pk = 0
+        while True:
+            batch = self.claim(last_pk, batch_size)
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            messages = []
+            broken = []
+            for queued in batch:
+                try:
+                    message = self.deserialize_message(json.loads(queued.data))
+                except Exception:
+                    logger.exception('Error loading queued e-mail %s',
+                                     queued.pk)
+                    broken.append(queued)
+                else:
+                    messages.append((queued, message))
+            sent = send_messages([message for queued, message in messages])
+            self.release(batch,
+                         [queued for queued, message in messages
+                          if message in sent],
+                         broken)
+            count += len(sent)
+        return count
+
+    def claim(self, last_pk, batch_size):
+        """
+        Claims the next batch of messages to be sent. The row locks are
+        only held while claiming, not while sending.
+        """
+        from .models import QueuedEmail
+
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                QueuedEmail.objects
+                .select_for_update()
+                .filter(pk__gt=last_pk,
+                        attempts__lt=self.max_attempts)
+                .exclude(claimed__gt=now - timedelta(
+                    seconds=self.claim_timeout))
+                .order_by('pk')[:batch_size])
+            QueuedEmail.objects.filter(
+                pk__in=[queued.pk for queued in batch]).update(
+                    claimed=now,
+                    attempts=models.F('attempts') + 1)
+        return batch
+
+    def release(self, batch, sent, broken=()):
+        """
+        Deletes the messages that were sent, and makes the others
+        available to be retried. Messages that could not be loaded
+        (`broken`) are given up on right away, as retrying them is
+        pointless. Messages given up on remain queued (with `attempts`
+        at `max_attempts`) for inspection.
+        """
+        from .models import QueuedEmail
+
+        sent_pks = set(queued.pk for queued in sent)
+        broken_pks = set(queued.pk for queued in broken)
+        QueuedEmail.objects.filter(pk__in=sent_pks).delete()
+        QueuedEmail.objects.filter(pk__in=broken_pks).update(
+            claimed=None,
+            attempts=self.max_attempts)
+        QueuedEmail.objects.filter(
+            pk__in=[queued.pk for queued in batch
+                    if queued.pk not in sent_pks
+                    and queued.pk not in broken_pks]).update(claimed=None)
+        for queued in batch:
+            if queued.pk in broken_pks:
+                logger.error('Giving up on queued e-mail %s, which could'
+                             ' not be loaded', queued.pk)
+            elif (queued.pk not in sent_pks
+                    and queued.attempts + 1 >= self.max_attempts):
+                logger.error('Giving up on queued e-mail %s after %d'
+                             ' attempts', queued.pk, self.max_attempts)
+
+    def serialize_message(self, message):
+        return {
+            'subject': message.subject,
+            'body': message.body,
+            'from_email': message.from_email,
+            'to': message.to,
+            'cc': message.cc,
+            'bcc': message.bcc,
+            'headers': message.extra_headers,
+            'alternatives': getattr(message, 'alternatives', []),
+            'content_subtype': message.content_subtype,
+        }
+
+    def deserialize_message(self, data):
+        message = mail.EmailMultiAlternatives(
+            subject=data['subject'],
+            body=data['body'],
+            from_email=data['from_email'],
+            to=data['to'],
+            cc=data['cc'],
+            bcc=data['bcc'],
+            headers=data['headers'],
+            alternatives=[tuple(alternative)
+                          for alternative in data['alternatives']])
+        message.content_subtype = data['content_subtype']
+        return message
+
+
+_outboxes = {}
+
+
+def get_outbox():
+    """
+    Returns the (per process) outbox instance configured by means of
+    `ACCOUNT_EMAIL_OUTBOX`.
+    """
+    path = app_settings.EMAIL_OUTBOX
+    outbox = _outboxes.get(path)
+    if outbox is None:
+        outbox = _outboxes.setdefault(path, import_attribute(path)())
+    return outbox
@@ -0,0 +1,122 @@
+"""
+Cache backed rate limiting of actions that are expensive (hashing a
+password) or that send mail. The budgets are configured by means of
+`ACCOUNT_RATE_LIMITS`, mapping an action to a comma separated list of
+rates, each of the form `<amount>/<period>/<scope>`, e.g.
+`"10/m/ip,5/5m/key"`:
+
+- `amount`: the number of hits allowed within the period.
+
+- `period`: the length of the (fixed) window, an optional number
+  followed by a unit: `s`, `m`, `h` or `d`.
+
+- `scope`: what the hits are counted against: `ip` (the client IP
+  address, see `DefaultAccountAdapter.get_client_ip`) or `key` (the
+  login or e-mail address the action is about).
+
+Hits are counted by means of `cache.add()` and `cache.incr()`, so that
+concurrent requests cannot all slip through. The window a hit falls in
+is part of the cache key.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.encoding import force_bytes
+
+from . import app_settings
+from .adapter import get_adapter
+
+
+PERIOD_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+_parsed_rates = {}
+
+
+def parse_rates(spec):
+    """
+    Parses a rate specification (e.g. `"10/m/ip,5/5m/key"`) into a list
+    of `(amount, period_in_seconds, scope)` tuples.
+    """
+    rates = _parsed_rates.get(spec)
+    if rates is None:
+        rates = []
+        for rate in (spec or '').split(','):
+            rate = rate.strip()
+            if not rate:
+                continue
+            amount, period, scope = rate.split('/')
+            unit = PERIOD_UNITS[period[-1]]
+            period = int(period[:-1] or 1) * unit
+            if scope not in ('ip', 'key'):
+                raise ValueError('Invalid rate limit scope: %s' % scope)
+            rates.append((int(amount), period, scope))
+        _parsed_rates[spec] = rates
+    return rates
+
+
+def _cache_key(action, scope, value, period, now):
+    value = hashlib.sha256(force_bytes(value.lower())).hexdigest()
+    return 'allauth.account.ratelimit.%s.%s.%s.%d' % (
+        action, scope, value, now // period)
+
+
+def _get_cache_keys(request, action, key, now):
+    ret = []
+    for amount, period, scope in parse_rates(
+            app_settings.RATE_LIMITS.get(action)):
+        if scope == 'ip':
+            value = None
+            if request is not None:
+                value = get_adapter(request).get_client_ip(request)
+        else:
+            value = key
+        if value:
+            ret.append((_cache_key(action, scope, value, period, now),
+                        amount,
+                        period,
+                        scope))
+    return ret
+
+
+def consume(request, action, key=None, dry_run=False):
+    """
+    Registers a hit for `action`, unless that would exceed any of the
+    budgets configured for it. Returns whether or not the action is
+    allowed to proceed. Pass `dry_run=True` to merely check whether a
+    hit would be allowed, without registering it.
+    """
+    cache_keys = _get_cache_keys(request, action, key, time.time())
+    if dry_run:
+        return all(cache.get(cache_key, 0) < amount
+                   for cache_key, amount, period, scope in cache_keys)
+    allowed = True
+    for cache_key, amount, period, scope in cache_keys:
+        cache.add(cache_key, 0, period)
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # Expired in between
+            cache.set(cache_key, 1, period)
+            count = 1
+        if count > amount:
+            allowed = False
+    return allowed
+
+
+def clear(request, action, key=None):
+    """
+    Resets the budgets for `action` that are scoped by `key`, e.g. once
+    a user managed to login successfully, and takes the hit registered
+    for the current request off the budgets scoped by IP address.
+    """
+    for cache_key, amount, period, scope in _get_cache_keys(
+            request, action, key, time.time()):
+        if scope == 'key':
+            cache.delete(cache_key)
+        else:
+            try:
+                cache.decr(cache_key)
+            except ValueError:
+                # Expired in between
+                pass
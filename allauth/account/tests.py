@@ -1,31 +1,43 @@
 from __future__ import absolute_import
 import json
-
+import re
 from datetime import timedelta
 
-from django.utils.timezone import now
 from django.test.utils import override_settings
 from django.test import TestCase
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.test.client import Client
 from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test.client import RequestFactory
 from django.contrib.auth.models import AnonymousUser, AbstractUser
 from django.db import models
+from django.template.loader import get_template
+from django.utils.six import StringIO
+from django.utils import timezone
 
 import unittest
 
 from allauth.account.forms import BaseSignupForm
-from allauth.account.models import EmailAddress, EmailConfirmation
+from allauth.account.models import (EmailAddress, EmailConfirmation,
+                                    EmailConfirmationHMAC, QueuedEmail)
+from allauth.account.outbox import (get_outbox, DatabaseOutbox,
+                                    ThreadPoolOutbox)
 from allauth.socialaccount.models import get_social_app_model
-from allauth.utils import get_user_model, get_current_site
+from allauth.utils import (get_user_model, get_current_site,
+                           email_address_exists, generate_unique_username)
 
 from . import app_settings
 
 from .auth_backends import AuthenticationBackend
+from . import utils as account_utils
+from . import adapter
+from . import ratelimit
 from .adapter import get_adapter
-from .utils import url_str_to_user_pk, user_pk_to_url_str
+from .utils import (url_str_to_user_pk, user_pk_to_url_str,
+                    filter_users_by_email)
 
 import uuid
 import mock
@@ -42,6 +54,7 @@ import mock
     ACCOUNT_USERNAME_REQUIRED=True)
 class AccountTests(TestCase):
     def setUp(self):
+        cache.clear()
         if 'allauth.socialaccount' in settings.INSTALLED_APPS:
             # Otherwise ImproperlyConfigured exceptions may occur
             SocialApp = get_social_app_model()
@@ -303,8 +316,9 @@ class AccountTests(TestCase):
                     email_address__email='john@doe.com').count(),
                 attempt)
             # Wait for cooldown
-            EmailConfirmation.objects.update(sent=now()
+            EmailConfirmation.objects.update(sent=timezone.now()
                                              - timedelta(days=1))
+            cache.clear()
         # Verify, and re-attempt to login.
         confirmation = EmailConfirmation \
             .objects \
@@ -321,6 +335,40 @@ class AccountTests(TestCase):
         self.assertEqual(resp['location'],
                          'http://testserver'+settings.LOGIN_REDIRECT_URL)
 
+    @override_settings(ACCOUNT_EMAIL_CONFIRMATION_HMAC=True)
+    def test_email_confirmation_hmac(self):
+        user = get_user_model().objects.create(username='john')
+        email = EmailAddress.objects.create(user=user,
+                                            email='John@Doe.com',
+                                            verified=False,
+                                            primary=True)
+        confirmation = email.send_confirmation()
+        self.assertTrue(isinstance(confirmation, EmailConfirmationHMAC))
+        self.assertFalse(EmailConfirmation.objects.exists())
+        self.assertTrue(confirmation.key in mail.outbox[0].body)
+        c = Client()
+        resp = c.get(reverse('account_confirm_email',
+                             args=[confirmation.key]))
+        self.assertTemplateUsed(resp, 'account/email_confirm.html')
+        c.post(reverse('account_confirm_email',
+                       args=[confirmation.key]))
+        self.assertTrue(EmailAddress.objects.get(pk=email.pk).verified)
+
+    def test_email_confirmation_hmac_invalid(self):
+        user = get_user_model().objects.create(username='john')
+        email = EmailAddress.objects.create(user=user,
+                                            email='john@doe.com')
+        key = EmailConfirmationHMAC(email).key
+        self.assertEqual(EmailConfirmationHMAC.from_key(key).email_address,
+                         email)
+        self.assertEqual(EmailConfirmationHMAC.from_key(key[:-1]), None)
+        with override_settings(ACCOUNT_EMAIL_CONFIRMATION_EXPIRE_DAYS=0):
+            self.assertEqual(EmailConfirmationHMAC.from_key(key), None)
+        # Changing the address invalidates outstanding keys
+        email.email = 'john@example.com'
+        email.save()
+        self.assertEqual(EmailConfirmationHMAC.from_key(key), None)
+
     def test_email_escaping(self):
         site = get_current_site()
         site.name = '<enc&"test>'
@@ -481,7 +529,7 @@ class AccountTests(TestCase):
         # Logout & login again
         c.logout()
         # Wait for cooldown
-        EmailConfirmation.objects.update(sent=now() - timedelta(days=1))
+        cache.clear()
         # Signup
         resp = c.post(reverse('account_login'),
                       {'login': 'johndoe',
@@ -499,6 +547,7 @@ class AccountTests(TestCase):
 class EmailFormTests(TestCase):
 
     def setUp(self):
+        cache.clear()
         User = get_user_model()
         self.user = User.objects.create(username='john',
                                         email='john1@doe.org')
@@ -621,6 +670,384 @@ class EmailFormTests(TestCase):
         self.assertTemplateUsed(
             resp,
             'account/messages/email_confirmation_sent.txt')
+        resp = self.client.post(
+            reverse('account_email'),
+            {'action_send': '',
+             'email': self.email_address2.email})
+        self.assertTemplateNotUsed(
+            resp,
+            'account/messages/email_confirmation_sent.txt')
+        self.assertTemplateUsed(
+            resp,
+            'account/messages/email_confirmation_throttled.txt')
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class EmailAddressCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='john')
+        self.email_address = EmailAddress.objects.create(
+            user=self.user,
+            email='john@doe.com',
+            primary=True,
+            verified=True)
+
+    def test_lookups_served_from_memory(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(EmailAddress.objects.get_primary(user),
+                             self.email_address)
+            self.assertTrue(EmailAddress.objects.has_verified_email(user))
+            self.assertEqual(
+                EmailAddress.objects.get_for_user(user, 'JOHN@doe.com'),
+                self.email_address)
+            self.assertRaises(EmailAddress.DoesNotExist,
+                              EmailAddress.objects.get_for_user,
+                              user,
+                              'john@example.com')
+
+    def test_cache_kept_consistent_on_write(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        EmailAddress.objects.all_for_user(user)
+        other = EmailAddress.objects.add_email(None, user,
+                                               'john@example.com')
+        self.assertEqual(
+            EmailAddress.objects.get_for_user(user, 'john@example.com'),
+            other)
+        other.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(EmailAddress.objects.all_for_user(user),
+                             [self.email_address])
+
+
+class VerifiedEmailCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create(username='john')
+        self.email_address = EmailAddress.objects.create(
+            user=self.user,
+            email='john@doe.com',
+            primary=True,
+            verified=False)
+
+    def test_has_verified_email_cached(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertFalse(EmailAddress.objects.has_verified_email(user))
+            self.assertFalse(EmailAddress.objects.has_verified_email(user))
+        get_adapter().confirm_email(None, self.email_address)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(EmailAddress.objects.has_verified_email(user))
+        self.email_address.delete()
+        with self.assertNumQueries(1):
+            self.assertFalse(EmailAddress.objects.has_verified_email(user))
+
+    def test_has_verified_email_bulk_delete(self):
+        get_adapter().confirm_email(None, self.email_address)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertTrue(EmailAddress.objects.has_verified_email(user))
+        # Bypasses EmailAddress.delete(), just like cascading deletes
+        EmailAddress.objects.filter(user=user).delete()
+        self.assertFalse(EmailAddress.objects.has_verified_email(user))
+
+
+class PerRequestAccountAdapter(adapter.DefaultAccountAdapter):
+    per_request = True
+
+
+class AdapterCacheTests(TestCase):
+
+    def test_instantiated_once(self):
+        self.assertTrue(get_adapter() is get_adapter())
+        self.assertTrue(get_adapter(RequestFactory().get('/'))
+                        is get_adapter())
+
+    @override_settings(ACCOUNT_ADAPTER='allauth.account.tests.'
+                       'PerRequestAccountAdapter')
+    def test_per_request(self):
+        self.assertTrue(isinstance(get_adapter(), PerRequestAccountAdapter))
+        request = RequestFactory().get('/')
+        self.assertTrue(get_adapter(request) is get_adapter(request))
+        self.assertFalse(get_adapter(request)
+                         is get_adapter(RequestFactory().get('/')))
+        self.assertFalse(get_adapter() is get_adapter())
+
+
+class RenderMailTests(TestCase):
+
+    def setUp(self):
+        adapter._clear_template_cache()
+
+    def test_template_lookups_cached(self):
+        user = get_user_model().objects.create(username='john')
+        context = {'user': user,
+                   'current_site': get_current_site(),
+                   'activate_url': 'http://activate/'}
+        with mock.patch('allauth.account.adapter.get_template',
+                        wraps=get_template) as mocked_get_template:
+            for i in range(2):
+                msg = get_adapter().render_mail(
+                    'account/email/email_confirmation',
+                    'john@doe.com',
+                    context,
+                    None)
+                self.assertTrue('http://activate/' in msg.body)
+        # Subject, (non-existing) HTML body and text body
+        self.assertEqual(mocked_get_template.call_count, 3)
+
+
+class OutboxTests(TestCase):
+
+    def _send_mail(self):
+        user = get_user_model().objects.create(username='john')
+        get_adapter().send_mail('account/email/email_confirmation',
+                                'john@doe.com',
+                                {'user': user,
+                                 'current_site': get_current_site(),
+                                 'activate_url': 'http://activate/'},
+                                None)
+
+    @override_settings(
+        ACCOUNT_EMAIL_OUTBOX='allauth.account.outbox.DatabaseOutbox')
+    def test_database_outbox(self):
+        self._send_mail()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+        call_command('account_send_queued_mail', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['john@doe.com'])
+        self.assertTrue('http://activate/' in mail.outbox[0].body)
+        self.assertEqual(QueuedEmail.objects.count(), 0)
+
+    @override_settings(
+        ACCOUNT_EMAIL_OUTBOX='allauth.account.outbox.ThreadPoolOutbox')
+    def test_thread_pool_outbox(self):
+        self._send_mail()
+        get_outbox().join()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['john@doe.com'])
+
+    def test_thread_pool_outbox_survives_errors(self):
+        outbox = ThreadPoolOutbox()
+        with mock.patch('allauth.account.outbox.logger') as logger:
+            with mock.patch('allauth.account.outbox.mail.get_connection') \
+                    as get_connection:
+                get_connection.return_value.open.side_effect = IOError
+                for i in range(outbox.workers + 1):
+                    outbox.put(mail.EmailMessage(to=['john@doe.com']))
+                    outbox.join()
+        self.assertEqual(logger.exception.call_count, outbox.workers + 1)
+        self.assertTrue(all(thread.is_alive() for thread in outbox.threads))
+        self.assertEqual(len(mail.outbox), 0)
+        outbox.put(mail.EmailMessage(to=['john@doe.com']))
+        outbox.join()
+        self.assertEqual(len(mail.outbox), 1)
+        # Dead workers are replaced
+        outbox.threads[0] = mock.Mock(is_alive=lambda: False)
+        outbox.start()
+        self.assertEqual(len(outbox.threads), outbox.workers)
+        self.assertTrue(all(thread.is_alive() for thread in outbox.threads))
+
+    def test_thread_pool_outbox_stop(self):
+        outbox = ThreadPoolOutbox()
+        for i in range(3):
+            outbox.put(mail.EmailMessage(to=['john@doe.com']))
+        threads = outbox.threads
+        outbox.stop()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+    @override_settings(
+        ACCOUNT_EMAIL_OUTBOX='allauth.account.outbox.DatabaseOutbox')
+    def test_database_outbox_retries(self):
+        outbox = get_outbox()
+        self._send_mail()
+        with mock.patch('allauth.account.outbox.logger') as logger:
+            with mock.patch('allauth.account.outbox.mail.get_connection') \
+                    as get_connection:
+                get_connection.return_value.open.side_effect = IOError
+                for attempt in range(outbox.max_attempts + 1):
+                    self.assertEqual(outbox.drain(), 0)
+        self.assertEqual(logger.exception.call_count, outbox.max_attempts)
+        self.assertEqual(logger.error.call_count, 1)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.attempts, outbox.max_attempts)
+        self.assertEqual(queued.claimed, None)
+        self.assertEqual(len(mail.outbox), 0)
+        # Messages claimed by another drain are left alone
+        QueuedEmail.objects.update(attempts=0, claimed=timezone.now())
+        self.assertEqual(outbox.drain(), 0)
+        QueuedEmail.objects.update(claimed=None)
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(QueuedEmail.objects.count(), 0)
+
+    def test_database_outbox_broken_message(self):
+        outbox = DatabaseOutbox()
+        broken = QueuedEmail.objects.create(data='{"subject": "Hi"}')
+        outbox.enqueue(mail.EmailMessage(to=['john@doe.com']))
+        with mock.patch('allauth.account.outbox.logger') as logger:
+            self.assertEqual(outbox.drain(), 1)
+            # Given up on right away, rather than retried
+            self.assertEqual(outbox.drain(), 0)
+        self.assertEqual(logger.exception.call_count, 1)
+        self.assertEqual(logger.error.call_count, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.pk, broken.pk)
+        self.assertEqual(queued.attempts, outbox.max_attempts)
+        self.assertEqual(queued.claimed, None)
+
+
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Keep all hits within the same window
+        patcher = mock.patch('allauth.account.ratelimit.time')
+        self.time = patcher.start()
+        self.time.time.return_value = 1000.0
+        self.addCleanup(patcher.stop)
+        user = get_user_model().objects.create(username='john',
+                                               email='john@doe.com')
+        user.set_password('doe')
+        user.save()
+        EmailAddress.objects.create(user=user,
+                                    email='john@doe.com',
+                                    primary=True,
+                                    verified=True)
+
+    def test_parse_rates(self):
+        self.assertEqual(ratelimit.parse_rates('10/m/ip, 5/5m/key'),
+                         [(10, 60, 'ip'), (5, 300, 'key')])
+        self.assertEqual(ratelimit.parse_rates(None), [])
+
+    @override_settings(ACCOUNT_RATE_LIMITS={'login_failed': '2/m/key'})
+    def test_login_failed(self):
+        c = Client()
+        data = {'login': 'john', 'password': 'wrong'}
+        for attempt in range(2):
+            resp = c.post(reverse('account_login'), data)
+            self.assertFormError(
+                resp, 'form', None,
+                'The username and/or password you specified are not'
+                ' correct.')
+        with mock.patch('allauth.account.forms.authenticate') \
+                as authenticate_mock:
+            resp = c.post(reverse('account_login'),
+                          {'login': 'john', 'password': 'doe'})
+            self.assertFalse(authenticate_mock.called)
+        self.assertFormError(
+            resp, 'form', None,
+            'Too many failed login attempts. Try again later.')
+        # Other logins are not affected
+        resp = c.post(reverse('account_login'),
+                      {'login': 'jane', 'password': 'doe'})
+        self.assertFormError(
+            resp, 'form', None,
+            'The username and/or password you specified are not correct.')
+
+    @override_settings(ACCOUNT_RATE_LIMITS={'login_failed': '2/m/ip,2/m/key'})
+    def test_login_success_clears(self):
+        c = Client()
+        c.post(reverse('account_login'), {'login': 'john', 'password': 'x'})
+        resp = c.post(reverse('account_login'),
+                      {'login': 'john', 'password': 'doe'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertTrue(ratelimit.consume(None, 'login_failed', key='john',
+                                          dry_run=True))
+        # Only the failed attempt counts against the IP address
+        request = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1')
+        self.assertTrue(ratelimit.consume(request, 'login_failed'))
+        self.assertFalse(ratelimit.consume(request, 'login_failed'))
+
+    @override_settings(ACCOUNT_RATE_LIMITS={'login_failed': '1/m/key'})
+    def test_login_counted_before_authenticate(self):
+        def authenticate(**credentials):
+            # A concurrent attempt, racing this one
+            self.assertFalse(ratelimit.consume(None, 'login_failed',
+                                               key='john',
+                                               dry_run=True))
+            return None
+
+        with mock.patch('allauth.account.forms.authenticate',
+                        side_effect=authenticate) as authenticate_mock:
+            Client().post(reverse('account_login'),
+                          {'login': 'john', 'password': 'x'})
+        self.assertTrue(authenticate_mock.called)
+
+    @override_settings(ACCOUNT_RATE_LIMITS={'reset_password': '1/m/ip'})
+    def test_reset_password(self):
+        c = Client()
+        data = {'email': 'john@doe.com'}
+        resp = c.post(reverse('account_reset_password'), data)
+        self.assertEqual(resp.status_code, 302)
+        resp = c.post(reverse('account_reset_password'), data)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(ACCOUNT_RATE_LIMITS={'reset_password': '1/m/key'})
+    def test_reset_password_per_client(self):
+        data = {'email': 'john@doe.com'}
+        for remote_addr, status_code in [('1.2.3.4', 302),
+                                         ('1.2.3.4', 200),
+                                         # Not locked out by the above
+                                         ('5.6.7.8', 302)]:
+            resp = Client(REMOTE_ADDR=remote_addr).post(
+                reverse('account_reset_password'), data)
+            self.assertEqual(resp.status_code, status_code)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_confirm_email_cooldown_without_cache(self):
+        from django.contrib.messages.middleware import MessageMiddleware
+        from django.contrib.sessions.middleware import SessionMiddleware
+        from django.core.cache.backends.dummy import DummyCache
+
+        user = get_user_model().objects.create(username='jane',
+                                               email='jane@doe.com')
+        EmailAddress.objects.create(user=user,
+                                    email='jane@doe.com',
+                                    primary=True,
+                                    verified=False)
+        with mock.patch('allauth.account.ratelimit.cache',
+                        DummyCache('dummy', {})):
+            for attempt in range(2):
+                request = RequestFactory().get('/')
+                SessionMiddleware().process_request(request)
+                MessageMiddleware().process_request(request)
+                account_utils.send_email_confirmation(request, user)
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(ACCOUNT_RATE_LIMITS={'confirm_email': '2/m/key'})
+    def test_fixed_window(self):
+        for attempt in range(2):
+            self.assertTrue(ratelimit.consume(None, 'confirm_email',
+                                              key='john@doe.com'))
+        self.assertFalse(ratelimit.consume(None, 'confirm_email',
+                                           key='john@doe.com',
+                                           dry_run=True))
+        self.assertFalse(ratelimit.consume(None, 'confirm_email',
+                                           key='john@doe.com'))
+        self.time.time.return_value += 60
+        self.assertTrue(ratelimit.consume(None, 'confirm_email',
+                                          key='john@doe.com'))
+
+    def test_defaults_not_ip_scoped(self):
+        # Behind a reverse proxy, all clients share the same IP address
+        for action, rates in app_settings.RATE_LIMITS.items():
+            self.assertFalse([scope
+                              for amount, period, scope
+                              in ratelimit.parse_rates(rates)
+                              if scope == 'ip'])
+
+    @override_settings(ACCOUNT_RATE_LIMITS=False)
+    def test_disabled(self):
+        for attempt in range(10):
+            self.assertTrue(ratelimit.consume(None, 'confirm_email',
+                                              key='john@doe.com'))
 
 
 class BaseSignupFormTests(TestCase):
@@ -647,6 +1074,60 @@ class BaseSignupFormTests(TestCase):
         form = BaseSignupForm(data, email_required=True)
         self.assertTrue(form.is_valid())
 
+    @override_settings(
+        ACCOUNT_USERNAME_REQUIRED=True,
+        ACCOUNT_USERNAME_BLACKLIST=['username',
+                                    re.compile(r'^admin', re.IGNORECASE),
+                                    re.compile(r'^Root')])
+    def test_username_matches_blacklist_pattern(self):
+        for username, valid in [('Administrator', False),
+                                ('Rooted', False),
+                                ('rooted', True)]:
+            data = {
+                'username': username,
+                'email': 'user@example.com',
+            }
+            form = BaseSignupForm(data, email_required=True)
+            self.assertEqual(form.is_valid(), valid)
+
+    @override_settings(
+        ACCOUNT_USERNAME_BLACKLIST=['john2', re.compile(r'^admin')])
+    def test_generated_username_not_blacklisted(self):
+        get_user_model().objects.create(username='john')
+        self.assertEqual(generate_unique_username(['John']), 'john3')
+        self.assertEqual(generate_unique_username(['Admin', 'Jane']),
+                         'jane')
+
+    @override_settings(ACCOUNT_USERNAME_BLACKLIST=[re.compile(r'^user')])
+    def test_generated_username_exhausted(self):
+        self.assertRaises(ValueError, generate_unique_username, ['userx'])
+        user = get_user_model()()
+        get_adapter().populate_username(None, user)
+        self.assertFalse(user.username.startswith('user'))
+        self.assertEqual(len(user.username), 8)
+
+    @override_settings(
+        ACCOUNT_USERNAME_BLACKLIST=[re.compile(r'^admin', re.IGNORECASE),
+                                    re.compile(r'^(root|staff)$',
+                                               re.IGNORECASE),
+                                    re.compile(r'^Root'),
+                                    re.compile(r'^(.)\1+$')])
+    def test_username_blacklist_combined_patterns(self):
+        words, patterns = account_utils._compile_username_blacklist()
+        # Case insensitive patterns are combined, the back reference is
+        # kept apart
+        self.assertEqual(len(patterns), 3)
+        for username, blacklisted in [('Administrator', True),
+                                      ('STAFF', True),
+                                      ('staffer', False),
+                                      ('Rooted', True),
+                                      ('rooted', False),
+                                      ('aaa', True),
+                                      ('abc', False)]:
+            self.assertEqual(
+                account_utils.is_username_blacklisted(username),
+                blacklisted)
+
 
 class AuthenticationBackendTests(TestCase):
 
@@ -707,6 +1188,27 @@ class AuthenticationBackendTests(TestCase):
                 password=user.username).pk,
             user.pk)
 
+    @override_settings(
+        ACCOUNT_AUTHENTICATION_METHOD=app_settings.AuthenticationMethod.USERNAME_EMAIL)  # noqa
+    def test_auth_resolves_candidates_in_single_query(self):
+        user = self.user
+        EmailAddress.objects.create(user=user,
+                                    email=user.email,
+                                    primary=True,
+                                    verified=True)
+        backend = AuthenticationBackend()
+        with mock.patch.object(get_user_model(), 'check_password',
+                               return_value=False) as check_password:
+            with self.assertNumQueries(1):
+                self.assertEqual(
+                    backend.authenticate(
+                        email=user.email,
+                        username=user.email,
+                        password='wrong'),
+                    None)
+        # Found by both User.email and EmailAddress, yet hashed only once
+        self.assertEqual(check_password.call_count, 1)
+
 
 class UtilsTests(TestCase):
     def setUp(self):
@@ -727,7 +1229,7 @@ class UtilsTests(TestCase):
     @unittest.skipUnless(hasattr(models, 'UUIDField'),
                          reason="No UUIDField in this django version")
     def test_url_str_to_pk_identifies_UUID_as_stringlike(self):
-        with mock.patch('allauth.account.utils.get_user_model') as mocked_gum:
+        with mock.patch('allauth.utils.get_user_model') as mocked_gum:
             mocked_gum.return_value = self.UUIDUser
             self.assertEqual(url_str_to_user_pk(self.user_id),
                              self.user_id)
@@ -738,3 +1240,38 @@ class UtilsTests(TestCase):
             email='john@doe.com',
             username='john')
         self.assertEquals(user_pk_to_url_str(user), str(user.pk))
+
+
+class EmailAddressLowerTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='john')
+
+    def test_email_lower_kept_in_sync(self):
+        email_address = EmailAddress.objects.create(user=self.user,
+                                                    email='John@Doe.COM')
+        self.assertEqual(email_address.email_lower, 'john@doe.com')
+        email_address.email = 'John@Example.COM'
+        email_address.save(update_fields=['email'])
+        self.assertEqual(
+            EmailAddress.objects.get(pk=email_address.pk).email_lower,
+            'john@example.com')
+
+    def test_lookups_are_case_insensitive(self):
+        EmailAddress.objects.create(user=self.user,
+                                    email='John@Doe.COM',
+                                    verified=True)
+        self.assertEqual(filter_users_by_email('JOHN@doe.com'), [self.user])
+        self.assertEqual(EmailAddress.objects.get_users_for('john@DOE.com'),
+                         [self.user])
+        self.assertTrue(email_address_exists('john@doe.com'))
+
+    def test_populate_email_lower_command(self):
+        email_address = EmailAddress.objects.create(user=self.user,
+                                                    email='John@Doe.COM')
+        EmailAddress.objects.filter(pk=email_address.pk).update(
+            email_lower='')
+        call_command('account_populate_email_lower', stdout=StringIO())
+        self.assertEqual(
+            EmailAddress.objects.get(pk=email_address.pk).email_lower,
+            'john@doe.com')
@@ -19,7 +19,7 @@ urlpatterns = patterns(
     url(r"^email/$", views.email, name="account_email"),
     url(r"^confirm-email/$", views.email_verification_sent,
         name="account_email_verification_sent"),
-    url(r"^confirm-email/(?P<key>\w+)/$", views.confirm_email,
+    url(r"^confirm-email/(?P<key>[-:\w]+)/$", views.confirm_email,
         name="account_confirm_email"),
 
     # password reset
@@ -1,20 +1,15 @@
+import re
 from datetime import timedelta
-try:
-    from django.utils.timezone import now
-except ImportError:
-    from datetime import datetime
-    now = datetime.now
 
 import django
 from django.contrib import messages
 from django.core.urlresolvers import reverse
-from django.db import models
 from django.conf import settings
 from django.http import HttpResponseRedirect
 from django.utils import six
+from django.utils.timezone import now
 from django.utils.http import urlencode
-from django.utils.http import int_to_base36, base36_to_int
-from django.core.exceptions import ValidationError
+from django.dispatch import receiver
 
 if django.VERSION > (1, 8,):
     from collections import OrderedDict
@@ -28,7 +23,8 @@ except ImportError:
 
 from ..exceptions import ImmediateHttpResponse
 from ..utils import (import_callable, valid_email_or_none,
-                     get_user_model, get_request_param)
+                     get_user_model, get_user_model_info,
+                     get_request_param, setting_changed)
 
 from . import signals
 
@@ -57,10 +53,79 @@ def get_login_redirect_url(request, url=None, redirect_field_name="next"):
         = (url
            or get_next_redirect_url(request,
                                     redirect_field_name=redirect_field_name)
-           or get_adapter().get_login_redirect_url(request))
+           or get_adapter(request).get_login_redirect_url(request))
     return redirect_url
 
 _user_display_callable = None
+_username_blacklist = None
+
+
+# Patterns that cannot be embedded in a larger pattern without changing
+# their meaning: back references (group numbers shift), named groups
+# (names may clash) and global inline flags (only allowed up front)
+_UNCOMBINABLE_PATTERN_REGEX = re.compile(
+    r'\\[1-9]|\(\?P[<=]|^\(\?[aiLmsux]+\)')
+
+
+def _combine_patterns(patterns):
+    """
+    Combines the given compiled regular expressions into as few as
+    possible: one alternation per distinct set of flags.
+    """
+    ret = []
+    by_flags = {}
+    for pattern in patterns:
+        if (not isinstance(pattern.pattern, six.string_types)
+                or _UNCOMBINABLE_PATTERN_REGEX.search(pattern.pattern)):
+            ret.append(pattern)
+        else:
+            by_flags.setdefault(
+                (type(pattern.pattern), pattern.flags), []).append(pattern)
+    for (pattern_type, flags), group in by_flags.items():
+        if len(group) == 1:
+            ret.extend(group)
+            continue
+        try:
+            ret.append(re.compile(
+                pattern_type('|').join(pattern_type('(?:%s)') % p.pattern
+                                       for p in group),
+                flags))
+        except re.error:
+            ret.extend(group)
+    return ret
+
+
+def _compile_username_blacklist():
+    words = set()
+    patterns = []
+    for entry in app_settings.USERNAME_BLACKLIST:
+        if isinstance(entry, six.string_types):
+            words.add(entry.lower())
+        else:
+            # A compiled regular expression, matched using its own flags
+            patterns.append(entry)
+    return words, _combine_patterns(patterns)
+
+
+def is_username_blacklisted(username):
+    """
+    Checks `username` against `ACCOUNT_USERNAME_BLACKLIST`, which is
+    compiled once into a set of (lowercased) reserved words plus a
+    single regular expression per distinct set of pattern flags.
+    """
+    global _username_blacklist
+    if _username_blacklist is None:
+        _username_blacklist = _compile_username_blacklist()
+    words, patterns = _username_blacklist
+    return (username.lower() in words
+            or any(pattern.search(username) for pattern in patterns))
+
+
+@receiver(setting_changed)
+def _reset_username_blacklist(setting, **kwargs):
+    global _username_blacklist
+    if setting in ('ACCOUNT_USERNAME_BLACKLIST', 'ALLAUTH_SETTING_GETTER'):
+        _username_blacklist = None
 
 
 def default_user_display(user):
@@ -88,8 +153,7 @@ def user_field(user, field, *args):
             # Setter
             v = args[0]
             if v:
-                User = get_user_model()
-                v = v[0:User._meta.get_field(field).max_length]
+                v = v[0:get_user_model_info().get_max_length(field)]
             setattr(user, field, v)
         else:
             # Getter
@@ -122,8 +186,7 @@ def perform_login(request, user, email_verification,
         return HttpResponseRedirect(reverse('account_inactive'))
 
     from .models import EmailAddress
-    has_verified_email = EmailAddress.objects.filter(user=user,
-                                                     verified=True).exists()
+    has_verified_email = EmailAddress.objects.has_verified_email(user)
     if email_verification == EmailVerificationMethod.NONE:
         pass
     elif email_verification == EmailVerificationMethod.OPTIONAL:
@@ -136,7 +199,7 @@ def perform_login(request, user, email_verification,
             return HttpResponseRedirect(
                 reverse('account_email_verification_sent'))
     try:
-        get_adapter().login(request, user)
+        get_adapter(request).login(request, user)
         response = HttpResponseRedirect(
             get_login_redirect_url(request, redirect_url))
 
@@ -147,10 +210,10 @@ def perform_login(request, user, email_verification,
                                     response=response,
                                     user=user,
                                     **signal_kwargs)
-        get_adapter().add_message(request,
-                                  messages.SUCCESS,
-                                  'account/messages/logged_in.txt',
-                                  {'user': user})
+        get_adapter(request).add_message(request,
+                                         messages.SUCCESS,
+                                         'account/messages/logged_in.txt',
+                                         {'user': user})
     except ImmediateHttpResponse as e:
         response = e.response
     return response
@@ -180,7 +243,7 @@ def cleanup_email_addresses(request, addresses):
     exist, the first one encountered will be kept as primary.
     """
     from .models import EmailAddress
-    adapter = get_adapter()
+    adapter = get_adapter(request)
     # Let's group by `email`
     e2a = OrderedDict()  # maps email to EmailAddress
     primary_addresses = []
@@ -194,7 +257,7 @@ def cleanup_email_addresses(request, addresses):
         # ... and non-conflicting ones...
         if (app_settings.UNIQUE_EMAIL
                 and EmailAddress.objects
-                .filter(email__iexact=email)
+                .filter(email_lower=email.lower())
                 .exists()):
             continue
         a = e2a.get(email.lower())
@@ -241,10 +304,10 @@ def setup_user_email(request, user, addresses):
     """
     from .models import EmailAddress
 
-    assert EmailAddress.objects.filter(user=user).count() == 0
+    assert not EmailAddress.objects.all_for_user(user)
     priority_addresses = []
     # Is there a stashed e-mail?
-    adapter = get_adapter()
+    adapter = get_adapter(request)
     stashed_email = adapter.unstash_verified_email(request)
     if stashed_email:
         priority_addresses.append(EmailAddress(user=user,
@@ -272,6 +335,27 @@ def setup_user_email(request, user, addresses):
     return primary
 
 
+def _confirmation_recently_sent(email_address):
+    """
+    Whether the `confirm_email` budgets scoped by key are used up, going
+    by the stored `EmailConfirmation` records. Unlike the hits counted in
+    the cache, these are reliable regardless of the cache backend (e.g.
+    `DummyCache`, or a per process cache shared by several workers).
+    """
+    from .models import EmailConfirmation
+    from . import ratelimit
+
+    for amount, period, scope in ratelimit.parse_rates(
+            app_settings.RATE_LIMITS.get('confirm_email')):
+        if (scope == 'key'
+                and EmailConfirmation.objects.filter(
+                    email_address=email_address,
+                    sent__gt=now() - timedelta(seconds=period)).count()
+                >= amount):
+            return True
+    return False
+
+
 def send_email_confirmation(request, user, signup=False):
     """
     E-mail verification mails are sent:
@@ -281,20 +365,22 @@ def send_email_confirmation(request, user, signup=False):
 
     Especially in case of b), we want to limit the number of mails
     sent (consider a user retrying a few times), which is why there is
-    a cooldown period before sending a new mail.
+    a cooldown period before sending a new mail (see the `confirm_email`
+    rate limit, which also applies to the stored confirmations).
     """
-    from .models import EmailAddress, EmailConfirmation
+    from .models import EmailAddress
+    from . import ratelimit
 
-    COOLDOWN_PERIOD = timedelta(minutes=3)
     email = user_email(user)
     if email:
         try:
             email_address = EmailAddress.objects.get_for_user(user, email)
             if not email_address.verified:
-                send_email = not EmailConfirmation.objects \
-                    .filter(sent__gt=now() - COOLDOWN_PERIOD,
-                            email_address=email_address) \
-                    .exists()
+                send_email = (
+                    not _confirmation_recently_sent(email_address)
+                    and ratelimit.consume(request,
+                                          action='confirm_email',
+                                          key=email))
                 if send_email:
                     email_address.send_confirmation(request,
                                                     signup=signup)
@@ -302,6 +388,7 @@ def send_email_confirmation(request, user, signup=False):
                 send_email = False
         except EmailAddress.DoesNotExist:
             send_email = True
+            ratelimit.consume(request, action='confirm_email', key=email)
             email_address = EmailAddress.objects.add_email(request,
                                                            user,
                                                            email,
@@ -310,11 +397,11 @@ def send_email_confirmation(request, user, signup=False):
             assert email_address
         # At this point, if we were supposed to send an email we have sent it.
         if send_email:
-            get_adapter().add_message(request,
-                                      messages.INFO,
-                                      'account/messages/'
-                                      'email_confirmation_sent.txt',
-                                      {'email': email})
+            get_adapter(request).add_message(request,
+                                             messages.INFO,
+                                             'account/messages/'
+                                             'email_confirmation_sent.txt',
+                                             {'email': email})
     if signup:
         request.session['account_user'] = user_pk_to_url_str(user)
 
@@ -329,10 +416,14 @@ def sync_user_email_addresses(user):
     """
     from .models import EmailAddress
     email = user_email(user)
-    if email and not EmailAddress.objects.filter(user=user,
-                                                 email__iexact=email).exists():
+    if not email:
+        return
+    try:
+        EmailAddress.objects.get_for_user(user, email)
+    except EmailAddress.DoesNotExist:
         if app_settings.UNIQUE_EMAIL \
-                and EmailAddress.objects.filter(email__iexact=email).exists():
+                and EmailAddress.objects.filter(
+                    email_lower=email.lower()).exists():
             # Bail out
             return
         EmailAddress.objects.create(user=user,
@@ -350,7 +441,7 @@ def filter_users_by_email(email):
     """
     from .models import EmailAddress
     User = get_user_model()
-    mails = EmailAddress.objects.filter(email__iexact=email)
+    mails = EmailAddress.objects.filter(email_lower=email.lower())
     users = [e.user for e in mails.prefetch_related('user')]
     if app_settings.USER_MODEL_EMAIL_FIELD:
         q_dict = {app_settings.USER_MODEL_EMAIL_FIELD + '__iexact': email}
@@ -370,27 +461,8 @@ def user_pk_to_url_str(user):
     """
     This should return a string.
     """
-    User = get_user_model()
-    if (hasattr(models, 'UUIDField')
-            and issubclass(type(User._meta.pk), models.UUIDField)):
-        return user.pk.hex
-
-    ret = user.pk
-    if isinstance(ret, six.integer_types):
-        ret = int_to_base36(user.pk)
-    return str(ret)
+    return get_user_model_info().pk_to_url_str(user.pk)
 
 
 def url_str_to_user_pk(s):
-    User = get_user_model()
-    # TODO: Ugh, isn't there a cleaner way to determine whether or not
-    # the PK is a str-like field?
-    if (hasattr(models, 'UUIDField')
-            and issubclass(type(User._meta.pk), models.UUIDField)):
-        return s
-    try:
-        User._meta.pk.to_python('a')
-        pk = s
-    except ValidationError:
-        pk = base36_to_int(s)
-    return pk
+    return get_user_model_info().url_str_to_pk(s)
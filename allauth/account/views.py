@@ -21,10 +21,11 @@ from .forms import (
     LoginForm, ResetPasswordKeyForm,
     ResetPasswordForm, SetPasswordForm, SignupForm, UserTokenForm)
 from .utils import sync_user_email_addresses
-from .models import EmailAddress, EmailConfirmation
+from .models import EmailAddress, EmailConfirmation, EmailConfirmationHMAC
 
 from . import signals
 from . import app_settings
+from . import ratelimit
 
 from .adapter import get_adapter
 
@@ -45,10 +46,10 @@ def _ajax_response(request, response, form=None):
             redirect_to = response['Location']
         else:
             redirect_to = None
-        response = get_adapter().ajax_response(request,
-                                               response,
-                                               form=form,
-                                               redirect_to=redirect_to)
+        response = get_adapter(request).ajax_response(request,
+                                                      response,
+                                                      form=form,
+                                                      redirect_to=redirect_to)
     return response
 
 
@@ -102,6 +103,11 @@ class LoginView(RedirectAuthenticatedUserMixin,
     def get_form_class(self):
         return get_form_class(app_settings.FORMS, 'login', self.form_class)
 
+    def get_form_kwargs(self):
+        kwargs = super(LoginView, self).get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
+
     def form_valid(self, form):
         success_url = self.get_success_url()
         try:
@@ -151,7 +157,7 @@ class CloseableSignupMixin(object):
                                                           **kwargs)
 
     def is_open(self):
-        return get_adapter().is_open_for_signup(self.request)
+        return get_adapter(self.request).is_open_for_signup(self.request)
 
     def closed(self):
         response_kwargs = {
@@ -228,10 +234,11 @@ class ConfirmEmailView(TemplateResponseMixin, View):
     def post(self, *args, **kwargs):
         self.object = confirmation = self.get_object()
         confirmation.confirm(self.request)
-        get_adapter().add_message(self.request,
-                                  messages.SUCCESS,
-                                  'account/messages/email_confirmed.txt',
-                                  {'email': confirmation.email_address.email})
+        get_adapter(self.request).add_message(
+            self.request,
+            messages.SUCCESS,
+            'account/messages/email_confirmed.txt',
+            {'email': confirmation.email_address.email})
         if app_settings.LOGIN_ON_EMAIL_CONFIRMATION:
             resp = self.login_on_confirm(confirmation)
             if resp is not None:
@@ -287,10 +294,14 @@ class ConfirmEmailView(TemplateResponseMixin, View):
         return None
 
     def get_object(self, queryset=None):
+        key = self.kwargs["key"]
+        confirmation = EmailConfirmationHMAC.from_key(key)
+        if confirmation:
+            return confirmation
         if queryset is None:
             queryset = self.get_queryset()
         try:
-            return queryset.get(key=self.kwargs["key"].lower())
+            return queryset.get(key=key.lower())
         except EmailConfirmation.DoesNotExist:
             raise Http404()
 
@@ -305,7 +316,8 @@ class ConfirmEmailView(TemplateResponseMixin, View):
         return ctx
 
     def get_redirect_url(self):
-        return get_adapter().get_email_confirmation_redirect_url(self.request)
+        return get_adapter(self.request) \
+            .get_email_confirmation_redirect_url(self.request)
 
 confirm_email = ConfirmEmailView.as_view()
 
@@ -329,11 +341,12 @@ class EmailView(AjaxCapableProcessFormViewMixin, FormView):
 
     def form_valid(self, form):
         email_address = form.save(self.request)
-        get_adapter().add_message(self.request,
-                                  messages.INFO,
-                                  'account/messages/'
-                                  'email_confirmation_sent.txt',
-                                  {'email': form.cleaned_data["email"]})
+        get_adapter(self.request).add_message(
+            self.request,
+            messages.INFO,
+            'account/messages/'
+            'email_confirmation_sent.txt',
+            {'email': form.cleaned_data["email"]})
         signals.email_added.send(sender=self.request.user.__class__,
                                  request=self.request,
                                  user=self.request.user,
@@ -364,16 +377,25 @@ class EmailView(AjaxCapableProcessFormViewMixin, FormView):
     def _action_send(self, request, *args, **kwargs):
         email = request.POST["email"]
         try:
-            email_address = EmailAddress.objects.get(
+            email_address = EmailAddress.objects.get_for_user(
                 user=request.user,
                 email=email,
             )
-            get_adapter().add_message(request,
-                                      messages.INFO,
-                                      'account/messages/'
-                                      'email_confirmation_sent.txt',
-                                      {'email': email})
-            email_address.send_confirmation(request)
+            if ratelimit.consume(request,
+                                 action='confirm_email',
+                                 key=email_address.email):
+                email_address.send_confirmation(request)
+                get_adapter(request).add_message(
+                    request,
+                    messages.INFO,
+                    'account/messages/email_confirmation_sent.txt',
+                    {'email': email})
+            else:
+                get_adapter(request).add_message(
+                    request,
+                    messages.ERROR,
+                    'account/messages/email_confirmation_throttled.txt',
+                    {'email': email})
             return HttpResponseRedirect(self.get_success_url())
         except EmailAddress.DoesNotExist:
             pass
@@ -381,26 +403,28 @@ class EmailView(AjaxCapableProcessFormViewMixin, FormView):
     def _action_remove(self, request, *args, **kwargs):
         email = request.POST["email"]
         try:
-            email_address = EmailAddress.objects.get(
+            email_address = EmailAddress.objects.get_for_user(
                 user=request.user,
                 email=email
             )
             if email_address.primary:
-                get_adapter().add_message(request,
-                                          messages.ERROR,
-                                          'account/messages/'
-                                          'cannot_delete_primary_email.txt',
-                                          {"email": email})
+                get_adapter(request).add_message(
+                    request,
+                    messages.ERROR,
+                    'account/messages/'
+                    'cannot_delete_primary_email.txt',
+                    {"email": email})
             else:
                 email_address.delete()
                 signals.email_removed.send(sender=request.user.__class__,
                                            request=request,
                                            user=request.user,
                                            email_address=email_address)
-                get_adapter().add_message(request,
-                                          messages.SUCCESS,
-                                          'account/messages/email_deleted.txt',
-                                          {"email": email})
+                get_adapter(request).add_message(
+                    request,
+                    messages.SUCCESS,
+                    'account/messages/email_deleted.txt',
+                    {"email": email})
                 return HttpResponseRedirect(self.get_success_url())
         except EmailAddress.DoesNotExist:
             pass
@@ -417,22 +441,17 @@ class EmailView(AjaxCapableProcessFormViewMixin, FormView):
             # address. Ignore constraint if previous primary email
             # address is not verified.
             if not email_address.verified and \
-                    EmailAddress.objects.filter(user=request.user,
-                                                verified=True).exists():
-                get_adapter().add_message(request,
-                                          messages.ERROR,
-                                          'account/messages/'
-                                          'unverified_primary_email.txt')
+                    EmailAddress.objects.has_verified_email(request.user):
+                get_adapter(request).add_message(
+                    request,
+                    messages.ERROR,
+                    'account/messages/'
+                    'unverified_primary_email.txt')
             else:
-                # Sending the old primary address to the signal
-                # adds a db query.
-                try:
-                    from_email_address = EmailAddress.objects \
-                        .get(user=request.user, primary=True)
-                except EmailAddress.DoesNotExist:
-                    from_email_address = None
+                from_email_address = EmailAddress.objects \
+                    .get_primary(request.user)
                 email_address.set_as_primary()
-                get_adapter() \
+                get_adapter(request) \
                     .add_message(request,
                                  messages.SUCCESS,
                                  'account/messages/primary_email_set.txt')
@@ -483,9 +502,10 @@ class PasswordChangeView(AjaxCapableProcessFormViewMixin, FormView):
         if (update_session_auth_hash is not None and
                 not app_settings.LOGOUT_ON_PASSWORD_CHANGE):
             update_session_auth_hash(self.request, form.user)
-        get_adapter().add_message(self.request,
-                                  messages.SUCCESS,
-                                  'account/messages/password_changed.txt')
+        get_adapter(self.request).add_message(
+            self.request,
+            messages.SUCCESS,
+            'account/messages/password_changed.txt')
         signals.password_changed.send(sender=self.request.user.__class__,
                                       request=self.request,
                                       user=self.request.user)
@@ -524,9 +544,10 @@ class PasswordSetView(AjaxCapableProcessFormViewMixin, FormView):
 
     def form_valid(self, form):
         form.save()
-        get_adapter().add_message(self.request,
-                                  messages.SUCCESS,
-                                  'account/messages/password_set.txt')
+        get_adapter(self.request).add_message(
+            self.request,
+            messages.SUCCESS,
+            'account/messages/password_set.txt')
         signals.password_set.send(sender=self.request.user.__class__,
                                   request=self.request, user=self.request.user)
         return super(PasswordSetView, self).form_valid(form)
@@ -551,6 +572,11 @@ class PasswordResetView(AjaxCapableProcessFormViewMixin, FormView):
                               'reset_password',
                               self.form_class)
 
+    def get_form_kwargs(self):
+        kwargs = super(PasswordResetView, self).get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
+
     def form_valid(self, form):
         form.save(self.request)
         return super(PasswordResetView, self).form_valid(form)
@@ -608,9 +634,10 @@ class PasswordResetFromKeyView(AjaxCapableProcessFormViewMixin, FormView):
 
     def form_valid(self, form):
         form.save()
-        get_adapter().add_message(self.request,
-                                  messages.SUCCESS,
-                                  'account/messages/password_changed.txt')
+        get_adapter(self.request).add_message(
+            self.request,
+            messages.SUCCESS,
+            'account/messages/password_changed.txt')
         signals.password_reset.send(sender=self.reset_user.__class__,
                                     request=self.request,
                                     user=self.reset_user)
@@ -650,9 +677,10 @@ class LogoutView(TemplateResponseMixin, View):
         return redirect(url)
 
     def logout(self):
-        get_adapter().add_message(self.request,
-                                  messages.SUCCESS,
-                                  'account/messages/logged_out.txt')
+        get_adapter(self.request).add_message(
+            self.request,
+            messages.SUCCESS,
+            'account/messages/logged_out.txt')
         auth_logout(self.request)
 
     def get_context_data(self, **kwargs):
@@ -667,7 +695,8 @@ class LogoutView(TemplateResponseMixin, View):
     def get_redirect_url(self):
         return (get_next_redirect_url(self.request,
                                       self.redirect_field_name)
-                or get_adapter().get_logout_redirect_url(self.request))
+                or get_adapter(self.request)
+                .get_logout_redirect_url(self.request))
 
 logout = LogoutView.as_view()
 
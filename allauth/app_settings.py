@@ -1,7 +1,48 @@
 from django.conf import settings
 
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    # Django < 1.8
+    from django.test.signals import setting_changed
+
 SOCIALACCOUNT_ENABLED = 'allauth.socialaccount' in settings.INSTALLED_APPS
 
 LOGIN_REDIRECT_URL = getattr(settings, 'LOGIN_REDIRECT_URL', '/')
 
 USER_MODEL = getattr(settings, 'AUTH_USER_MODEL', 'auth.User')
+
+
+class SettingsSnapshotMixin(object):
+    """
+    Remembers the values looked up by `_setting()`, so that the
+    (frequently accessed) app settings do not hit `django.conf.settings`
+    and `ALLAUTH_SETTING_GETTER` over and over again. The snapshot is
+    discarded whenever a setting changes (`setting_changed`, e.g. by
+    means of `override_settings`). Values returned by a custom
+    `ALLAUTH_SETTING_GETTER` that has a truthy `dynamic` attribute are
+    never remembered.
+    """
+
+    def _init_snapshot(self):
+        self._snapshot = {}
+        setting_changed.connect(self._clear_snapshot, weak=False)
+
+    def _clear_snapshot(self, **kwargs):
+        self._snapshot = {}
+
+    def _setting(self, name, dflt):
+        snapshot = self._snapshot
+        try:
+            return snapshot[name]
+        except KeyError:
+            pass
+        getter = getattr(settings, 'ALLAUTH_SETTING_GETTER', None)
+        if getter is None:
+            value = getattr(settings, self.prefix + name, dflt)
+        else:
+            value = getter(self.prefix + name, dflt)
+            if getattr(getter, 'dynamic', False):
+                return value
+        snapshot[name] = value
+        return value
@@ -3,8 +3,10 @@ from __future__ import absolute_import
 from django.utils.translation import ugettext_lazy as _
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ValidationError
+from django.dispatch import receiver
 
-from ..utils import (import_attribute,
+from ..utils import (get_adapter_instance,
+                     setting_changed,
                      email_address_exists,
                      valid_email_or_none)
 from ..account.utils import user_email, user_username, user_field
@@ -17,6 +19,9 @@ from . import app_settings
 
 
 class DefaultSocialAccountAdapter(object):
+    # Adapters are instantiated once per process. Set this to `True` in
+    # adapters that keep request specific state.
+    per_request = False
 
     def pre_social_login(self, request, sociallogin):
         """
@@ -120,8 +125,8 @@ class DefaultSocialAccountAdapter(object):
             # No email address, no password reset
             if app_settings.EMAIL_VERIFICATION \
                     == EmailVerificationMethod.MANDATORY:
-                if EmailAddress.objects.filter(user=account.user,
-                                               verified=True).count() == 0:
+                if not EmailAddress.objects.has_verified_email(
+                        account.user):
                     raise ValidationError(_("Your account has no verified"
                                             " e-mail address."))
 
@@ -163,5 +168,14 @@ class DefaultSocialAccountAdapter(object):
         return get_account_adapter().is_open_for_signup(request)
 
 
-def get_adapter():
-    return import_attribute(app_settings.ADAPTER)()
+_adapters = {}
+
+
+@receiver(setting_changed)
+def _clear_adapter_cache(setting, **kwargs):
+    if setting in ('SOCIALACCOUNT_ADAPTER', 'ALLAUTH_SETTING_GETTER'):
+        _adapters.clear()
+
+
+def get_adapter(request=None):
+    return get_adapter_instance(app_settings.ADAPTER, _adapters, request)
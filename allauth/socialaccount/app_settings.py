@@ -1,7 +1,11 @@
-class AppSettings(object):
+from ..app_settings import SettingsSnapshotMixin
+
+
+class AppSettings(SettingsSnapshotMixin):
 
     def __init__(self, prefix):
         self.prefix = prefix
+        self._init_snapshot()
         self._update_base_config()
 
     def _update_base_config(self):
@@ -17,13 +21,6 @@ class AppSettings(object):
         if not hasattr(settings, self.prefix + 'SOCIAL_ACCOUNT_MODEL'):
             setattr(settings, self.prefix + 'SOCIAL_ACCOUNT_MODEL', self.SOCIAL_ACCOUNT_MODEL)
 
-    def _setting(self, name, dflt):
-        from django.conf import settings
-        getter = getattr(settings,
-                         'ALLAUTH_SETTING_GETTER',
-                         lambda name, dflt: getattr(settings, name, dflt))
-        return getter(self.prefix + name, dflt)
-
     @property
     def QUERY_EMAIL(self):
         """
@@ -95,6 +92,54 @@ class AppSettings(object):
     def FORMS(self):
         return self._setting('FORMS', {})
 
+    @property
+    def JSON_CODEC(self):
+        """
+        The module (or object) offering `loads()` and `dumps()` used to
+        encode and decode `SocialAccount.extra_data`
+        """
+        return self._setting('JSON_CODEC', 'json')
+
+    @property
+    def JSON_STORAGE(self):
+        """
+        How `SocialAccount.extra_data` is stored: "text", or "native" to
+        use the native JSON type of the database (if any)
+        """
+        return self._setting('JSON_STORAGE', 'text')
+
+    @property
+    def REQUESTS_MAX_RETRIES(self):
+        """
+        The retry policy for requests made to the providers: the number
+        of retries, or a `urllib3.util.Retry` instance
+        """
+        return self._setting('REQUESTS_MAX_RETRIES', 0)
+
+    @property
+    def REQUESTS_POOL_MAXSIZE(self):
+        """
+        The maximum number of kept-alive connections per provider host
+        """
+        return self._setting('REQUESTS_POOL_MAXSIZE', 10)
+
+    @property
+    def REQUESTS_TIMEOUT(self):
+        """
+        The timeout for requests made to the providers, in seconds, or a
+        `(connect, read)` tuple
+        """
+        return self._setting('REQUESTS_TIMEOUT', 30)
+
+    @property
+    def SOCIALLOGIN_STASH(self):
+        """
+        Where a pending social login is kept while the user completes the
+        signup form, see `allauth.socialaccount.stash`
+        """
+        return self._setting('SOCIALLOGIN_STASH',
+                             'allauth.socialaccount.stash.SessionStash')
+
     @property
     def STORE_TOKENS(self):
         return self._setting('STORE_TOKENS', True)
@@ -1,36 +1,225 @@
 # Courtesy of django-social-auth
-import json
+import base64
+import zlib
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connections, models, router, transaction
 from django.utils import six
 
+try:
+    import importlib
+except ImportError:
+    from django.utils import importlib
+
 try:
     from django.utils.encoding import smart_unicode as smart_text
 except ImportError:
     from django.utils.encoding import smart_text
 
+from . import app_settings
+
+
+_codecs = {}
+
+
+def get_json_codec():
+    """
+    Returns the JSON codec configured by means of
+    `SOCIALACCOUNT_JSON_CODEC`: the dotted path to a module (or any
+    object) offering `loads()` and `dumps()`, e.g. `json` or `ujson`.
+    """
+    path = app_settings.JSON_CODEC
+    codec = _codecs.get(path)
+    if codec is None:
+        try:
+            codec = importlib.import_module(path)
+        except ImportError:
+            module, attr = path.rsplit('.', 1)
+            codec = getattr(importlib.import_module(module), attr)
+        _codecs[path] = codec
+    return codec
+
+
+# Key of the envelope that compressed JSON text is stored in, chosen so
+# as not to collide with keys of the data itself
+COMPRESSED_KEY = '__allauth.socialaccount.fields.zlib__'
+
+
+def compress_json(text):
+    """
+    Wraps (too large) JSON text into a JSON envelope holding the text,
+    compressed and base64 encoded.
+    """
+    data = base64.b64encode(zlib.compress(text.encode('utf-8')))
+    return get_json_codec().dumps({COMPRESSED_KEY: data.decode('ascii')})
+
+
+def decompress_json(value):
+    """
+    Unwraps the envelope produced by `compress_json()`, if `value` (the
+    decoded JSON) is one. Returns the decoded JSON.
+    """
+    if (isinstance(value, dict)
+            and len(value) == 1
+            and isinstance(value.get(COMPRESSED_KEY), six.string_types)):
+        data = zlib.decompress(base64.b64decode(value[COMPRESSED_KEY]))
+        value = get_json_codec().loads(data.decode('utf-8'))
+    return value
+
+
+class RawJSON(object):
+    """
+    JSON text as loaded from the database, not decoded yet.
+    """
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
 
-class JSONField(six.with_metaclass(models.SubfieldBase,
-                                   models.TextField)):
+class LazyJSONDescriptor(object):
+    """
+    Decodes the JSON text loaded from the database on first access only,
+    so that fetching rows does not pay for decoding values that are never
+    used. Values that were never accessed are saved back as is.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.field.attname]
+        if isinstance(value, RawJSON):
+            value = self.field.to_python(value.text)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        if isinstance(value, six.string_types):
+            value = RawJSON(value)
+        instance.__dict__[self.field.attname] = value
+
+
+class JSONField(models.TextField):
     """Simple JSON field that stores python structures as JSON strings
-    on database.
+    on database. With `SOCIALACCOUNT_JSON_STORAGE = "native"`, the
+    native JSON type of the database is used instead, where available.
+
+    Models can limit the size of the stored JSON by implementing
+    `get_<field name>_max_size()`, returning the maximum number of bytes
+    (or `None`). Larger values are stored compressed, unless stored
+    natively.
     """
+    native_db_types = {
+        'postgresql': 'jsonb',
+    }
+    # Maps (database alias, table, column) to the actual column type
+    _column_types = {}
+
+    def uses_native_storage(self, connection):
+        return (app_settings.JSON_STORAGE == 'native'
+                and connection.vendor in self.native_db_types)
+
+    def db_type(self, connection):
+        if self.uses_native_storage(connection):
+            return self.native_db_types[connection.vendor]
+        return super(JSONField, self).db_type(connection)
+
+    def get_column_type(self, connection, model):
+        """
+        Returns the actual type of the column in the database, which
+        differs from `db_type()` if `SOCIALACCOUNT_JSON_STORAGE` was
+        changed without converting the column. Only supported for the
+        databases offering a native JSON type.
+        """
+        key = (connection.alias, model._meta.db_table, self.column)
+        column_type = self._column_types.get(key)
+        if column_type is None:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT data_type'
+                               ' FROM information_schema.columns'
+                               ' WHERE table_schema = current_schema()'
+                               ' AND table_name = %s AND column_name = %s',
+                               [model._meta.db_table, self.column])
+                row = cursor.fetchone()
+            column_type = row[0] if row else None
+            self._column_types[key] = column_type
+        return column_type
+
+    def convert_storage(self, connection, model, native=None):
+        """
+        Converts the column, including the existing rows, to the storage
+        configured by means of `SOCIALACCOUNT_JSON_STORAGE` (or to native
+        storage or text, as per `native`). Compressed values are stored
+        uncompressed when converting to native storage, so that their
+        keys can be looked up. Returns the new column type, or `None` if
+        there was nothing to convert.
+        """
+        if connection.vendor not in self.native_db_types:
+            return None
+        if native is None:
+            native = self.uses_native_storage(connection)
+        if native:
+            db_type = self.native_db_types[connection.vendor]
+        else:
+            db_type = super(JSONField, self).db_type(connection)
+        if self.get_column_type(connection, model) == db_type:
+            return None
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        column = qn(self.column)
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute('ALTER TABLE %(table)s ALTER COLUMN %(column)s'
+                               ' TYPE %(type)s USING %(column)s::%(type)s'
+                               % {'table': table,
+                                  'column': column,
+                                  'type': db_type})
+                if native:
+                    pk = qn(model._meta.pk.column)
+                    cursor.execute('SELECT %s, %s::text FROM %s'
+                                   ' WHERE %s ? %%s'
+                                   % (pk, column, table, column),
+                                   [COMPRESSED_KEY])
+                    codec = get_json_codec()
+                    for pk_value, text in cursor.fetchall():
+                        value = decompress_json(codec.loads(text))
+                        cursor.execute('UPDATE %s SET %s = %%s WHERE %s = %%s'
+                                       % (table, column, pk),
+                                       [self.get_prep_value(value), pk_value])
+        self._column_types.pop(
+            (connection.alias, model._meta.db_table, self.column), None)
+        return db_type
+
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super(JSONField, self).contribute_to_class(cls, name, *args, **kwargs)
+        setattr(cls, self.name, LazyJSONDescriptor(self))
 
     def to_python(self, value):
         """
         Convert the input JSON value into python structures, raises
         django.core.exceptions.ValidationError if the data can't be converted.
         """
+        if isinstance(value, RawJSON):
+            value = value.text
         if self.blank and not value:
             return None
         if isinstance(value, six.string_types):
             try:
-                return json.loads(value)
+                return decompress_json(get_json_codec().loads(value))
             except Exception as e:
                 raise ValidationError(str(e))
         else:
+            # E.g. the dict the database driver decoded from native JSON
+            return decompress_json(value)
+
+    def from_db_value(self, value, expression, connection, context):
+        # JSON text is left as is, for the descriptor to decode lazily.
+        if isinstance(value, six.string_types):
             return value
+        return self.to_python(value)
 
     def validate(self, value, model_instance):
         """Check value is a valid JSON string, raise ValidationError on
@@ -38,24 +227,54 @@ class JSONField(six.with_metaclass(models.SubfieldBase,
         if isinstance(value, six.string_types):
             super(JSONField, self).validate(value, model_instance)
             try:
-                json.loads(value)
+                get_json_codec().loads(value)
             except Exception as e:
                 raise ValidationError(str(e))
 
     def get_prep_value(self, value):
         """Convert value to JSON string before save"""
+        if isinstance(value, RawJSON):
+            return value.text
         try:
-            return json.dumps(value)
+            ret = get_json_codec().dumps(value)
         except Exception as e:
             raise ValidationError(str(e))
+        if isinstance(ret, six.binary_type):
+            ret = ret.decode('utf-8')
+        return ret
+
+    def pre_save(self, model_instance, add):
+        text = self.value_from_object(model_instance)
+        get_max_size = getattr(model_instance,
+                               'get_%s_max_size' % self.name,
+                               None)
+        max_size = get_max_size() if get_max_size else None
+        if max_size:
+            # Natively stored values are not compressed, as that would
+            # rule out looking up their keys
+            connection = connections[router.db_for_write(
+                type(model_instance), instance=model_instance)]
+            if self.uses_native_storage(connection):
+                max_size = None
+        if max_size and len(text.encode('utf-8')) > max_size:
+            text = compress_json(text)
+        return RawJSON(text)
 
     def value_to_string(self, obj):
         """Return value from object converted to string properly"""
-        return smart_text(self.get_prep_value(self._get_val_from_obj(obj)))
+        return smart_text(self.value_from_object(obj))
 
     def value_from_object(self, obj):
-        """Return value dumped to string."""
-        return self.get_prep_value(self._get_val_from_obj(obj))
+        """Return value dumped to string. Bypasses the descriptor, so
+        that untouched values need not be decoded and encoded again."""
+        if self.attname in obj.__dict__:
+            value = obj.__dict__[self.attname]
+        else:
+            value = self.get_default()
+            if isinstance(value, six.string_types):
+                # JSON text, e.g. `default='{}'`
+                value = RawJSON(value)
+        return self.get_prep_value(value)
 
 
 try:
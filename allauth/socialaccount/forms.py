@@ -52,9 +52,10 @@ class DisconnectForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         self.request = kwargs.pop('request')
-        self.accounts = SocialAccount.objects.filter(user=self.request.user)
+        self.accounts = SocialAccount.objects.all_for_user(self.request.user)
         super(DisconnectForm, self).__init__(*args, **kwargs)
-        self.fields['account'].queryset = self.accounts
+        self.fields['account'].queryset = SocialAccount.objects.filter(
+            user=self.request.user)
 
     def clean(self):
         cleaned_data = super(DisconnectForm, self).clean()
@@ -66,6 +67,7 @@ class DisconnectForm(forms.Form):
     def save(self):
         account = self.cleaned_data['account']
         account.delete()
+        SocialAccount.objects.clear_cache_for_user(self.request.user)
         signals.social_account_removed.send(sender=SocialAccount,
                                             request=self.request,
                                             socialaccount=account)
@@ -18,15 +18,16 @@ from .models import SocialLogin
 from . import app_settings
 from . import signals
 from .adapter import get_adapter
+from .stash import get_stash
 
 
 def _process_signup(request, sociallogin):
-    auto_signup = get_adapter().is_auto_signup_allowed(request,
-                                                       sociallogin)
+    auto_signup = get_adapter(request).is_auto_signup_allowed(request,
+                                                              sociallogin)
     if not auto_signup:
-        request.session['socialaccount_sociallogin'] = sociallogin.serialize()
         url = reverse('socialaccount_signup')
         ret = HttpResponseRedirect(url)
+        get_stash().store(request, ret, sociallogin)
     else:
         # Ok, auto signup it is, at least the e-mail address is ok.
         # We still need to check the username though...
@@ -41,13 +42,13 @@ def _process_signup(request, sociallogin):
         # ("closed" rendering, create user, send email, in active
         # etc..)
         try:
-            if not get_adapter().is_open_for_signup(request,
-                                                    sociallogin):
+            if not get_adapter(request).is_open_for_signup(request,
+                                                           sociallogin):
                 return render(request,
                               "account/signup_closed.html")
         except ImmediateHttpResponse as e:
             return e.response
-        get_adapter().save_user(request, sociallogin, form=None)
+        get_adapter(request).save_user(request, sociallogin, form=None)
         ret = complete_social_signup(request, sociallogin)
     return ret
 
@@ -67,11 +68,11 @@ def render_authentication_error(request,
     try:
         if extra_context is None:
             extra_context = {}
-        get_adapter().authentication_error(request,
-                                           provider_id,
-                                           error=error,
-                                           exception=exception,
-                                           extra_context=extra_context)
+        get_adapter(request).authentication_error(request,
+                                                  provider_id,
+                                                  error=error,
+                                                  exception=exception,
+                                                  extra_context=extra_context)
     except ImmediateHttpResponse as e:
         return e.response
     if error == AuthError.CANCELLED:
@@ -118,7 +119,7 @@ def _add_social_account(request, sociallogin):
                                               sociallogin=sociallogin)
         except ImmediateHttpResponse as e:
             return e.response
-    default_next = get_adapter() \
+    default_next = get_adapter(request) \
         .get_connect_redirect_url(request,
                                   sociallogin.account)
     next_url = sociallogin.get_redirect_url(request) or default_next
@@ -130,7 +131,7 @@ def complete_social_login(request, sociallogin):
     assert not sociallogin.is_existing
     sociallogin.lookup(request)
     try:
-        get_adapter().pre_social_login(request, sociallogin)
+        get_adapter(request).pre_social_login(request, sociallogin)
         signals.pre_social_login.send(sender=SocialLogin,
                                       request=request,
                                       sociallogin=sociallogin)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+
+from allauth.socialaccount.models import get_social_account_model
+
+
+class Command(BaseCommand):
+    help = ('Converts the SocialAccount.extra_data column, including'
+            ' existing rows, to the storage type configured by means of'
+            ' SOCIALACCOUNT_JSON_STORAGE')
+
+    def handle(self, *args, **options):
+        SocialAccount = get_social_account_model()
+        connection = connections[router.db_for_write(SocialAccount)]
+        field = SocialAccount._meta.get_field('extra_data')
+        if connection.vendor not in field.native_db_types:
+            self.stdout.write('No native JSON type available on %s,'
+                              ' nothing to convert\n' % connection.vendor)
+            return
+        db_type = field.convert_storage(connection, SocialAccount)
+        if db_type is None:
+            self.stdout.write('%s.%s is stored as %s already\n'
+                              % (SocialAccount._meta.db_table,
+                                 field.column,
+                                 field.db_type(connection)))
+        else:
+            self.stdout.write('Converted %s.%s to %s\n'
+                              % (SocialAccount._meta.db_table,
+                                 field.column,
+                                 db_type))
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def convert_extra_data(apps, schema_editor, native=None):
+    SocialAccount = apps.get_model('socialaccount', 'SocialAccount')
+    if SocialAccount._meta.swapped:
+        return
+    SocialAccount._meta.get_field('extra_data').convert_storage(
+        schema_editor.connection, SocialAccount, native=native)
+
+
+def convert_extra_data_to_text(apps, schema_editor):
+    convert_extra_data(apps, schema_editor, native=False)
+
+
+class Migration(migrations.Migration):
+    """
+    Stores extra_data as configured by means of
+    SOCIALACCOUNT_JSON_STORAGE. Changing that setting later on requires
+    running the socialaccount_convert_extra_data management command.
+    """
+
+    dependencies = [
+        ('socialaccount', '0003_index_socialaccount_uid'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_extra_data, convert_extra_data_to_text),
+    ]
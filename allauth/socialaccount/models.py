@@ -1,7 +1,15 @@
 from __future__ import absolute_import
 
+import copy
+import re
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied, ImproperlyConfigured
-from django.db import models
+from django.db import connections, models, router
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth import authenticate
 from django.contrib.sites.models import Site
 from django.utils.encoding import python_2_unicode_compatible
@@ -13,6 +21,7 @@ except ImportError:
     from django.utils.encoding import force_unicode as force_text
 
 import allauth.app_settings
+from allauth.account.managers import UserCacheManagerMixin
 from allauth.account.models import EmailAddress
 from allauth.account.utils import get_next_redirect_url, setup_user_email
 from allauth.utils import (get_user_model, get_current_site,
@@ -56,11 +65,85 @@ def get_social_account_model():
         raise ImproperlyConfigured("SOCIAL_ACCOUNT_MODEL refers to model '%s' that has not been installed" % app_settings.SOCIAL_ACCOUNT_MODEL)
 
 
+SOCIALAPP_CACHE_TIMEOUT = 60 * 60 * 24
+SOCIALAPP_GENERATION_KEY = 'allauth.socialaccount.socialapp.generation'
+# Seconds a process trusts its copy of the generation before checking the
+# shared cache again, i.e. how long changes made by other processes may go
+# unnoticed
+SOCIALAPP_GENERATION_TTL = 5
+# Maximum number of apps remembered by this process
+SOCIALAPP_MAX_ENTRIES = 1000
+
+# Top level extra_data keys that can be looked up within the database
+EXTRA_DATA_KEY_REGEX = re.compile(r'^[\w.-]+$')
+
+# Apps resolved by this process: (model, site id, provider) -> (generation,
+# app), oldest first
+_socialapps = OrderedDict()
+# (generation, time it was last checked against the shared cache)
+_socialapp_generation = (None, 0)
+
+
+def _get_socialapp_generation():
+    global _socialapp_generation
+    generation, checked = _socialapp_generation
+    now = time.time()
+    if generation is None or now - checked >= SOCIALAPP_GENERATION_TTL:
+        generation = cache.get(SOCIALAPP_GENERATION_KEY)
+        if generation is None:
+            generation = _bump_socialapp_generation()
+        _socialapp_generation = (generation, now)
+    return generation
+
+
+def _bump_socialapp_generation():
+    global _socialapp_generation
+    generation = get_random_string(12)
+    cache.set(SOCIALAPP_GENERATION_KEY, generation, None)
+    _socialapp_generation = (generation, time.time())
+    _socialapps.clear()
+    return generation
+
+
+def _remember_socialapp(key, value):
+    _socialapps.pop(key, None)
+    _socialapps[key] = value
+    while len(_socialapps) > SOCIALAPP_MAX_ENTRIES:
+        try:
+            _socialapps.popitem(last=False)
+        except KeyError:
+            break
+
+
 class SocialAppManager(models.Manager):
     def get_current(self, provider, request=None):
+        """
+        Returns the app for `provider` on the current site. Resolved apps
+        are remembered, both by this process and in the cache shared
+        between processes, until any app changes (see
+        `_invalidate_socialapps()`), which bumps the generation that all
+        cached entries are tagged with. Processes look the generation up
+        at most once every `SOCIALAPP_GENERATION_TTL` seconds.
+        """
         site = get_current_site(request)
-        return self.get(sites__id=site.id,
-                        provider=provider)
+        opts = self.model._meta
+        key = ('%s.%s' % (opts.app_label, opts.model_name),
+               site.id,
+               provider)
+        generation = _get_socialapp_generation()
+        cached = _socialapps.get(key)
+        if cached is None or cached[0] != generation:
+            cache_key = 'allauth.socialaccount.socialapp.%s.%s.%s.%s' % (
+                (generation,) + key)
+            app = cache.get(cache_key)
+            if app is None:
+                app = self.get(sites__id=site.id,
+                               provider=provider)
+                cache.set(cache_key, app, SOCIALAPP_CACHE_TIMEOUT)
+            cached = (generation, app)
+            _remember_socialapp(key, cached)
+        # Hand out copies, the cached instance is shared between requests
+        return copy.copy(cached[1])
 
 
 @python_2_unicode_compatible
@@ -106,6 +189,21 @@ class SocialAppABC(models.Model):
 SocialAppABC._meta.swappable = 'SOCIALACCOUNT_SOCIAL_APP_MODEL'
 
 
+@receiver(post_save)
+@receiver(post_delete)
+def _invalidate_socialapps(sender, **kwargs):
+    if issubclass(sender, SocialAppABC):
+        _bump_socialapp_generation()
+
+
+@receiver(m2m_changed)
+def _invalidate_socialapps_sites(sender, instance, model, action, **kwargs):
+    if (action.startswith('post_')
+            and (isinstance(instance, SocialAppABC)
+                 or issubclass(model, SocialAppABC))):
+        _bump_socialapp_generation()
+
+
 class SocialApp(SocialAppABC):
     """
     Concrete SocialApp, and the default for `SOCIALACCOUNT_SOCIAL_APP_MODEL`.
@@ -116,8 +214,86 @@ class SocialApp(SocialAppABC):
     pass
 
 
+class SocialAccountManager(UserCacheManagerMixin, models.Manager):
+
+    user_cache_attr = '_socialaccount_cache'
+
+    def _get_extra_data_sql(self):
+        """
+        Returns the connection and (quoted) table and column names of
+        `extra_data`, making sure it is stored natively.
+        """
+        connection = connections[router.db_for_write(self.model)]
+        field = self.model._meta.get_field('extra_data')
+        if not field.uses_native_storage(connection):
+            raise ImproperlyConfigured(
+                'extra_data is not stored as native JSON, see'
+                ' SOCIALACCOUNT_JSON_STORAGE')
+        if (field.get_column_type(connection, self.model)
+                != field.db_type(connection)):
+            raise ImproperlyConfigured(
+                'extra_data has not been converted to native JSON yet,'
+                ' run the socialaccount_convert_extra_data management'
+                ' command')
+        qn = connection.ops.quote_name
+        return connection, qn(self.model._meta.db_table), qn(field.column)
+
+    def _get_extra_data_key_sql(self, key):
+        """
+        Returns the SQL expression looking up the (text) value of the
+        given top level `extra_data` key. The key is part of the SQL
+        itself rather than a query parameter, so that the expression is
+        the same as the one indexed by `create_extra_data_index()`.
+        """
+        if not EXTRA_DATA_KEY_REGEX.match(key):
+            raise ValueError('Invalid extra_data key: %r' % key)
+        connection, table, column = self._get_extra_data_sql()
+        return "(%s ->> '%s')" % (column, key.replace("'", "''"))
+
+    def _get_extra_data_index_name(self, key):
+        name = '%s_extra_data_%s' % (self.model._meta.db_table,
+                                     re.sub(r'[^a-z0-9_]', '_', key.lower()))
+        return name[:63]
+
+    def filter_extra_data(self, **kwargs):
+        """
+        Filters on the (text) values of top level `extra_data` keys,
+        within the database, e.g. `filter_extra_data(locale='nl_NL')`.
+        Requires native JSON storage.
+        """
+        where = []
+        params = []
+        for key, value in kwargs.items():
+            where.append('%s = %%s' % self._get_extra_data_key_sql(key))
+            params.append(force_text(value))
+        return self.get_queryset().extra(where=where, params=params)
+
+    def create_extra_data_index(self, key):
+        """
+        Creates an expression index on the given top level `extra_data`
+        key, speeding up `filter_extra_data()` on that key. Requires
+        native JSON storage.
+        """
+        expression = self._get_extra_data_key_sql(key)
+        connection, table, column = self._get_extra_data_sql()
+        index_name = connection.ops.quote_name(
+            self._get_extra_data_index_name(key))
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE INDEX %s ON %s (%s)'
+                           % (index_name, table, expression))
+
+    def drop_extra_data_index(self, key):
+        connection, table, column = self._get_extra_data_sql()
+        index_name = connection.ops.quote_name(
+            self._get_extra_data_index_name(key))
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX IF EXISTS %s' % index_name)
+
+
 @python_2_unicode_compatible
 class SocialAccountABC(models.Model):
+    objects = SocialAccountManager()
+
     user = models.ForeignKey(allauth.app_settings.USER_MODEL, related_name="%(app_label)s_%(class)s_set" )
     provider = models.CharField(verbose_name=_('provider'),
                                 max_length=30,
@@ -151,6 +327,15 @@ class SocialAccountABC(models.Model):
         verbose_name_plural = _('social accounts')
         abstract = True
 
+    def save(self, *args, **kwargs):
+        super(SocialAccountABC, self).save(*args, **kwargs)
+        type(self).objects.cache_instance(self)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        super(SocialAccountABC, self).delete(*args, **kwargs)
+        type(self).objects.uncache_instance(self, pk)
+
     def authenticate(self):
         return authenticate(account=self)
 
@@ -166,6 +351,15 @@ class SocialAccountABC(models.Model):
     def get_provider(self):
         return providers.registry.by_id(self.provider)
 
+    def get_extra_data_max_size(self):
+        """
+        The number of bytes above which `extra_data` is stored compressed,
+        as configured by means of the `EXTRA_DATA_MAX_SIZE` provider
+        setting.
+        """
+        return app_settings.PROVIDERS.get(self.provider, {}) \
+            .get('EXTRA_DATA_MAX_SIZE')
+
     def get_provider_account(self):
         return self.get_provider().wrap_account(self)
 
@@ -315,11 +509,14 @@ class SocialLogin(object):
             app = SocialApp.objects.get_current(provider=self.account.provider,
                                                 request=request)
             a = SocialAccount.objects.get(app=app, uid=self.account.uid)
-            # Update account
-            a.extra_data = self.account.extra_data
+            # Update account, only rewriting extra_data if it changed
+            update_fields = ['last_login']
+            if a.extra_data != self.account.extra_data:
+                a.extra_data = self.account.extra_data
+                update_fields.append('extra_data')
             self.account = a
             self.user = self.account.user
-            a.save()
+            a.save(update_fields=update_fields)
             # Update token
             if app_settings.STORE_TOKENS and self.token:
                 assert not self.token.pk
@@ -1,40 +1,198 @@
+from collections import OrderedDict
+
 from django.conf import settings
+from django.core.urlresolvers import RegexURLResolver
+from django.utils import six
+from django.utils.encoding import force_text
+from django.utils.functional import lazy
 
 try:
     import importlib
 except ImportError:
     from django.utils import importlib
 
+from django.utils.module_loading import module_has_submodule
+
+
+# The providers shipped with allauth: package -> provider id. Knowing
+# these up front allows for listing the installed providers without
+# importing any of them.
+PROVIDER_MANIFEST = {
+    'allauth.socialaccount.providers.amazon': 'amazon',
+    'allauth.socialaccount.providers.angellist': 'angellist',
+    'allauth.socialaccount.providers.baidu': 'baidu',
+    'allauth.socialaccount.providers.bitbucket': 'bitbucket',
+    'allauth.socialaccount.providers.bitly': 'bitly',
+    'allauth.socialaccount.providers.coinbase': 'coinbase',
+    'allauth.socialaccount.providers.douban': 'douban',
+    'allauth.socialaccount.providers.dropbox': 'dropbox',
+    'allauth.socialaccount.providers.dropbox_oauth2': 'dropbox_oauth2',
+    'allauth.socialaccount.providers.edmodo': 'edmodo',
+    'allauth.socialaccount.providers.evernote': 'evernote',
+    'allauth.socialaccount.providers.facebook': 'facebook',
+    'allauth.socialaccount.providers.feedly': 'feedly',
+    'allauth.socialaccount.providers.flickr': 'flickr',
+    'allauth.socialaccount.providers.foursquare': 'foursquare',
+    'allauth.socialaccount.providers.fxa': 'fxa',
+    'allauth.socialaccount.providers.github': 'github',
+    'allauth.socialaccount.providers.google': 'google',
+    'allauth.socialaccount.providers.hubic': 'hubic',
+    'allauth.socialaccount.providers.instagram': 'instagram',
+    'allauth.socialaccount.providers.linkedin': 'linkedin',
+    'allauth.socialaccount.providers.linkedin_oauth2': 'linkedin_oauth2',
+    'allauth.socialaccount.providers.mailru': 'mailru',
+    'allauth.socialaccount.providers.odnoklassniki': 'odnoklassniki',
+    'allauth.socialaccount.providers.openid': 'openid',
+    'allauth.socialaccount.providers.orcid': 'orcid',
+    'allauth.socialaccount.providers.paypal': 'paypal',
+    'allauth.socialaccount.providers.persona': 'persona',
+    'allauth.socialaccount.providers.soundcloud': 'soundcloud',
+    'allauth.socialaccount.providers.spotify': 'spotify',
+    'allauth.socialaccount.providers.stackexchange': 'stackexchange',
+    'allauth.socialaccount.providers.tumblr': 'tumblr',
+    'allauth.socialaccount.providers.twitch': 'twitch',
+    'allauth.socialaccount.providers.twitter': 'twitter',
+    'allauth.socialaccount.providers.vimeo': 'vimeo',
+    'allauth.socialaccount.providers.vk': 'vk',
+    'allauth.socialaccount.providers.weibo': 'weibo',
+    'allauth.socialaccount.providers.windowslive': 'windowslive',
+    'allauth.socialaccount.providers.xing': 'xing',
+}
+
+
+class ProviderChoices(object):
+    """
+    Lazily evaluated `(id, name)` choices of the installed providers, so
+    that defining a model field does not load the registry. The names
+    are lazy as well, importing the provider when rendered.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def __iter__(self):
+        self.registry.load()
+        get_name = lazy(self.registry.get_name, six.text_type)
+        for id in self.registry.provider_packages:
+            yield (id, get_name(id))
+
 
 class ProviderRegistry(object):
+    """
+    Keeps track of the installed providers. The providers shipped with
+    allauth are known by means of `PROVIDER_MANIFEST`, and imported on
+    first use only. Other apps in `INSTALLED_APPS` that contain a
+    `provider` module are imported when the registry loads.
+    """
+
     def __init__(self):
         self.provider_map = {}
+        # Provider id -> package, in INSTALLED_APPS order
+        self.provider_packages = OrderedDict()
         self.loaded = False
 
     def get_list(self):
         self.load()
-        return self.provider_map.values()
+        return [self.by_id(id) for id in self.provider_packages]
+
+    def get_packages(self):
+        """
+        Returns the packages of the installed providers, without
+        importing them.
+        """
+        self.load()
+        return list(self.provider_packages.values())
 
     def register(self, cls):
         self.provider_map[cls.id] = cls()
+        if self.loaded and cls.id not in self.provider_packages:
+            self.provider_packages[cls.id] = cls.package
 
     def by_id(self, id):
-        self.load()
-        return self.provider_map[id]
+        provider = self.provider_map.get(id)
+        if provider is None:
+            self.load()
+            package = self.provider_packages[id]
+            importlib.import_module(package + '.provider')
+            provider = self.provider_map[id]
+        return provider
+
+    def get_name(self, id):
+        return self.by_id(id).name
 
     def as_choices(self):
-        self.load()
-        for provider in self.get_list():
-            yield (provider.id, provider.name)
+        return ProviderChoices(self)
 
     def load(self):
-        if not self.loaded:
-            for app in settings.INSTALLED_APPS:
-                provider_module = app + '.provider'
-                try:
-                    importlib.import_module(provider_module)
-                except ImportError:
-                    pass
-            self.loaded = True
+        if self.loaded:
+            return
+        for app in settings.INSTALLED_APPS:
+            if app in PROVIDER_MANIFEST:
+                self.provider_packages[PROVIDER_MANIFEST[app]] = app
+                continue
+            try:
+                module = importlib.import_module(app)
+            except ImportError:
+                continue
+            if module_has_submodule(module, 'provider'):
+                importlib.import_module(app + '.provider')
+        for id, provider in self.provider_map.items():
+            if id not in self.provider_packages:
+                self.provider_packages[id] = provider.package
+        self.loaded = True
+
+
+def get_provider_urlpatterns(package):
+    try:
+        urls = importlib.import_module(package + '.urls')
+    except ImportError:
+        return []
+    return getattr(urls, 'urlpatterns', None) or []
+
+
+class ProviderURLResolver(RegexURLResolver):
+    """
+    Resolves the URLs of all installed providers, which are of the form
+    `<provider id>/...`. Instead of trying the patterns of all providers
+    in turn, the provider is looked up in the registry by the first path
+    segment, after which only the patterns of that provider are tried
+    (and its URLconf is imported, if it was not already). Paths that do
+    not start with a provider id are matched against all patterns.
+    Reversing works as usual.
+    """
+
+    def __init__(self, registry):
+        super(ProviderURLResolver, self).__init__(r'^', None)
+        self.registry = registry
+        self._all_patterns = None
+        self._resolvers = {}
+
+    @property
+    def url_patterns(self):
+        if self._all_patterns is None:
+            patterns = []
+            for package in self.registry.get_packages():
+                patterns.extend(get_provider_urlpatterns(package))
+            self._all_patterns = patterns
+        return self._all_patterns
+
+    def get_resolver(self, provider_id):
+        resolver = self._resolvers.get(provider_id)
+        if resolver is None:
+            self.registry.load()
+            if provider_id in self.registry.provider_packages:
+                patterns = get_provider_urlpatterns(
+                    self.registry.provider_packages[provider_id])
+            else:
+                provider_id, patterns = None, self.url_patterns
+            resolver = self._resolvers.setdefault(
+                provider_id,
+                RegexURLResolver(r'^', patterns))
+        return resolver
+
+    def resolve(self, path):
+        provider_id = force_text(path).split('/', 1)[0]
+        return self.get_resolver(provider_id).resolve(path)
+
 
 registry = ProviderRegistry()
@@ -1,4 +1,4 @@
-import requests
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -15,7 +15,7 @@ class AmazonOAuth2Adapter(OAuth2Adapter):
     redirect_uri_protocol = 'https'
 
     def complete_login(self, request, app, token, **kwargs):
-        response = requests.get(
+        response = httpclient.get(
             self.profile_url,
             params={'access_token': token})
         extra_data = response.json()
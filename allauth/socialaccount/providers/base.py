@@ -66,7 +66,8 @@ class Provider(object):
         SocialAccount = get_social_account_model()
         adapter = get_adapter()
         uid = self.extract_uid(response)
-        extra_data = self.extract_extra_data(response)
+        extra_data = self.project_extra_data(
+            self.extract_extra_data(response))
         common_fields = self.extract_common_fields(response)
         socialaccount = SocialAccount(extra_data=extra_data,
                                       uid=uid,
@@ -98,6 +99,18 @@ class Provider(object):
         """
         return data
 
+    def project_extra_data(self, extra_data):
+        """
+        Limits `extra_data` to the keys whitelisted by means of the
+        `EXTRA_DATA_FIELDS` provider setting, if any.
+        """
+        fields = self.get_settings().get('EXTRA_DATA_FIELDS')
+        if fields is None or not isinstance(extra_data, dict):
+            return extra_data
+        return dict((key, extra_data[key])
+                    for key in fields
+                    if key in extra_data)
+
     def extract_common_fields(self, data):
         """
         Extracts fields from `data` that will be used to populate the
@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -15,7 +14,7 @@ class BitlyOAuth2Adapter(OAuth2Adapter):
     supports_state = False
 
     def complete_login(self, request, app, token, **kwargs):
-        resp = requests.get(
+        resp = httpclient.get(
             self.profile_url,
             params={'access_token': token.token}
         )
@@ -1,4 +1,4 @@
-import requests
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -21,8 +21,8 @@ class CoinbaseOAuth2Adapter(OAuth2Adapter):
         return 'https://coinbase.com/api/v1/users'
 
     def complete_login(self, request, app, token, **kwargs):
-        response = requests.get(self.profile_url,
-                                params={'access_token': token})
+        response = httpclient.get(self.profile_url,
+                                  params={'access_token': token})
         extra_data = response.json()['users'][0]['user']
         return self.get_provider().sociallogin_from_response(request, extra_data)
 
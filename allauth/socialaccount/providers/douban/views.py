@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -15,7 +14,7 @@ class DoubanOAuth2Adapter(OAuth2Adapter):
 
     def complete_login(self, request, app, token, **kwargs):
         headers = {'Authorization': 'Bearer %s' % token.token}
-        resp = requests.get(self.profile_url, headers=headers)
+        resp = httpclient.get(self.profile_url, headers=headers)
         extra_data = resp.json()
         return self.get_provider().sociallogin_from_response(
             request, extra_data)
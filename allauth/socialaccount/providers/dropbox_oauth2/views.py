@@ -1,7 +1,7 @@
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
-import requests
 
 from .provider import DropboxOAuth2Provider
 
@@ -14,7 +14,7 @@ class DropboxOAuth2Adapter(OAuth2Adapter):
     redirect_uri_protocol = 'https'
 
     def complete_login(self, request, app, token, **kwargs):
-        extra_data = requests.get(self.profile_url, params={
+        extra_data = httpclient.get(self.profile_url, params={
             'access_token': token.token
         })
 
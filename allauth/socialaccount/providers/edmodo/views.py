@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -15,8 +14,8 @@ class EdmodoOAuth2Adapter(OAuth2Adapter):
     profile_url = 'https://api.edmodo.com/users/me'
 
     def complete_login(self, request, app, token, **kwargs):
-        resp = requests.get(self.profile_url,
-                            params={'access_token': token.token})
+        resp = httpclient.get(self.profile_url,
+                              params={'access_token': token.token})
         extra_data = resp.json()
         return self.get_provider().sociallogin_from_response(request,
                                                              extra_data)
@@ -37,14 +37,41 @@ def _build_locale_table(filename_or_file):
     return locale_map
 
 
-def get_default_locale_callable():
+def _generate_locale_table_module():
     """
-    Wrapper function so that the default mapping is only built when needed
+    (Re)generates the `locale_table` module from FacebookLocales.xml, so
+    that the XML file does not need to be parsed at runtime. Run this
+    whenever the XML file is updated.
     """
     exec_dir = os.path.dirname(os.path.realpath(__file__))
     xml_path = os.path.join(exec_dir, 'data', 'FacebookLocales.xml')
+    locale_map = _build_locale_table(xml_path)
+    lines = [
+        '# Generated from data/FacebookLocales.xml by',
+        '# locale._generate_locale_table_module(), do not edit.',
+        '',
+        '# Language -> (default region, available regions)',
+        'LOCALE_TABLE = {',
+    ]
+    for lang in sorted(locale_map):
+        lang_map = locale_map[lang]
+        regs = tuple(map(str, lang_map['regs']))
+        lines.append('    %r: (%r, %r),'
+                     % (str(lang), str(lang_map['default']), regs))
+    lines.append('}')
+    with open(os.path.join(exec_dir, 'locale_table.py'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def get_default_locale_callable():
+    """
+    Wrapper function so that the default mapping is only loaded when
+    needed. The mapping is precompiled into the `locale_table` module.
+    """
+    from .locale_table import LOCALE_TABLE
 
-    fb_locales = _build_locale_table(xml_path)
+    # Django language -> chosen FB locale
+    chosen_locales = {}
 
     def default_locale(request):
         """
@@ -53,18 +80,24 @@ def get_default_locale_callable():
         it tries to return another locale with the same language. If there
         isn't one avaible, 'en_US' is returned.
         """
-        locale = to_locale(get_language())
+        language = get_language()
+        chosen = chosen_locales.get(language)
+        if chosen is not None:
+            return chosen
+        locale = to_locale(language)
         lang, _, reg = locale.partition('_')
 
-        lang_map = fb_locales.get(lang)
+        lang_map = LOCALE_TABLE.get(lang)
         if lang_map is not None:
-            if reg in lang_map['regs']:
+            default_reg, regs = lang_map
+            if reg in regs:
                 chosen = lang + '_' + reg
             else:
-                chosen = lang + '_' + lang_map['default']
+                chosen = lang + '_' + default_reg
         else:
             chosen = 'en_US'
 
+        chosen_locales[language] = chosen
         return chosen
 
     return default_locale
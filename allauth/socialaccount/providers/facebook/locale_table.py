@@ -0,0 +1,75 @@
+# Generated from data/FacebookLocales.xml by
+# locale._generate_locale_table_module(), do not edit.
+
+# Language -> (default region, available regions)
+LOCALE_TABLE = {
+    'af': ('ZA', ('ZA',)),
+    'ar': ('AR', ('AR',)),
+    'az': ('AZ', ('AZ',)),
+    'be': ('BY', ('BY',)),
+    'bg': ('BG', ('BG',)),
+    'bn': ('IN', ('IN',)),
+    'bs': ('BA', ('BA',)),
+    'ca': ('ES', ('ES',)),
+    'cs': ('CZ', ('CZ',)),
+    'cy': ('GB', ('GB',)),
+    'da': ('DK', ('DK',)),
+    'de': ('DE', ('DE',)),
+    'el': ('GR', ('GR',)),
+    'en': ('US', ('GB', 'PI', 'UD', 'US')),
+    'eo': ('EO', ('EO',)),
+    'es': ('LA', ('ES', 'LA')),
+    'et': ('EE', ('EE',)),
+    'eu': ('ES', ('ES',)),
+    'fa': ('IR', ('IR',)),
+    'fb': ('LT', ('LT',)),
+    'fi': ('FI', ('FI',)),
+    'fo': ('FO', ('FO',)),
+    'fr': ('FR', ('CA', 'FR')),
+    'fy': ('NL', ('NL',)),
+    'ga': ('IE', ('IE',)),
+    'gl': ('ES', ('ES',)),
+    'he': ('IL', ('IL',)),
+    'hi': ('IN', ('IN',)),
+    'hr': ('HR', ('HR',)),
+    'hu': ('HU', ('HU',)),
+    'hy': ('AM', ('AM',)),
+    'id': ('ID', ('ID',)),
+    'is': ('IS', ('IS',)),
+    'it': ('IT', ('IT',)),
+    'ja': ('JP', ('JP',)),
+    'ka': ('GE', ('GE',)),
+    'km': ('KH', ('KH',)),
+    'ko': ('KR', ('KR',)),
+    'ku': ('TR', ('TR',)),
+    'la': ('VA', ('VA',)),
+    'lt': ('LT', ('LT',)),
+    'lv': ('LV', ('LV',)),
+    'mk': ('MK', ('MK',)),
+    'ml': ('IN', ('IN',)),
+    'ms': ('MY', ('MY',)),
+    'nb': ('NO', ('NO',)),
+    'ne': ('NP', ('NP',)),
+    'nl': ('NL', ('NL',)),
+    'nn': ('NO', ('NO',)),
+    'pa': ('IN', ('IN',)),
+    'pl': ('PL', ('PL',)),
+    'ps': ('AF', ('AF',)),
+    'pt': ('PT', ('BR', 'PT')),
+    'ro': ('RO', ('RO',)),
+    'ru': ('RU', ('RU',)),
+    'sk': ('SK', ('SK',)),
+    'sl': ('SI', ('SI',)),
+    'sq': ('AL', ('AL',)),
+    'sr': ('RS', ('RS',)),
+    'sv': ('SE', ('SE',)),
+    'sw': ('KE', ('KE',)),
+    'ta': ('IN', ('IN',)),
+    'te': ('IN', ('IN',)),
+    'th': ('TH', ('TH',)),
+    'tl': ('PH', ('PH',)),
+    'tr': ('TR', ('TR',)),
+    'uk': ('UA', ('UA',)),
+    'vi': ('VN', ('VN',)),
+    'zh': ('CN', ('CN', 'HK', 'TW')),
+}
@@ -1,14 +1,18 @@
 import json
+import re
+from collections import OrderedDict
+
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ImproperlyConfigured
+from django.dispatch import receiver
 from django.middleware.csrf import get_token
 from django.template.loader import render_to_string
 from django.template import RequestContext
 from django.utils.html import mark_safe, escapejs
 from django.utils.crypto import get_random_string
 
-from allauth.utils import import_callable
+from allauth.utils import import_callable, setting_changed
 from allauth.account.models import EmailAddress
 from allauth.socialaccount import providers
 from allauth.socialaccount.providers.base import (ProviderAccount,
@@ -31,6 +35,52 @@ GRAPH_API_URL = 'https://graph.facebook.com/' + GRAPH_API_VERSION
 NONCE_SESSION_KEY = 'allauth_facebook_nonce'
 NONCE_LENGTH = 32
 
+# Rendered `media_js()` snippets by app, locale and host, oldest first,
+# see `FacebookProvider.media_js()`
+MEDIA_JS_CACHE_SIZE = 1000
+_media_js_cache = OrderedDict()
+
+# Stand-ins for the request specific parts of `fb_data` while rendering
+# the snippet that is shared between requests
+MEDIA_JS_PLACEHOLDERS = {
+    'csrfToken': json.dumps('allauth-facebook-csrf-token'),
+    'loginOptions': json.dumps('allauth-facebook-login-options'),
+}
+MEDIA_JS_PLACEHOLDER_REGEX = re.compile(
+    '(%s)' % '|'.join(re.escape(placeholder)
+                      for placeholder in MEDIA_JS_PLACEHOLDERS.values()))
+
+
+@receiver(setting_changed)
+def _clear_media_js_cache(**kwargs):
+    _media_js_cache.clear()
+
+
+def _cache_set(cache, key, value):
+    cache.pop(key, None)
+    cache[key] = value
+    while len(cache) > MEDIA_JS_CACHE_SIZE:
+        try:
+            cache.popitem(last=False)
+        except KeyError:
+            break
+
+
+def _split_media_js(html):
+    """
+    Splits the snippet rendered with `MEDIA_JS_PLACEHOLDERS` into the
+    static text and, in between, the names of the values to splice in.
+    Returns None if the template does not output each placeholder
+    exactly once (i.e. it does more with `fb_data` than output it as is).
+    """
+    parts = MEDIA_JS_PLACEHOLDER_REGEX.split(html)
+    if sorted(parts[1::2]) != sorted(MEDIA_JS_PLACEHOLDERS.values()):
+        return None
+    names = dict((placeholder, name)
+                 for name, placeholder in MEDIA_JS_PLACEHOLDERS.items())
+    parts[1::2] = [names[placeholder] for placeholder in parts[1::2]]
+    return parts
+
 
 class FacebookAccount(ProviderAccount):
     def get_profile_url(self):
@@ -127,6 +177,15 @@ class FacebookProvider(OAuth2Provider):
         return ret
 
     def media_js(self, request):
+        """
+        The snippet only differs per request as far as the CSRF token and
+        login options (nonce) are concerned. It is therefore rendered
+        once per app, locale and host, after which only those are spliced
+        in. As that rendering is shared between users, it gets `fb_data`
+        only, without the request context (context processors).
+        Templates that transform `fb_data` instead of outputting it as is
+        are rendered on every request, with the request context.
+        """
         locale = self.get_locale_for_request(request)
         try:
             app = self.get_app(request)
@@ -135,12 +194,36 @@ class FacebookProvider(OAuth2Provider):
                                        " add a SocialApp using the Django"
                                        " admin")
 
+        values = {
+            'csrfToken': get_token(request),
+            'loginOptions': self.get_fb_login_options(request),
+        }
+        key = (app.pk, app.client_id, locale,
+               request.is_secure(), request.get_host())
+        try:
+            parts = _media_js_cache[key]
+        except KeyError:
+            parts = _split_media_js(self._render_media_js(
+                request, app, locale,
+                dict((name, json.loads(placeholder))
+                     for name, placeholder
+                     in MEDIA_JS_PLACEHOLDERS.items()),
+                shared=True))
+            _cache_set(_media_js_cache, key, parts)
+        if parts is None:
+            html = self._render_media_js(request, app, locale, values)
+        else:
+            html = ''.join(json.dumps(values[part], sort_keys=True)
+                           if i % 2 else part
+                           for i, part in enumerate(parts))
+        return mark_safe(html)
+
+    def _render_media_js(self, request, app, locale, values, shared=False):
         abs_uri = lambda name: request.build_absolute_uri(reverse(name))
         fb_data = {
             "appId": app.client_id,
             "version": GRAPH_API_VERSION,
             "locale": locale,
-            "loginOptions": self.get_fb_login_options(request),
             "loginByTokenUrl": abs_uri('facebook_login_by_token'),
             "cancelUrl": abs_uri('socialaccount_login_cancelled'),
             "logoutUrl": abs_uri('account_logout'),
@@ -148,9 +231,11 @@ class FacebookProvider(OAuth2Provider):
                 request,
                 method='oauth2')),
             "errorUrl": abs_uri('socialaccount_login_error'),
-            "csrfToken": get_token(request)
         }
-        ctx = {'fb_data': mark_safe(json.dumps(fb_data))}
+        fb_data.update(values)
+        ctx = {'fb_data': mark_safe(json.dumps(fb_data, sort_keys=True))}
+        if shared:
+            return render_to_string('facebook/fbconnect.html', ctx)
         return render_to_string('facebook/fbconnect.html',
                                 ctx,
                                 RequestContext(request))
@@ -3,9 +3,18 @@ try:
 except ImportError:
     from unittest.mock import patch
 import json
+import os
+import shutil
+import tempfile
 
+from django.conf import settings
 from django.core.urlresolvers import reverse
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.html import escapejs, mark_safe
+from django.test import TestCase
 from django.test.utils import override_settings
+from django.template import RequestContext
 from django.test.client import RequestFactory
 
 from allauth.socialaccount.tests import create_oauth2_tests
@@ -16,7 +25,10 @@ from allauth.account import app_settings as account_settings
 from allauth.account.models import EmailAddress
 from allauth.utils import get_user_model
 
-from .provider import FacebookProvider
+from . import locale
+from .locale_table import LOCALE_TABLE
+from . import provider as facebook_provider
+from .provider import FacebookProvider, _media_js_cache
 
 from allauth.socialaccount.models import get_social_account_model
 SocialAccount = get_social_account_model()
@@ -70,6 +82,11 @@ class FacebookTests(create_oauth2_tests(registry.by_id(FacebookProvider.id))):
         socialaccount = SocialAccount.objects.get(uid='630595557')
         self.assertEqual(socialaccount.user.username, 'raymond.penners')
 
+    def get_fb_data(self, content):
+        content = content.decode('utf-8')
+        start = content.index('type="application/json">') + 24
+        return json.loads(content[start:content.index('</script>', start)])
+
     def test_media_js(self):
         provider = providers.registry.by_id(FacebookProvider.id)
         request = RequestFactory().get(reverse('account_login'))
@@ -77,10 +94,98 @@ class FacebookTests(create_oauth2_tests(registry.by_id(FacebookProvider.id))):
         script = provider.media_js(request)
         self.assertTrue('"appId": "app123id"' in script)
 
+    def media_js(self, tokens, **kwargs):
+        provider = providers.registry.by_id(FacebookProvider.id)
+        _media_js_cache.clear()
+        scripts = []
+        with patch('allauth.socialaccount.providers.facebook.provider'
+                   '.render_to_string',
+                   **kwargs) as render_mock:
+            for token in tokens:
+                request = RequestFactory().get(reverse('account_login'))
+                request.session = {}
+                request.META['CSRF_COOKIE'] = token
+                scripts.append(provider.media_js(request))
+        return render_mock, scripts
+
+    def test_media_js_cached(self):
+        render_mock, scripts = self.media_js(['token0', 'token1', 'token0'],
+                                             wraps=render_to_string)
+        # Rendered once, after which only the request specific parts are
+        # spliced in. As that rendering is shared between users, it does
+        # not get the request context.
+        self.assertEqual(render_mock.call_count, 1)
+        self.assertEqual(len(render_mock.call_args[0]), 2)
+        fb_data = [self.get_fb_data(script.encode('utf-8'))
+                   for script in scripts]
+        self.assertEqual(fb_data[0]['appId'], 'app123id')
+        self.assertEqual([data['csrfToken'] for data in fb_data],
+                         ['token0', 'token1', 'token0'])
+        self.assertEqual(fb_data[0]['loginOptions'], {'scope': ''})
+        self.assertEqual(
+            scripts[1],
+            render_to_string('facebook/fbconnect.html',
+                             {'fb_data': mark_safe(json.dumps(
+                                 fb_data[1], sort_keys=True))}))
+
+    def test_media_js_transformed_fb_data(self):
+        # Templates that do not output fb_data as is get it in full, on
+        # every request (after a first render with the placeholders)
+        render_mock, scripts = self.media_js(
+            ['token0', 'token1'],
+            side_effect=lambda name, ctx, context_instance=None: (
+                'allauth.facebook.init("%s");' % escapejs(ctx['fb_data'])))
+        self.assertEqual(render_mock.call_count, 3)
+        self.assertTrue('token1' in scripts[1])
+        self.assertEqual(
+            json.loads(render_mock.call_args[0][1]['fb_data'])['csrfToken'],
+            'token1')
+        self.assertTrue(isinstance(render_mock.call_args[0][2],
+                                   RequestContext))
+
+    def test_media_js_shared_without_request_context(self):
+        # Values from context processors must not end up in the snippet
+        # that is served to everyone
+        template_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, template_dir)
+        os.mkdir(os.path.join(template_dir, 'facebook'))
+        with open(os.path.join(template_dir, 'facebook',
+                               'fbconnect.html'), 'w') as f:
+            f.write('{{ fb_data }}<p>{{ user }}</p>')
+        if hasattr(settings, 'TEMPLATES'):
+            templates = [dict(settings.TEMPLATES[0], DIRS=[template_dir])]
+            override = override_settings(TEMPLATES=templates)
+        else:
+            override = override_settings(TEMPLATE_DIRS=[template_dir])
+        provider = providers.registry.by_id(FacebookProvider.id)
+        scripts = []
+        with override:
+            for username in ['john', 'jane']:
+                request = RequestFactory().get(reverse('account_login'))
+                request.session = {}
+                request.user = get_user_model()(username=username)
+                scripts.append(provider.media_js(request))
+        for script in scripts:
+            self.assertTrue(script.endswith('<p></p>'))
+            fb_data = json.loads(script[:-len('<p></p>')])
+            self.assertEqual(fb_data['appId'], 'app123id')
+
+    def test_media_js_cache_size(self):
+        provider = providers.registry.by_id(FacebookProvider.id)
+        _media_js_cache.clear()
+        with patch.object(facebook_provider, 'MEDIA_JS_CACHE_SIZE', 2):
+            for host in ['a.org', 'b.org', 'c.org']:
+                request = RequestFactory().get(reverse('account_login'),
+                                               HTTP_HOST=host)
+                request.session = {}
+                provider.media_js(request)
+        self.assertEqual([key[-1] for key in _media_js_cache],
+                         ['b.org', 'c.org'])
+
     def test_login_by_token(self):
         resp = self.client.get(reverse('account_login'))
         with patch('allauth.socialaccount.providers.facebook.views'
-                   '.requests') as requests_mock:
+                   '.httpclient') as requests_mock:
             mocks = [self.get_mocked_response().json()]
             requests_mock.get.return_value.json \
                 = lambda: mocks.pop()
@@ -96,9 +201,9 @@ class FacebookTests(create_oauth2_tests(registry.by_id(FacebookProvider.id))):
                 'VERIFIED_EMAIL': False}})
     def test_login_by_token_reauthenticate(self):
         resp = self.client.get(reverse('account_login'))
-        nonce = json.loads(resp.context['fb_data'])['loginOptions']['auth_nonce']
+        nonce = self.get_fb_data(resp.content)['loginOptions']['auth_nonce']
         with patch('allauth.socialaccount.providers.facebook.views'
-                   '.requests') as requests_mock:
+                   '.httpclient') as requests_mock:
             mocks = [self.get_mocked_response().json(),
                      {'auth_nonce': nonce}]
             requests_mock.get.return_value.json \
@@ -123,3 +228,25 @@ class FacebookTests(create_oauth2_tests(registry.by_id(FacebookProvider.id))):
     def _login_verified(self):
         resp = self.login(self.get_mocked_response())
         return EmailAddress.objects.get(email='raymond.penners@gmail.com')
+
+
+class LocaleTests(TestCase):
+
+    def test_locale_table(self):
+        xml_path = os.path.join(os.path.dirname(locale.__file__),
+                                'data',
+                                'FacebookLocales.xml')
+        locale_map = locale._build_locale_table(xml_path)
+        self.assertEqual(
+            dict((lang, (lang_map['default'], tuple(lang_map['regs'])))
+                 for lang, lang_map in locale_map.items()),
+            LOCALE_TABLE)
+
+    def test_default_locale(self):
+        default_locale = locale.get_default_locale_callable()
+        for language, expected in [('nl', 'nl_NL'),
+                                   ('es-ar', 'es_LA'),
+                                   ('pt-br', 'pt_BR'),
+                                   ('xx', 'en_US')]:
+            with translation.override(language):
+                self.assertEqual(default_locale(None), expected)
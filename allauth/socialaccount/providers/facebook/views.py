@@ -7,6 +7,7 @@ from allauth.socialaccount.models import (SocialLogin,
 from allauth.socialaccount.helpers import complete_social_login
 from allauth.socialaccount.helpers import render_authentication_error
 from allauth.socialaccount import providers
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -20,7 +21,7 @@ logger = logging.getLogger(__name__)
 
 def fb_complete_login(request, app, token):
     provider = providers.registry.by_id(FacebookProvider.id)
-    resp = requests.get(
+    resp = httpclient.get(
         GRAPH_API_URL + '/me',
         params={
             'fields': ','.join(provider.get_fields()),
@@ -60,7 +61,7 @@ def login_by_token(request):
                     .get_app(request)
                 access_token = form.cleaned_data['access_token']
                 if login_options.get('auth_type') == 'reauthenticate':
-                    info = requests.get(
+                    info = httpclient.get(
                         GRAPH_API_URL + '/oauth/access_token_info',
                         params={'client_id': app.client_id,
                                 'access_token': access_token}).json()
@@ -69,7 +70,7 @@ def login_by_token(request):
                 else:
                     ok = True
                 if ok and provider.get_settings().get('EXCHANGE_TOKEN'):
-                    resp = requests.get(
+                    resp = httpclient.get(
                         GRAPH_API_URL + '/oauth/access_token',
                         params={'grant_type': 'fb_exchange_token',
                                 'client_id': app.client_id,
@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -17,8 +16,9 @@ class FoursquareOAuth2Adapter(OAuth2Adapter):
 
     def complete_login(self, request, app, token, **kwargs):
         # Foursquare needs a version number for their API requests as documented here https://developer.foursquare.com/overview/versioning
-        resp = requests.get(self.profile_url,
-                            params={'oauth_token': token.token, 'v': '20140116'})
+        resp = httpclient.get(self.profile_url,
+                              params={'oauth_token': token.token,
+                                      'v': '20140116'})
         extra_data = resp.json()['response']['user']
         return self.get_provider().sociallogin_from_response(request,
                                                              extra_data)
@@ -82,8 +82,9 @@ class GoogleTests(create_oauth2_tests(registry.by_id(GoogleProvider.id))):
                                                   "code": 401,
                                                   "message": "Invalid Credentials" }
                                                 }""")
-        with mock.patch('allauth.socialaccount.providers.google.views.requests') as patched_requests:
-            patched_requests.get.return_value = response_with_401
+        with mock.patch('allauth.socialaccount.providers.google.views'
+                        '.httpclient') as patched_httpclient:
+            patched_httpclient.get.return_value = response_with_401
             with self.assertRaises(HTTPError):
                 adapter.complete_login(request, app, token)
 
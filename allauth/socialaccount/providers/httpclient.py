@@ -0,0 +1,90 @@
+"""
+All HTTP requests made to the providers go through here, instead of
+through the module level `requests.get()` and friends, which set up a
+fresh connection (and TLS handshake) for every request. Here, a single
+`requests.Session` is shared by all threads of the process, keeping
+connections to the provider hosts alive in per host pools. The session
+is configured by means of:
+
+- `SOCIALACCOUNT_REQUESTS_TIMEOUT`: the timeout applied to all
+  requests that do not specify one.
+
+- `SOCIALACCOUNT_REQUESTS_MAX_RETRIES`: the retry policy.
+
+- `SOCIALACCOUNT_REQUESTS_POOL_MAXSIZE`: the number of connections
+  kept alive per host.
+
+The session does not store cookies: it is shared between all users.
+Tests can inject a session of their own by means of `set_session()`.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.dispatch import receiver
+from django.utils.six.moves import http_cookiejar
+
+from allauth.utils import setting_changed
+
+from .. import app_settings
+
+
+_lock = threading.Lock()
+_sessions = {}
+
+
+@receiver(setting_changed)
+def _clear_sessions(setting, **kwargs):
+    if setting.startswith('SOCIALACCOUNT_REQUESTS_'):
+        set_session(None)
+
+
+def create_session():
+    session = requests.Session()
+    # Never carry cookies over from one user's login to the next
+    session.cookies.set_policy(
+        http_cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    for prefix in ('https://', 'http://'):
+        session.mount(prefix, HTTPAdapter(
+            pool_maxsize=app_settings.REQUESTS_POOL_MAXSIZE,
+            max_retries=app_settings.REQUESTS_MAX_RETRIES))
+    return session
+
+
+def get_session():
+    """
+    Returns the session shared by all threads of this process.
+    """
+    session = _sessions.get('default')
+    if session is None:
+        with _lock:
+            session = _sessions.get('default')
+            if session is None:
+                session = _sessions['default'] = create_session()
+    return session
+
+
+def set_session(session):
+    """
+    Replaces the shared session, e.g. by a mock when testing. Pass `None`
+    to have a fresh session created on next use.
+    """
+    old_session = _sessions.pop('default', None)
+    if session is not None:
+        _sessions['default'] = session
+    if old_session is not None and old_session is not session:
+        old_session.close()
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', app_settings.REQUESTS_TIMEOUT)
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, params=None, **kwargs):
+    return request('GET', url, params=params, **kwargs)
+
+
+def post(url, data=None, **kwargs):
+    return request('POST', url, data=data, **kwargs)
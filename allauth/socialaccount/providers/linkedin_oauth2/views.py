@@ -1,4 +1,4 @@
-import requests
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount import providers
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
@@ -24,7 +24,7 @@ class LinkedInOAuth2Adapter(OAuth2Adapter):
             .by_id(LinkedInOAuth2Provider.id) \
             .get_profile_fields()
         url = self.profile_url + ':(%s)?format=json' % ','.join(fields)
-        resp = requests.get(url, params={'oauth2_access_token': token.token})
+        resp = httpclient.get(url, params={'oauth2_access_token': token.token})
         return resp.json()
 
 oauth2_login = OAuth2LoginView.adapter_view(LinkedInOAuth2Adapter)
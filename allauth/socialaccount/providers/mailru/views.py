@@ -1,5 +1,5 @@
-import requests
 from hashlib import md5
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -23,7 +23,7 @@ class MailRuOAuth2Adapter(OAuth2Adapter):
         data['sig'] = md5(
             (''.join(param_list) + app.secret).encode('utf-8')
         ).hexdigest()
-        response = requests.get(self.profile_url, params=data)
+        response = httpclient.get(self.profile_url, params=data)
         extra_data = response.json()[0]
         return self.get_provider().sociallogin_from_response(request,
                                                              extra_data)
@@ -9,6 +9,7 @@ from django.http import HttpResponseRedirect
 from django.utils.http import urlencode
 from django.utils.translation import gettext as _
 
+from allauth.socialaccount.providers import httpclient
 from allauth.utils import get_request_param
 
 try:
@@ -17,7 +18,6 @@ except ImportError:
     from urlparse import parse_qsl
     from urlparse import urlparse
 
-import requests
 from requests_oauthlib import OAuth1
 
 
@@ -76,7 +76,7 @@ class OAuthClient(object):
             rt_url = self.request_token_url + '?' + urlencode(get_params)
             oauth = OAuth1(self.consumer_key,
                            client_secret=self.consumer_secret)
-            response = requests.post(url=rt_url, auth=oauth)
+            response = httpclient.post(url=rt_url, auth=oauth)
             if response.status_code not in [200, 201]:
                 raise OAuthError(
                     _('Invalid response while obtaining request token from "%s".') % get_token_prefix(self.request_token_url))
@@ -102,7 +102,7 @@ class OAuthClient(object):
             oauth_verifier = get_request_param(self.request, 'oauth_verifier')
             if oauth_verifier:
                 at_url = at_url + '?' + urlencode({'oauth_verifier': oauth_verifier})
-            response = requests.post(url=at_url, auth=oauth)
+            response = httpclient.post(url=at_url, auth=oauth)
             if response.status_code not in [200, 201]:
                 raise OAuthError(
                     _('Invalid response while obtaining access token from "%s".') % get_token_prefix(self.request_token_url))
@@ -184,10 +184,11 @@ class OAuth(object):
             client_secret=self.secret_key,
             resource_owner_key=access_token['oauth_token'],
             resource_owner_secret=access_token['oauth_token_secret'])
-        response = getattr(requests, method.lower())(url,
-                                                     auth=oauth,
-                                                     headers=headers,
-                                                     params=params)
+        response = httpclient.request(method,
+                                      url,
+                                      auth=oauth,
+                                      headers=headers,
+                                      params=params)
         if response.status_code != 200:
             raise OAuthError(
                 _('No access to private resources at "%s".')
@@ -1,12 +1,18 @@
 from django.conf.urls import patterns, url, include
 
+from allauth.utils import LazyView
+
 
 def default_urlpatterns(provider):
 
-    urlpatterns = patterns(provider.package + '.views',
-                           url('^login/$', 'oauth_login',
+    urlpatterns = patterns('',
+                           url('^login/$',
+                               LazyView(provider.package
+                                        + '.views.oauth_login'),
                                name=provider.id + "_login"),
-                           url('^login/callback/$', 'oauth_callback',
+                           url('^login/callback/$',
+                               LazyView(provider.package
+                                        + '.views.oauth_callback'),
                                name=provider.id + "_callback"))
 
     return patterns('', url('^' + provider.id + '/', include(urlpatterns)))
@@ -3,7 +3,8 @@ try:
 except ImportError:
     from urllib import urlencode
     from urlparse import parse_qsl
-import requests
+
+from allauth.socialaccount.providers import httpclient
 
 
 class OAuth2Error(Exception):
@@ -52,10 +53,10 @@ class OAuth2Client(object):
             params = data
             data = None
         # TODO: Proper exception handling
-        resp = requests.request(self.access_token_method,
-                                url,
-                                params=params,
-                                data=data)
+        resp = httpclient.request(self.access_token_method,
+                                  url,
+                                  params=params,
+                                  data=data)
         access_token = None
         if resp.status_code == 200:
             # Weibo sends json via 'text/plain;charset=UTF-8'
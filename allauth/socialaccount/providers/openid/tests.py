@@ -11,7 +11,6 @@ from django.core.urlresolvers import reverse
 from allauth.utils import get_user_model
 from allauth.socialaccount.models import get_social_app_model
 
-from . import views
 from .utils import AXAttribute
 
 from allauth.utils import get_user_model, get_current_site
@@ -37,7 +36,7 @@ class OpenIDTests(TestCase):
         self.assertTrue('openid' in resp.context['form'].errors)
 
     def test_login(self):
-        resp = self.client.post(reverse(views.login),
+        resp = self.client.post(reverse('openid_login'),
                                 dict(openid='http://me.yahoo.com'))
         assert 'login.yahooapis' in resp['location']
         with patch('allauth.socialaccount.providers'
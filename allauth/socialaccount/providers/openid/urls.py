@@ -1,10 +1,14 @@
 from django.conf.urls import patterns, url
 
-from . import views
+from allauth.utils import LazyView
 
 urlpatterns = patterns('',
-                       url('^openid/login/$', views.login,
+                       url('^openid/login/$',
+                           LazyView('allauth.socialaccount.providers'
+                                    '.openid.views.login'),
                            name="openid_login"),
-                       url('^openid/callback/$', views.callback,
+                       url('^openid/callback/$',
+                           LazyView('allauth.socialaccount.providers'
+                                    '.openid.views.callback'),
                            name='openid_callback'),
                        )
@@ -48,7 +48,7 @@ def login(request):
                         ax.add(AttrInfo(name,
                                         required=True))
                     auth_request.addExtension(ax)
-                callback_url = reverse(callback)
+                callback_url = reverse('openid_callback')
                 SocialLogin.stash_state(request)
                 redirect_url = auth_request.redirectURL(
                     request.build_absolute_uri('/'),
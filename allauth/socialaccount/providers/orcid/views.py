@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -15,9 +14,9 @@ class OrcidOAuth2Adapter(OAuth2Adapter):
     profile_url = 'https://pub.orcid.org/v1.1/%s/orcid-profile'
 
     def complete_login(self, request, app, token, **kwargs):
-        resp = requests.get(self.profile_url % kwargs['response']['orcid'],
-                            params={'access_token': token.token},
-                            headers={'accept': 'application/orcid+json'})
+        resp = httpclient.get(self.profile_url % kwargs['response']['orcid'],
+                              params={'access_token': token.token},
+                              headers={'accept': 'application/orcid+json'})
         extra_data = resp.json()
         return self.get_provider().sociallogin_from_response(request,
                                                              extra_data)
@@ -1,4 +1,4 @@
-import requests
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -32,9 +32,9 @@ class PaypalOAuth2Adapter(OAuth2Adapter):
             return 'sandbox.paypal.com'
 
     def complete_login(self, request, app, token, **kwargs):
-        response = requests.post(self.profile_url,
-                            params={'schema':'openid',
-                                    'access_token':token})
+        response = httpclient.post(self.profile_url,
+                              params={'schema':'openid',
+                                      'access_token':token})
         extra_data = response.json()
         return self.get_provider().sociallogin_from_response(request, extra_data)
 
@@ -28,7 +28,7 @@ class PersonaTests(TestCase):
     @override_settings(SOCIALACCOUNT_PROVIDERS=SOCIALACCOUNT_PROVIDERS)
     def test_login(self):
         with patch('allauth.socialaccount.providers.persona.views'
-                   '.requests') as requests_mock:
+                   '.httpclient') as requests_mock:
             requests_mock.post.return_value.json.return_value = {
                 'status': 'okay',
                 'email': 'persona@mail.com'
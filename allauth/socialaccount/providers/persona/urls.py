@@ -1,8 +1,9 @@
 from django.conf.urls import patterns, url
 
-from . import views
+from allauth.utils import LazyView
 
 urlpatterns = patterns('',
                        url('^persona/login/$',
-                           views.persona_login,
+                           LazyView('allauth.socialaccount.providers'
+                                    '.persona.views.persona_login'),
                            name="persona_login"))
@@ -1,6 +1,7 @@
 import requests
 from django.core.exceptions import ImproperlyConfigured
 
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.helpers import complete_social_login
 from allauth.socialaccount.helpers import render_authentication_error
 from allauth.socialaccount.models import SocialLogin
@@ -18,9 +19,9 @@ def persona_login(request):
                                    "add an AUDIENCE item to the "
                                    "SOCIALACCOUNT_PROVIDERS['persona'] setting.")
 
-    resp = requests.post('https://verifier.login.persona.org/verify',
-                         {'assertion': assertion,
-                          'audience': audience})
+    resp = httpclient.post('https://verifier.login.persona.org/verify',
+                           {'assertion': assertion,
+                            'audience': audience})
     try:
         resp.raise_for_status()
         extra_data = resp.json()
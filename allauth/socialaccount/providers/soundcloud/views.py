@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -13,8 +12,8 @@ class SoundCloudOAuth2Adapter(OAuth2Adapter):
     profile_url = 'https://api.soundcloud.com/me.json'
 
     def complete_login(self, request, app, token, **kwargs):
-        resp = requests.get(self.profile_url,
-                            params={'oauth_token': token.token})
+        resp = httpclient.get(self.profile_url,
+                              params={'oauth_token': token.token})
         extra_data = resp.json()
         return self.get_provider().sociallogin_from_response(request,
                                                              extra_data)
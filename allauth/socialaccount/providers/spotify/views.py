@@ -1,7 +1,7 @@
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
-import requests
 
 from .provider import SpotifyOAuth2Provider
 
@@ -13,7 +13,7 @@ class SpotifyOAuth2Adapter(OAuth2Adapter):
     profile_url = 'https://api.spotify.com/v1/me'
 
     def complete_login(self, request, app, token, **kwargs):
-        extra_data = requests.get(self.profile_url, params={
+        extra_data = httpclient.get(self.profile_url, params={
             'access_token': token.token
         })
 
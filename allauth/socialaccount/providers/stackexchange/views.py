@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -17,10 +16,10 @@ class StackExchangeOAuth2Adapter(OAuth2Adapter):
     def complete_login(self, request, app, token, **kwargs):
         provider = registry.by_id(app.provider)
         site = provider.get_site()
-        resp = requests.get(self.profile_url,
-                            params={'access_token': token.token,
-                                    'key': app.key,
-                                    'site': site})
+        resp = httpclient.get(self.profile_url,
+                              params={'access_token': token.token,
+                                      'key': app.key,
+                                      'site': site})
         extra_data = resp.json()['items'][0]
         return self.get_provider().sociallogin_from_response(request,
                                                              extra_data)
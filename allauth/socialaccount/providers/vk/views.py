@@ -1,5 +1,4 @@
-import requests
-
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -38,10 +37,10 @@ class VKOAuth2Adapter(OAuth2Adapter):
 
     def complete_login(self, request, app, token, **kwargs):
         uid = kwargs['response']['user_id']
-        resp = requests.get(self.profile_url,
-                            params={'access_token': token.token,
-                                    'fields': ','.join(USER_FIELDS),
-                                    'user_ids': uid})
+        resp = httpclient.get(self.profile_url,
+                              params={'access_token': token.token,
+                                      'fields': ','.join(USER_FIELDS),
+                                      'user_ids': uid})
         resp.raise_for_status()
         extra_data = resp.json()['response'][0]
         email = kwargs['response'].get('email')
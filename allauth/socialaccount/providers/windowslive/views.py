@@ -1,6 +1,6 @@
 from __future__ import unicode_literals
 
-import requests
+from allauth.socialaccount.providers import httpclient
 from allauth.socialaccount.providers.oauth2.views import (OAuth2Adapter,
                                                           OAuth2LoginView,
                                                           OAuth2CallbackView)
@@ -15,7 +15,7 @@ class WindowsLiveOAuth2Adapter(OAuth2Adapter):
 
     def complete_login(self, request, app, token, **kwargs):
         headers = {'Authorization': 'Bearer {0}'.format(token.token)}
-        resp = requests.get(self.profile_url, headers=headers)
+        resp = httpclient.get(self.profile_url, headers=headers)
 
 #example of whats returned (in python format):
 #{'first_name': 'James', 'last_name': 'Smith',
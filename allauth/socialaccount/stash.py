@@ -0,0 +1,151 @@
+"""
+While a user is completing a social signup (`SignupView`), the pending
+`SocialLogin` needs to be kept around in between requests. Where it is
+kept is configured by means of `SOCIALACCOUNT_SOCIALLOGIN_STASH`:
+
+- `SessionStash` (default): stores the serialized login in the
+  session, as allauth always did.
+
+- `CacheStash`: stores the serialized login in the cache (use a cache
+  that is shared between processes), keeping only an opaque id in the
+  session. Entries expire automatically.
+
+- `SignedCookieStash`: stores the serialized login, compressed and
+  signed, in a cookie. Signed is not encrypted, so the access token is
+  kept in the session instead. Logins that do not fit in a cookie
+  (browsers limit these to roughly 4KB) are kept in the session
+  altogether.
+"""
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import get_random_string
+
+from ..utils import import_attribute
+
+from . import app_settings
+
+
+class BaseSocialLoginStash(object):
+    # Number of seconds a pending login is kept around
+    timeout = 60 * 60
+
+    def store(self, request, response, sociallogin):
+        raise NotImplementedError()
+
+    def load(self, request):
+        """
+        Returns the pending `SocialLogin`, or `None` if there is none
+        (or if it expired).
+        """
+        data = self.load_data(request)
+        if not data:
+            return None
+        from .models import SocialLogin
+        return SocialLogin.deserialize(data)
+
+    def load_data(self, request):
+        raise NotImplementedError()
+
+    def clear(self, request, response):
+        raise NotImplementedError()
+
+
+class SessionStash(BaseSocialLoginStash):
+    session_key = 'socialaccount_sociallogin'
+
+    def store(self, request, response, sociallogin):
+        request.session[self.session_key] = sociallogin.serialize()
+
+    def load_data(self, request):
+        return request.session.get(self.session_key)
+
+    def clear(self, request, response):
+        request.session.pop(self.session_key, None)
+
+
+class CacheStash(BaseSocialLoginStash):
+    session_key = 'socialaccount_sociallogin_id'
+
+    def get_cache_key(self, stash_id):
+        return 'allauth.socialaccount.stash.%s' % stash_id
+
+    def store(self, request, response, sociallogin):
+        stash_id = get_random_string(32)
+        cache.set(self.get_cache_key(stash_id),
+                  sociallogin.serialize(),
+                  self.timeout)
+        request.session[self.session_key] = stash_id
+
+    def load_data(self, request):
+        stash_id = request.session.get(self.session_key)
+        if not stash_id:
+            return None
+        return cache.get(self.get_cache_key(stash_id))
+
+    def clear(self, request, response):
+        stash_id = request.session.pop(self.session_key, None)
+        if stash_id:
+            cache.delete(self.get_cache_key(stash_id))
+
+
+class SignedCookieStash(SessionStash):
+    cookie_name = 'socialaccount_sociallogin'
+    salt = 'allauth.socialaccount.SignedCookieStash'
+    token_session_key = 'socialaccount_sociallogin_token'
+    # Leaves room for the cookie name and attributes within the 4KB
+    # browsers allow for
+    max_cookie_size = 3900
+
+    def store(self, request, response, sociallogin):
+        self.clear(request, response)
+        data = sociallogin.serialize()
+        # The client can read the cookie, so keep the token out of it
+        token = data.pop('token', None)
+        value = signing.dumps(data, salt=self.salt, compress=True)
+        if len(value) > self.max_cookie_size:
+            super(SignedCookieStash, self).store(request,
+                                                 response,
+                                                 sociallogin)
+            return
+        if token:
+            request.session[self.token_session_key] = token
+        response.set_cookie(self.cookie_name,
+                            value,
+                            max_age=self.timeout,
+                            secure=request.is_secure(),
+                            httponly=True)
+
+    def load_data(self, request):
+        value = request.COOKIES.get(self.cookie_name)
+        if not value:
+            return super(SignedCookieStash, self).load_data(request)
+        try:
+            data = signing.loads(value,
+                                 salt=self.salt,
+                                 max_age=self.timeout)
+        except signing.BadSignature:
+            return None
+        token = request.session.get(self.token_session_key)
+        if token:
+            data['token'] = token
+        return data
+
+    def clear(self, request, response):
+        super(SignedCookieStash, self).clear(request, response)
+        request.session.pop(self.token_session_key, None)
+        response.delete_cookie(self.cookie_name)
+
+
+_stashes = {}
+
+
+def get_stash():
+    """
+    Returns the stash instance configured by means of
+    `SOCIALACCOUNT_SOCIALLOGIN_STASH`.
+    """
+    path = app_settings.SOCIALLOGIN_STASH
+    stash = _stashes.get(path)
+    if stash is None:
+        stash = _stashes.setdefault(path, import_attribute(path)())
+    return stash
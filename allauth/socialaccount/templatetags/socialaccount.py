@@ -2,6 +2,7 @@ from django.template.defaulttags import token_kwargs
 from django import template
 
 from allauth.socialaccount import providers
+from allauth.socialaccount.models import get_social_account_model
 from allauth.utils import get_request_param
 
 register = template.Library()
@@ -74,12 +75,35 @@ def get_social_accounts(user):
         {% if accounts %} -- if there is at least one social account
     """
     accounts = {}
-    for account in user.socialaccount_set.all().iterator():
+    SocialAccount = get_social_account_model()
+    for account in SocialAccount.objects.all_for_user(user):
         providers = accounts.setdefault(account.provider, [])
         providers.append(account)
     return accounts
 
 
+@register.assignment_tag
+def prefetch_social_accounts(users, only=''):
+    """
+    {% prefetch_social_accounts users as users %}
+
+    Loads the social accounts of all `users` (a list or queryset) by
+    means of a single query, so that subsequent `get_social_accounts`
+    calls for these users do not hit the database:
+
+        {% for user in users %}
+            {% get_social_accounts user as accounts %}
+        {% endfor %}
+
+    Use `only="provider,uid,extra_data"` to load only those fields.
+    Deferred fields cost a query per account when accessed; the avatar
+    and profile URLs need `extra_data`.
+    """
+    SocialAccount = get_social_account_model()
+    fields = [field.strip() for field in only.split(',') if field.strip()]
+    return SocialAccount.objects.prefetch_for_users(users, fields=fields)
+
+
 @register.assignment_tag
 def get_providers():
     """
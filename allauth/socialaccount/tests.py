@@ -1,21 +1,33 @@
 import random
+import time
 try:
     from urllib.parse import urlparse, parse_qs
 except ImportError:
     from urlparse import urlparse, parse_qs
 import warnings
 import json
+import mock
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.messages.middleware import MessageMiddleware
 from django.contrib.sessions.middleware import SessionMiddleware
-from django.core.urlresolvers import reverse
-from django.test import TestCase, SimpleTestCase
+from django.core.urlresolvers import reverse, Resolver404
+from django.db import connection, transaction
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import TestCase, SimpleTestCase, TransactionTestCase
 from django.test.client import RequestFactory
 from django.test.utils import override_settings
+from django.utils.crypto import get_random_string
+from django.utils.six import StringIO
 
-from allauth.socialaccount.providers import registry
+from allauth.socialaccount.providers import (registry, PROVIDER_MANIFEST,
+                                             ProviderURLResolver, httpclient)
 
 from ..tests import MockedResponse, mocked_response
 from ..account import app_settings as account_settings
@@ -23,9 +35,12 @@ from ..account.models import EmailAddress
 from ..account.utils import user_email, user_username
 from ..utils import get_user_model, get_current_site
 
+from .fields import COMPRESSED_KEY, RawJSON, compress_json
 from .models import SocialLogin, SocialToken
+from .forms import DisconnectForm
 from .helpers import complete_social_login
 from .views import signup
+from .stash import get_stash, SignedCookieStash
 
 import unittest
 import allauth.socialaccount.app_settings as app_settings
@@ -34,6 +49,9 @@ from allauth.socialaccount.models import get_social_account_model, get_social_ap
 SocialAccount = get_social_account_model()
 SocialApp = get_social_app_model()
 
+NATIVE_JSON_STORAGE = SocialAccount._meta.get_field(
+    'extra_data').uses_native_storage(connection)
+
 
 def create_oauth_tests(provider):
 
@@ -41,6 +59,7 @@ def create_oauth_tests(provider):
         pass
 
     def setUp(self):
+        cache.clear()
         app = SocialApp.objects.create(provider=provider.id,
                                        name=provider.id,
                                        client_id='app123id',
@@ -140,6 +159,7 @@ def create_oauth2_tests(provider, cls=TestCase):
             %s }""" % rt
 
     def setUp(self):
+        cache.clear()
         app = SocialApp.objects.create(provider=provider.id,
                                        name=provider.id,
                                        client_id='app123id',
@@ -360,6 +380,68 @@ class SocialAccountTests(TestCase):
                'other@test.com'})
         self.assertNotEqual(user_username(user), 'test')
 
+    @override_settings(
+        ACCOUNT_EMAIL_REQUIRED=True,
+        ACCOUNT_UNIQUE_EMAIL=True,
+        ACCOUNT_USERNAME_REQUIRED=True,
+        ACCOUNT_AUTHENTICATION_METHOD='email',
+        SOCIALACCOUNT_AUTO_SIGNUP=True,
+        SOCIALACCOUNT_SOCIALLOGIN_STASH='allauth.socialaccount.stash'
+        '.CacheStash')
+    def test_cache_stash(self):
+        request, resp = self._email_address_clash('test', 'test@test.com')
+        self.assertEqual(resp['location'], reverse('socialaccount_signup'))
+        # Only an opaque id is kept in the session
+        self.assertEqual(list(request.session.keys()),
+                         ['socialaccount_sociallogin_id'])
+        sociallogin = get_stash().load(request)
+        self.assertEqual(user_email(sociallogin.user), 'test@test.com')
+        self.assertEqual(sociallogin.account.uid, '123')
+        get_stash().clear(request, resp)
+        self.assertEqual(get_stash().load(request), None)
+
+    def test_signed_cookie_stash(self):
+        stash = SignedCookieStash()
+        user = get_user_model()(email='test@test.com')
+        sociallogin = SocialLogin(user=user,
+                                  account=SocialAccount(provider='twitter',
+                                                        uid='123'))
+        sociallogin.token = SocialToken(token='t0k3n', token_secret='s3cr3t')
+        resp = HttpResponse()
+        request = RequestFactory().get('/')
+        request.session = {}
+        stash.store(request, resp, sociallogin)
+        value = resp.cookies[stash.cookie_name].value
+        # The token is kept out of the cookie
+        for secret in ['t0k3n', 's3cr3t']:
+            self.assertFalse(secret in json.dumps(
+                signing.loads(value, salt=stash.salt)))
+        request.COOKIES = {stash.cookie_name: value}
+        sociallogin = stash.load(request)
+        self.assertEqual(sociallogin.account.uid, '123')
+        self.assertEqual(sociallogin.token.token_secret, 's3cr3t')
+        request.COOKIES[stash.cookie_name] += 'x'
+        self.assertEqual(stash.load(request), None)
+
+    def test_signed_cookie_stash_too_large(self):
+        stash = SignedCookieStash()
+        user = get_user_model()(email='test@test.com')
+        account = SocialAccount(provider='twitter',
+                                uid='123',
+                                extra_data={'bio': get_random_string(5000)})
+        resp = HttpResponse()
+        request = RequestFactory().get('/')
+        request.session = {}
+        stash.store(request, resp,
+                    SocialLogin(user=user, account=account))
+        # Too large for a cookie, kept in the session instead
+        self.assertEqual(resp.cookies[stash.cookie_name].value, '')
+        request.COOKIES = {}
+        self.assertEqual(stash.load(request).account.extra_data,
+                         account.extra_data)
+        stash.clear(request, resp)
+        self.assertEqual(stash.load(request), None)
+
     def _email_address_clash(self, username, email):
         User = get_user_model()
         # Some existig user
@@ -387,6 +469,379 @@ class SocialAccountTests(TestCase):
         return request, resp
 
 
+class CountingJSONCodec(object):
+    calls = []
+
+    def loads(self, value):
+        self.calls.append('loads')
+        return json.loads(value)
+
+    def dumps(self, value):
+        self.calls.append('dumps')
+        return json.dumps(value)
+
+
+counting_json_codec = CountingJSONCodec()
+
+
+@override_settings(
+    SOCIALACCOUNT_JSON_CODEC='allauth.socialaccount.tests.counting_json_codec')
+class LazyExtraDataTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create(username='john')
+        app = SocialApp.objects.create(provider='twitter', name='twitter')
+        SocialAccount.objects.create(user=user,
+                                     app=app,
+                                     provider='twitter',
+                                     uid='123',
+                                     extra_data={'screen_name': 'john'})
+        del counting_json_codec.calls[:]
+
+    @unittest.skipIf(NATIVE_JSON_STORAGE,
+                     'Native JSON is decoded by the database driver')
+    def test_decoded_on_access_only(self):
+        account = SocialAccount.objects.get(uid='123')
+        self.assertEqual(account.provider, 'twitter')
+        self.assertEqual(counting_json_codec.calls, [])
+        # Untouched values are saved as is
+        account.save()
+        self.assertEqual(counting_json_codec.calls, [])
+        self.assertEqual(account.extra_data, {'screen_name': 'john'})
+        self.assertEqual(counting_json_codec.calls, ['loads'])
+        account.extra_data['screen_name'] = 'johnny'
+        account.save()
+        self.assertEqual(counting_json_codec.calls, ['loads', 'dumps'])
+        self.assertEqual(SocialAccount.objects.get(uid='123').extra_data,
+                         {'screen_name': 'johnny'})
+
+    @unittest.skipIf(NATIVE_JSON_STORAGE,
+                     'Native JSON is decoded by the database driver')
+    def test_value_from_object(self):
+        field = SocialAccount._meta.get_field('extra_data')
+        account = SocialAccount.objects.get(uid='123')
+        self.assertEqual(json.loads(field.value_from_object(account)),
+                         {'screen_name': 'john'})
+        self.assertEqual(counting_json_codec.calls, [])
+        self.assertEqual(field.value_to_string(SocialAccount()), '{}')
+
+
+class ProviderRegistryTests(TestCase):
+
+    def test_manifest(self):
+        choices = dict(registry.as_choices())
+        self.assertEqual(choices['twitter'], 'Twitter')
+        for package, id in PROVIDER_MANIFEST.items():
+            if package not in settings.INSTALLED_APPS:
+                continue
+            provider = registry.by_id(id)
+            self.assertEqual((provider.id, provider.package), (id, package))
+            self.assertEqual(choices[id], provider.name)
+
+    def test_url_resolver(self):
+        resolver = ProviderURLResolver(registry)
+        self.assertEqual(resolver.resolve('twitter/login/').url_name,
+                         'twitter_login')
+        self.assertEqual(resolver.resolve('facebook/login/token/').url_name,
+                         'facebook_login_by_token')
+        # Only the URLconfs of the providers at hand were needed
+        self.assertEqual(set(resolver._resolvers), set(['twitter',
+                                                        'facebook']))
+        self.assertRaises(Resolver404, resolver.resolve, 'twitter/foo/')
+        self.assertRaises(Resolver404, resolver.resolve, 'nope/login/')
+        self.assertTrue(
+            reverse('openid_callback').endswith('/openid/callback/'))
+
+
+class PrefetchSocialAccountsTests(TestCase):
+
+    def setUp(self):
+        app = SocialApp.objects.create(provider='twitter', name='twitter')
+        for i in range(3):
+            user = get_user_model().objects.create(username='user%d' % i)
+            SocialAccount.objects.create(
+                user=user,
+                app=app,
+                provider='twitter',
+                uid=str(i),
+                extra_data={'profile_image_url': 'http://x/%d.png' % i})
+        get_user_model().objects.create(username='loner')
+
+    def test_template_tag(self):
+        for args in ['', 'only="provider,uid,extra_data"']:
+            users = get_user_model().objects.order_by('username')
+            template = Template(
+                '{% load socialaccount %}'
+                '{% prefetch_social_accounts users ' + args + ' as users %}'
+                '{% for user in users %}'
+                '{% get_social_accounts user as accounts %}'
+                '{% for account in accounts.twitter %}'
+                '{{ account.get_avatar_url }} '
+                '{% endfor %}{% endfor %}')
+            with self.assertNumQueries(2):
+                output = template.render(Context({'users': users}))
+            self.assertEqual(output,
+                             'http://x/0.png http://x/1.png http://x/2.png ')
+
+
+class DisconnectFormTests(TestCase):
+
+    def test_clears_user_cache(self):
+        user = get_user_model().objects.create(username='john')
+        user.set_password('doe')
+        user.save()
+        app = SocialApp.objects.create(provider='twitter', name='twitter')
+        for uid in ['1', '2']:
+            SocialAccount.objects.create(user=user,
+                                         app=app,
+                                         provider='twitter',
+                                         uid=uid)
+        request = RequestFactory().get('/')
+        request.user = user
+        form = DisconnectForm(
+            {'account': SocialAccount.objects.get(uid='1').pk},
+            request=request)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(len(SocialAccount.objects.all_for_user(user)), 2)
+        form.save()
+        self.assertEqual(
+            [a.uid for a in SocialAccount.objects.all_for_user(user)],
+            ['2'])
+
+
+class HTTPClientTests(SimpleTestCase):
+
+    def tearDown(self):
+        httpclient.set_session(None)
+
+    def test_shared_session(self):
+        session = httpclient.get_session()
+        self.assertTrue(session is httpclient.get_session())
+        self.assertEqual(tuple(session.cookies._policy.allowed_domains()), ())
+        with override_settings(SOCIALACCOUNT_REQUESTS_MAX_RETRIES=3):
+            # Changing the settings results in a fresh session
+            other_session = httpclient.get_session()
+            self.assertFalse(other_session is session)
+            adapter = other_session.get_adapter('https://example.com/')
+            self.assertEqual(adapter.max_retries.total, 3)
+
+    def test_timeout(self):
+        session = mock.Mock()
+        httpclient.set_session(session)
+        httpclient.get('https://example.com/', params={'q': 1})
+        session.request.assert_called_once_with('GET',
+                                                'https://example.com/',
+                                                params={'q': 1},
+                                                timeout=30)
+        httpclient.post('https://example.com/', {'q': 1}, timeout=5)
+        session.request.assert_called_with('POST',
+                                           'https://example.com/',
+                                           data={'q': 1},
+                                           timeout=5)
+
+
+class SocialAppCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.app = SocialApp.objects.create(provider='twitter',
+                                            name='twitter',
+                                            client_id='app123id')
+        self.app.sites.add(get_current_site())
+
+    def test_get_current(self):
+        app = SocialApp.objects.get_current('twitter')
+        self.assertEqual(app.pk, self.app.pk)
+        with self.assertNumQueries(0):
+            app = SocialApp.objects.get_current('twitter')
+        self.assertEqual(app.client_id, 'app123id')
+        # Changes invalidate the cache
+        self.app.client_id = 'app456id'
+        self.app.save()
+        self.assertEqual(SocialApp.objects.get_current('twitter').client_id,
+                         'app456id')
+        self.app.sites.clear()
+        self.assertRaises(SocialApp.DoesNotExist,
+                          SocialApp.objects.get_current,
+                          'twitter')
+
+    def test_generation_checked_once_per_ttl(self):
+        from . import models
+        SocialApp.objects.get_current('twitter')
+        with mock.patch.object(models, 'cache') as shared_cache:
+            SocialApp.objects.get_current('twitter')
+            self.assertFalse(shared_cache.get.called)
+            with mock.patch.object(models.time, 'time',
+                                   return_value=time.time()
+                                   + models.SOCIALAPP_GENERATION_TTL):
+                shared_cache.get.return_value = \
+                    models._socialapp_generation[0]
+                SocialApp.objects.get_current('twitter')
+            shared_cache.get.assert_called_once_with(
+                models.SOCIALAPP_GENERATION_KEY)
+
+    def test_bounded(self):
+        from . import models
+        facebook = SocialApp.objects.create(provider='facebook',
+                                            name='facebook')
+        facebook.sites.add(get_current_site())
+        with mock.patch.object(models, 'SOCIALAPP_MAX_ENTRIES', 1):
+            SocialApp.objects.get_current('twitter')
+            SocialApp.objects.get_current('facebook')
+            self.assertEqual(len(models._socialapps), 1)
+            self.assertEqual(list(models._socialapps)[0][2], 'facebook')
+
+
+class ExtraDataStorageTests(TestCase):
+
+    def test_db_type(self):
+        field = SocialAccount._meta.get_field('extra_data')
+        postgresql = mock.Mock(vendor='postgresql')
+        with override_settings(SOCIALACCOUNT_JSON_STORAGE='native'):
+            self.assertEqual(field.db_type(postgresql), 'jsonb')
+            if connection.vendor != 'postgresql':
+                self.assertEqual(field.db_type(connection), 'text')
+        with override_settings(SOCIALACCOUNT_JSON_STORAGE='text'):
+            self.assertFalse(field.uses_native_storage(postgresql))
+
+    @unittest.skipIf(connection.vendor == 'postgresql',
+                     'Native JSON storage is available')
+    @override_settings(SOCIALACCOUNT_JSON_STORAGE='native')
+    def test_native_storage_unavailable(self):
+        self.assertRaises(ImproperlyConfigured,
+                          SocialAccount.objects.filter_extra_data,
+                          locale='nl_NL')
+        self.assertRaises(ImproperlyConfigured,
+                          SocialAccount.objects.create_extra_data_index,
+                          'locale')
+        out = StringIO()
+        call_command('socialaccount_convert_extra_data', stdout=out)
+        self.assertTrue('nothing to convert' in out.getvalue())
+
+    @override_settings(SOCIALACCOUNT_PROVIDERS={
+        'twitter': {'EXTRA_DATA_FIELDS': ['id', 'screen_name']}})
+    def test_projection(self):
+        provider = registry.by_id('twitter')
+        self.assertEqual(
+            provider.project_extra_data({'id': 1,
+                                         'screen_name': 'john',
+                                         'statuses_count': 42}),
+            {'id': 1, 'screen_name': 'john'})
+
+    @unittest.skipIf(NATIVE_JSON_STORAGE,
+                     'Native JSON is not compressed')
+    @override_settings(SOCIALACCOUNT_PROVIDERS={
+        'twitter': {'EXTRA_DATA_MAX_SIZE': 100}})
+    def test_max_size(self):
+        user = get_user_model().objects.create(username='john')
+        app = SocialApp.objects.create(provider='twitter', name='twitter')
+        extra_data = {'description': 'x' * 1000}
+        account = SocialAccount.objects.create(user=user,
+                                               app=app,
+                                               provider='twitter',
+                                               uid='123',
+                                               extra_data=extra_data)
+        stored = SocialAccount.objects.filter(pk=account.pk) \
+            .values_list('extra_data', flat=True)[0]
+        self.assertTrue(len(stored) < 100)
+        self.assertTrue(COMPRESSED_KEY in json.loads(stored))
+        self.assertEqual(SocialAccount.objects.get(pk=account.pk).extra_data,
+                         extra_data)
+
+    def test_compressed_native_value(self):
+        # With native storage, the database driver hands out the decoded
+        # envelope rather than JSON text.
+        field = SocialAccount._meta.get_field('extra_data')
+        extra_data = {'description': 'x' * 1000}
+        envelope = json.loads(compress_json(json.dumps(extra_data)))
+        self.assertEqual(field.from_db_value(envelope, None, None, {}),
+                         extra_data)
+        self.assertEqual(field.to_python(envelope), extra_data)
+        self.assertEqual(field.from_db_value('{}', None, None, {}), '{}')
+
+
+@unittest.skipUnless(NATIVE_JSON_STORAGE,
+                     'Requires PostgreSQL with SOCIALACCOUNT_JSON_STORAGE'
+                     ' = "native", see test_postgresql_settings')
+class NativeExtraDataStorageTests(TransactionTestCase):
+    # DDL does not go along with the deferred constraint checks of the
+    # transaction a `TestCase` runs in
+
+    def setUp(self):
+        user = get_user_model().objects.create(username='john')
+        app = SocialApp.objects.create(provider='twitter', name='twitter')
+        for uid, locale in [('1', 'nl_NL'), ('2', 'en_US')]:
+            SocialAccount.objects.create(user=user,
+                                         app=app,
+                                         provider='twitter',
+                                         uid=uid,
+                                         extra_data={'locale': locale,
+                                                     'bio': 'x' * 1000})
+
+    def test_filter_extra_data(self):
+        self.assertEqual(
+            [a.uid for a in SocialAccount.objects.filter_extra_data(
+                locale='nl_NL')],
+            ['1'])
+        self.assertRaises(ValueError,
+                          SocialAccount.objects.filter_extra_data,
+                          **{"locale') OR ('1": '1'})
+
+    def test_extra_data_index(self):
+        SocialAccount.objects.create_extra_data_index('locale')
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            qs = SocialAccount.objects.filter_extra_data(locale='nl_NL')
+            sql, params = qs.query.sql_with_params()
+            cursor.execute('EXPLAIN ' + sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertTrue('socialaccount_socialaccount_extra_data_locale'
+                        in plan)
+        SocialAccount.objects.drop_extra_data_index('locale')
+        self.assertRaises(ValueError,
+                          SocialAccount.objects.create_extra_data_index,
+                          "locale'))")
+
+    @override_settings(SOCIALACCOUNT_PROVIDERS={
+        'twitter': {'EXTRA_DATA_MAX_SIZE': 100}})
+    def test_max_size_ignored(self):
+        account = SocialAccount.objects.get(uid='1')
+        account.extra_data['locale'] = 'de_DE'
+        account.save()
+        self.assertEqual(
+            [a.uid for a in SocialAccount.objects.filter_extra_data(
+                locale='de_DE')],
+            ['1'])
+
+    def test_convert_storage(self):
+        field = SocialAccount._meta.get_field('extra_data')
+        self.assertEqual(
+            field.convert_storage(connection, SocialAccount, native=False),
+            'text')
+        self.assertRaises(ImproperlyConfigured,
+                          SocialAccount.objects.filter_extra_data,
+                          locale='nl_NL')
+        # Compressed while stored as text
+        SocialAccount.objects.filter(uid='1').update(
+            extra_data=RawJSON(compress_json(json.dumps({'locale': 'nl_NL'}))))
+        out = StringIO()
+        call_command('socialaccount_convert_extra_data', stdout=out)
+        self.assertTrue('to jsonb' in out.getvalue())
+        self.assertEqual(
+            [a.uid for a in SocialAccount.objects.filter_extra_data(
+                locale='nl_NL')],
+            ['1'])
+        self.assertEqual(field.get_column_type(connection, SocialAccount),
+                         'jsonb')
+        out = StringIO()
+        call_command('socialaccount_convert_extra_data', stdout=out)
+        self.assertTrue('already' in out.getvalue())
+        # Data that merely looks like an envelope is left alone
+        for value in [{'__zlib__': 'eJwDAAAAAAE='},
+                      {COMPRESSED_KEY: 42}]:
+            self.assertEqual(field.to_python(value), value)
+
+
 @override_settings(
     SOCIALACCOUNT_AUTO_SIGNUP=True,
     ACCOUNT_SIGNUP_FORM_CLASS=None,
@@ -12,7 +12,7 @@ from ..account.adapter import get_adapter as get_account_adapter
 from ..utils import get_form_class, get_current_site
 
 from .adapter import get_adapter
-from .models import SocialLogin
+from .stash import get_stash
 from .forms import DisconnectForm, SignupForm
 from . import helpers
 from . import app_settings
@@ -29,17 +29,14 @@ class SignupView(RedirectAuthenticatedUserMixin, CloseableSignupMixin,
                               self.form_class)
 
     def dispatch(self, request, *args, **kwargs):
-        self.sociallogin = None
-        data = request.session.get('socialaccount_sociallogin')
-        if data:
-            self.sociallogin = SocialLogin.deserialize(data)
+        self.sociallogin = get_stash().load(request)
         if not self.sociallogin:
             return HttpResponseRedirect(reverse('account_login'))
         return super(SignupView, self).dispatch(request, *args, **kwargs)
 
     def is_open(self):
-        return get_adapter().is_open_for_signup(self.request,
-                                                self.sociallogin)
+        return get_adapter(self.request).is_open_for_signup(self.request,
+                                                            self.sociallogin)
 
     def get_form_kwargs(self):
         ret = super(SignupView, self).get_form_kwargs()
@@ -48,8 +45,10 @@ class SignupView(RedirectAuthenticatedUserMixin, CloseableSignupMixin,
 
     def form_valid(self, form):
         form.save(self.request)
-        return helpers.complete_social_signup(self.request,
-                                              self.sociallogin)
+        response = helpers.complete_social_signup(self.request,
+                                                  self.sociallogin)
+        get_stash().clear(self.request, response)
+        return response
 
     def get_context_data(self, **kwargs):
         ret = super(SignupView, self).get_context_data(**kwargs)
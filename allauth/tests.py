@@ -1,14 +1,23 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-import requests
+import json
+import os
+import subprocess
+import sys
 from datetime import datetime, date
 
 import django
+from django.conf import settings
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+
+import mock
 
 from . import utils
+from .utils import get_user_model
 
 
 class MockedResponse(object):
@@ -37,24 +46,20 @@ class mocked_response:
         self.responses = list(responses)
 
     def __enter__(self):
-        self.orig_get = requests.get
-        self.orig_post = requests.post
-        self.orig_request = requests.request
-
-        def mockable_request(f):
-            def new_f(*args, **kwargs):
-                if self.responses:
-                    return self.responses.pop(0)
-                return f(*args, **kwargs)
-            return new_f
-        requests.get = mockable_request(requests.get)
-        requests.post = mockable_request(requests.post)
-        requests.request = mockable_request(requests.request)
+        from allauth.socialaccount.providers import httpclient
+
+        self.orig_request = httpclient.request
+
+        def new_request(*args, **kwargs):
+            if self.responses:
+                return self.responses.pop(0)
+            return self.orig_request(*args, **kwargs)
+        httpclient.request = new_request
 
     def __exit__(self, type, value, traceback):
-        requests.get = self.orig_get
-        requests.post = self.orig_post
-        requests.request = self.orig_request
+        from allauth.socialaccount.providers import httpclient
+
+        httpclient.request = self.orig_request
 
 
 class BasicTests(TestCase):
@@ -68,6 +73,39 @@ class BasicTests(TestCase):
             self.assertEqual(utils.generate_unique_username([input]),
                              username)
 
+    def test_generate_unique_username_single_query(self):
+        User = get_user_model()
+        for username in ['john', 'john2', 'johnny']:
+            User.objects.create(username=username)
+        with self.assertNumQueries(1):
+            self.assertEqual(utils.generate_unique_username(['John']),
+                             'john3')
+
+    def test_generate_unique_username_probes_candidates(self):
+        User = get_user_model()
+        User.objects.create(username='john')
+        for i in range(2, utils.USERNAME_PROBE_SIZE + 3):
+            User.objects.create(username='john%d' % i)
+        with self.assertNumQueries(2) as ctx:
+            self.assertEqual(utils.generate_unique_username(['John']),
+                             'john%d' % (utils.USERNAME_PROBE_SIZE + 3))
+        # Looked up by full value, not by prefix
+        self.assertFalse(any('john%' in query['sql']
+                             for query in ctx.captured_queries))
+
+    def test_generate_unique_username_case_insensitive(self):
+        get_user_model().objects.create(username='John')
+        self.assertEqual(utils.generate_unique_username(['john']), 'john2')
+
+    def test_generate_unique_usernames(self):
+        get_user_model().objects.create(username='john')
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                utils.generate_unique_usernames([['John'],
+                                                 ['Jane'],
+                                                 ['john@doe.com']]),
+                ['john2', 'jane', 'john3'])
+
     def test_email_validation(self):
         is_email_max_75 = django.VERSION[:2] <= (1, 7)
         if is_email_max_75:
@@ -113,6 +151,27 @@ class BasicTests(TestCase):
             self.assertEqual(int(t1.microsecond / 1000),
                              int(t2.microsecond / 1000))
 
+    def test_serializer_plan(self):
+        class SomePlanModel(models.Model):
+            dt = models.DateTimeField()
+            bb = models.BinaryField()
+
+        plan = utils.get_serializer_plan(SomePlanModel)
+        self.assertTrue(plan is utils.get_serializer_plan(SomePlanModel))
+        self.assertEqual(set(plan.decoders), set(['dt', 'bb']))
+        instance = SomePlanModel(dt=datetime(2015, 7, 29, 12, 30, 1, 123456),
+                                 bb=b'bin')
+        instance.extra = {1: [date(2015, 7, 29), None, ('a', 1.5)]}
+        data = utils.serialize_instance(instance)
+        # Same outcome as a round trip through `DjangoJSONEncoder`
+        expected = json.loads(json.dumps(
+            dict((k, v) for k, v in instance.__dict__.items()
+                 if not k.startswith('_') and k != 'bb'),
+            cls=DjangoJSONEncoder))
+        expected['bb'] = 'Ymlu'
+        self.assertEqual(data, expected)
+        self.assertEqual(json.loads(json.dumps(data)), data)
+
     def test_serializer_binary_field(self):
         class SomeBinaryModel(models.Model):
             bb = models.BinaryField()
@@ -128,6 +187,61 @@ class BasicTests(TestCase):
         self.assertEqual(deserialized.bb, b'some binary data')
         self.assertEqual(deserialized.bb_empty, b'')
 
+    def test_user_model_info(self):
+        info = utils.get_user_model_info()
+        self.assertTrue(info is utils.get_user_model_info())
+        self.assertEqual(info.username_field, 'username')
+        self.assertEqual(info.username_max_length,
+                         get_user_model()._meta.get_field(
+                             'username').max_length)
+        self.assertTrue(info.has_field('email'))
+        self.assertFalse(info.has_field('nickname'))
+        self.assertEqual(info.pk_type, info.PK_INT)
+        self.assertEqual(info.pk_to_url_str(1234), 'ya')
+        self.assertEqual(info.url_str_to_pk('ya'), 1234)
+        with override_settings(ACCOUNT_USER_MODEL_USERNAME_FIELD=None):
+            self.assertEqual(utils.get_username_max_length(), 0)
+
+    def test_lazy_view(self):
+        view = mock.Mock(return_value='response', csrf_exempt=True)
+        with mock.patch('allauth.utils.import_attribute',
+                        return_value=view) as import_attribute:
+            lazy_view = utils.LazyView('foo.views.bar')
+            self.assertEqual(lazy_view.__name__, 'bar')
+            self.assertFalse(import_attribute.called)
+            self.assertTrue(lazy_view.csrf_exempt)
+            self.assertEqual(lazy_view('request', 'arg'), 'response')
+            import_attribute.assert_called_once_with('foo.views.bar')
+        view.assert_called_once_with('request', 'arg')
+        # Hashed and compared by dotted path, not by the view itself
+        self.assertEqual(hash(lazy_view), hash('foo.views.bar'))
+        self.assertEqual(lazy_view, utils.LazyView('foo.views.bar'))
+        self.assertNotEqual(lazy_view, utils.LazyView('foo.views.baz'))
+        self.assertNotEqual(lazy_view, view)
+
+    def test_reverse_does_not_import_views(self):
+        # Run in a fresh interpreter, as other tests import the views
+        script = '\n'.join([
+            'import sys, django',
+            'if hasattr(django, "setup"):',
+            '    django.setup()',
+            'from django.core.urlresolvers import reverse',
+            'reverse("account_login")',
+            'reverse("openid_login")',
+            'reverse("facebook_login")',
+            'print(" ".join(sorted(sys.modules)))'])
+        env = dict(os.environ,
+                   DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+                   PYTHONPATH=os.pathsep.join(sys.path))
+        modules = subprocess.check_output([sys.executable, '-c', script],
+                                          env=env).decode('ascii').split()
+        self.assertTrue('allauth.urls' in modules)
+        for module in ['allauth.socialaccount.providers.openid.views',
+                       'allauth.socialaccount.providers.facebook.views',
+                       'openid',
+                       'requests_oauthlib']:
+            self.assertFalse(module in modules, module)
+
     def test_build_absolute_uri(self):
         self.assertEqual(
             utils.build_absolute_uri(None, '/foo'),
@@ -138,3 +252,29 @@ class BasicTests(TestCase):
         self.assertEqual(
             utils.build_absolute_uri(None, 'http://foo.com/bar'),
             'http://foo.com/bar')
+
+
+class AppSettingsTests(TestCase):
+
+    def test_snapshot_invalidated_on_setting_changed(self):
+        from .account import app_settings
+        with override_settings(ACCOUNT_USERNAME_MIN_LENGTH=3):
+            self.assertEqual(app_settings.USERNAME_MIN_LENGTH, 3)
+            with mock.patch('allauth.app_settings.settings') as settings:
+                # Served from the snapshot
+                self.assertEqual(app_settings.USERNAME_MIN_LENGTH, 3)
+                self.assertFalse(settings.mock_calls)
+        self.assertEqual(app_settings.USERNAME_MIN_LENGTH, 1)
+
+    def test_dynamic_getter(self):
+        from .account import app_settings
+        values = {'ACCOUNT_USERNAME_MIN_LENGTH': 3}
+
+        def getter(name, dflt):
+            return values.get(name, dflt)
+        getter.dynamic = True
+
+        with override_settings(ALLAUTH_SETTING_GETTER=getter):
+            self.assertEqual(app_settings.USERNAME_MIN_LENGTH, 3)
+            values['ACCOUNT_USERNAME_MIN_LENGTH'] = 5
+            self.assertEqual(app_settings.USERNAME_MIN_LENGTH, 5)
@@ -7,11 +7,14 @@ from django.core.exceptions import ImproperlyConfigured
 from django.core.validators import validate_email, ValidationError
 from django.core import urlresolvers
 from django.contrib.sites.models import Site
-from django.db.models import FieldDoesNotExist
+from django.db import models
+from django.db.models import Q
 from django.db.models.fields import (DateTimeField, DateField,
                                      EmailField, TimeField,
                                      BinaryField)
 from django.utils import six, dateparse
+from django.utils.crypto import get_random_string
+from django.utils.http import base36_to_int, int_to_base36
 from django.utils.six.moves.urllib.parse import urlsplit
 
 from django.core.serializers.json import DjangoJSONEncoder
@@ -25,16 +28,46 @@ try:
 except:
     from django.utils import importlib
 
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    # Django < 1.8
+    from django.test.signals import setting_changed  # noqa
+
+
+# Characters not allowed in generated usernames (by default)
+USERNAME_REJECT_REGEX = re.compile(r'[^\w\s@+.-]', re.UNICODE)
+_WHITESPACE_REGEX = re.compile(r'\s+', re.UNICODE)
+
+# Candidate usernames (the base followed by a numeric suffix) are looked
+# up in rounds, each round covering (at least) this many candidates per
+# base, and ten times as many as all previous rounds together.
+USERNAME_PROBE_SIZE = 10
+
+# Give up after this many candidates per base.
+USERNAME_MAX_CANDIDATES = 10 ** 4
+
+# Maximum number of candidates looked up per query, staying well within
+# the limits on query parameters and expression depth of e.g. SQLite.
+USERNAME_QUERY_CHUNK_SIZE = 100
+
+# Number of random usernames tried by `generate_random_username()`
+USERNAME_RANDOM_ATTEMPTS = 10
+
 
 def _generate_unique_username_base(txts, regex=None):
+    from .account.utils import is_username_blacklisted
     username = None
-    regex = regex or '[^\w\s@+.-]'
+    if regex is None:
+        regex = USERNAME_REJECT_REGEX
+    elif isinstance(regex, six.string_types):
+        regex = re.compile(regex)
     for txt in txts:
         if not txt:
             continue
         username = unicodedata.normalize('NFKD', force_text(txt))
         username = username.encode('ascii', 'ignore').decode('ascii')
-        username = force_text(re.sub(regex, '', username).lower())
+        username = force_text(regex.sub('', username).lower())
         # Django allows for '@' in usernames in order to accomodate for
         # project wanting to use e-mail for username. In allauth we don't
         # use this, we already have a proper place for putting e-mail
@@ -42,40 +75,140 @@ def _generate_unique_username_base(txts, regex=None):
         # address and only take the part leading up to the '@'.
         username = username.split('@')[0]
         username = username.strip()
-        username = re.sub('\s+', '_', username)
-        if username:
+        username = _WHITESPACE_REGEX.sub('_', username)
+        if username and not is_username_blacklisted(username):
             break
+        username = None
     return username or 'user'
 
 
 def get_username_max_length():
-    from .account.app_settings import USER_MODEL_USERNAME_FIELD
-    if USER_MODEL_USERNAME_FIELD is not None:
-        User = get_user_model()
-        max_length = User._meta.get_field(USER_MODEL_USERNAME_FIELD).max_length
+    return get_user_model_info().username_max_length
+
+
+def _username_candidate(base, i, max_length):
+    if i:
+        pfx = str(i + 1)
     else:
-        max_length = 0
-    return max_length
+        pfx = ''
+    return base[0:max_length - len(pfx)] + pfx
 
 
-def generate_unique_username(txts, regex=None):
+def _get_taken_usernames(candidates):
+    """
+    Returns those of the given (lowercase) candidate usernames that are
+    taken. As usernames are treated case insensitively elsewhere (e.g.
+    by `clean_username()` and the authentication backend), candidates
+    are compared case insensitively as well, each by its full value
+    rather than by prefix.
+    """
     from .account.app_settings import USER_MODEL_USERNAME_FIELD
-    username = _generate_unique_username_base(txts, regex)
     User = get_user_model()
+    taken = set()
+    candidates = sorted(set(candidates))
+    for i in range(0, len(candidates), USERNAME_QUERY_CHUNK_SIZE):
+        q = Q()
+        for candidate in candidates[i:i + USERNAME_QUERY_CHUNK_SIZE]:
+            q |= Q(**{USER_MODEL_USERNAME_FIELD + '__iexact': candidate})
+        taken.update(username.lower() for username
+                     in User.objects.filter(q).values_list(
+                         USER_MODEL_USERNAME_FIELD, flat=True))
+    return taken
+
+
+def generate_unique_username(txts, regex=None):
+    """
+    Generates a username that is not taken yet, typically using a
+    single query to find the next free numeric suffix. As the database
+    is consulted on each call, retrying after a conflicting insert (e.g.
+    due to a concurrent signup) picks a different username. Raises
+    `ValueError` if no candidate is available, e.g. because the
+    blacklist rejects all of them.
+    """
+    return generate_unique_usernames([txts], regex=regex)[0]
+
+
+def generate_unique_usernames(txts_list, regex=None):
+    """
+    Bulk version of `generate_unique_username()`: returns a list of
+    usernames, one for each of the `txts` in `txts_list`, that are
+    unique among themselves as well as with respect to the existing
+    users. Candidates for all usernames are looked up at once.
+
+    Generated usernames are lowercase, and are compared with the
+    existing usernames case insensitively.
+    """
+    from .account.utils import is_username_blacklisted
     max_length = get_username_max_length()
-    i = 0
+    bases = [_generate_unique_username_base(txts, regex)
+             for txts in txts_list]
+    usernames = [None] * len(bases)
+    assigned = set()
+    # Per base, the number of candidates looked up so far and the free
+    # ones among those, in order
+    probed = {}
+    free = {}
     while True:
-        try:
-            if i:
-                pfx = str(i + 1)
-            else:
-                pfx = ''
-            ret = username[0:max_length - len(pfx)] + pfx
-            query = {USER_MODEL_USERNAME_FIELD + '__iexact': ret}
-            User.objects.get(**query)
-            i += 1
-        except User.DoesNotExist:
-            return ret
+        for i, base in enumerate(bases):
+            candidates = free.get(base)
+            while usernames[i] is None and candidates:
+                candidate = candidates.pop(0)
+                if candidate not in assigned:
+                    usernames[i] = candidate
+                    assigned.add(candidate)
+        pending = set(base for base, username in zip(bases, usernames)
+                      if username is None)
+        if not pending:
+            break
+        candidates = {}
+        for base in pending:
+            start = probed.get(base, 0)
+            if start >= USERNAME_MAX_CANDIDATES:
+                raise ValueError("Unable to generate a unique username from"
+                                 " %r: all candidates are either taken or"
+                                 " blacklisted" % base)
+            end = min(start + max(USERNAME_PROBE_SIZE, 10 * start),
+                      USERNAME_MAX_CANDIDATES)
+            probed[base] = end
+            candidates[base] = [
+                candidate for candidate
+                in (_username_candidate(base, j, max_length)
+                    for j in range(start, end))
+                if not is_username_blacklisted(candidate)]
+        taken = _get_taken_usernames(candidate
+                                     for base_candidates
+                                     in candidates.values()
+                                     for candidate in base_candidates)
+        for base, base_candidates in candidates.items():
+            free.setdefault(base, []).extend(
+                candidate for candidate in base_candidates
+                if candidate not in taken)
+    return usernames
+
+
+def generate_random_username(txts, regex=None):
+    """
+    Generates a username consisting of the base derived from `txts`
+    followed by a random suffix, for when `generate_unique_username()`
+    runs out of candidates. If the blacklist rejects those, entirely
+    random usernames are tried. Raises `ValueError` if no candidate is
+    available.
+    """
+    from .account.utils import is_username_blacklisted
+    max_length = get_username_max_length()
+    base = _generate_unique_username_base(txts, regex)
+    for i in range(USERNAME_RANDOM_ATTEMPTS):
+        suffix = get_random_string(8, 'abcdefghijklmnopqrstuvwxyz'
+                                   '0123456789')
+        if i < USERNAME_RANDOM_ATTEMPTS // 2:
+            username = base[0:max(0, max_length - len(suffix))] + suffix
+        else:
+            username = suffix
+        username = username[0:max_length]
+        if (not is_username_blacklisted(username)
+                and not _get_taken_usernames([username])):
+            return username
+    raise ValueError("Unable to generate a random username from %r" % base)
 
 
 def valid_email_or_none(email):
@@ -97,7 +230,7 @@ def email_address_exists(email, exclude_user=None):
     emailaddresses = EmailAddress.objects
     if exclude_user:
         emailaddresses = emailaddresses.exclude(user=exclude_user)
-    ret = emailaddresses.filter(email__iexact=email).exists()
+    ret = emailaddresses.filter(email_lower=email.lower()).exists()
     if not ret:
         email_field = account_settings.USER_MODEL_EMAIL_FIELD
         if email_field:
@@ -115,6 +248,33 @@ def import_attribute(path):
     return ret
 
 
+def get_adapter_instance(path, adapters, request=None):
+    """
+    Returns an instance of the adapter class at `path`, using `adapters`
+    (a dictionary owned by the caller) to remember it. Adapters are
+    instantiated once per process, unless the adapter class sets
+    `per_request = True`, in which case an instance is kept per request
+    (or, in absence of a request, a new instance is returned).
+    """
+    try:
+        adapter_class, adapter = adapters[path]
+    except KeyError:
+        adapter_class = import_attribute(path)
+        adapter = None
+        if not getattr(adapter_class, 'per_request', False):
+            adapter = adapter_class()
+        adapters[path] = (adapter_class, adapter)
+    if adapter is None:
+        if request is None:
+            return adapter_class()
+        request_adapters = request.__dict__.setdefault('_allauth_adapters',
+                                                       {})
+        adapter = request_adapters.get(path)
+        if adapter is None:
+            adapter = request_adapters[path] = adapter_class()
+    return adapter
+
+
 def import_callable(path_or_callable):
     if not hasattr(path_or_callable, '__call__'):
         ret = import_attribute(path_or_callable)
@@ -122,6 +282,45 @@ def import_callable(path_or_callable):
         ret = path_or_callable
     return ret
 
+
+class LazyView(object):
+    """
+    Stands in for the view at the given dotted path in URL patterns,
+    importing it when it is first called (or inspected, e.g. for
+    `csrf_exempt`). It hashes and compares by dotted path, so that
+    building the reverse map does not import the view. As a consequence,
+    such URLs are reversed by name, not by view callable.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__module__, self.__name__ = path.rsplit('.', 1)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == 'path':
+            raise AttributeError(name)
+        if name == 'view':
+            self.view = import_attribute(self.path)
+            return self.view
+        return getattr(self.view, name)
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyView):
+            return self.path == other.path
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, LazyView):
+            return self.path != other.path
+        return NotImplemented
+
+
 try:
     from django.contrib.auth import get_user_model
 except ImportError:
@@ -143,6 +342,73 @@ except ImportError:
         return user_model
 
 
+class UserModelInfo(object):
+    """
+    The details of the user model that allauth needs over and over
+    again, such as field max lengths and how to encode the primary key
+    in URLs, resolved once per user model (and username/e-mail field
+    setting), see `get_user_model_info()`.
+    """
+    PK_INT = 'int'
+    PK_STR = 'str'
+    PK_UUID = 'uuid'
+
+    def __init__(self, model, username_field, email_field):
+        self.model = model
+        self.username_field = username_field
+        self.email_field = email_field
+        self.max_lengths = dict((field.name, field.max_length)
+                                for field in model._meta.fields)
+        pk = model._meta.pk
+        if (hasattr(models, 'UUIDField')
+                and isinstance(pk, models.UUIDField)):
+            self.pk_type = self.PK_UUID
+        else:
+            try:
+                pk.to_python('a')
+                self.pk_type = self.PK_STR
+            except ValidationError:
+                self.pk_type = self.PK_INT
+
+    def has_field(self, name):
+        return name in self.max_lengths
+
+    def get_max_length(self, name):
+        return self.max_lengths.get(name)
+
+    @property
+    def username_max_length(self):
+        if self.username_field is None:
+            return 0
+        return self.max_lengths[self.username_field]
+
+    def pk_to_url_str(self, pk):
+        if self.pk_type == self.PK_UUID:
+            return pk.hex
+        if isinstance(pk, six.integer_types):
+            return int_to_base36(pk)
+        return str(pk)
+
+    def url_str_to_pk(self, s):
+        if self.pk_type == self.PK_INT:
+            return base36_to_int(s)
+        return s
+
+
+_user_model_infos = {}
+
+
+def get_user_model_info():
+    from .account import app_settings as account_settings
+    key = (get_user_model(),
+           account_settings.USER_MODEL_USERNAME_FIELD,
+           account_settings.USER_MODEL_EMAIL_FIELD)
+    info = _user_model_infos.get(key)
+    if info is None:
+        info = _user_model_infos[key] = UserModelInfo(*key)
+    return info
+
+
 def get_current_site(request=None):
     """Wrapper around ``Site.objects.get_current`` to handle ``Site`` lookups
     by request in Django >= 1.8.
@@ -173,6 +439,104 @@ def resolve_url(to):
     return to
 
 
+_json_encoder = DjangoJSONEncoder()
+
+
+def _encode_json(value):
+    """
+    Coerces `value` into JSON compatible types, the way encoding it
+    with `DjangoJSONEncoder` and decoding it again would.
+    """
+    if value is None or isinstance(value, (six.string_types,
+                                           bool,
+                                           float) + six.integer_types):
+        return value
+    if isinstance(value, dict):
+        return dict((k if isinstance(k, six.string_types) else
+                     json.dumps(k).strip('"'), _encode_json(v))
+                    for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_encode_json(v) for v in value]
+    return _encode_json(_json_encoder.default(value))
+
+
+def _encode_binary(value):
+    if value is None:
+        return None
+    return force_text(base64.b64encode(value))
+
+
+def _decode_binary(value):
+    return force_bytes(base64.b64decode(force_bytes(value)))
+
+
+class SerializerPlan(object):
+    """
+    Per model lookup tables of how to (de)serialize the values of the
+    model fields, so that serializing an instance is a single pass over
+    its `__dict__`. See `get_serializer_plan()`.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        # Maps the keys as found in `instance.__dict__` (attname).
+        self.encoders = {}
+        # Maps both field names and attnames, as either may be passed
+        # to `deserialize()`.
+        self.decoders = {}
+        # Fields whose values are managed by a descriptor (e.g. decoded
+        # lazily) are read through it rather than from `__dict__`.
+        self.descriptor_fields = set()
+        for field in model._meta.fields:
+            if hasattr(getattr(model, field.attname, None), '__set__'):
+                self.descriptor_fields.add(field.attname)
+            decoder = None
+            if isinstance(field, DateTimeField):
+                decoder = dateparse.parse_datetime
+            elif isinstance(field, TimeField):
+                decoder = dateparse.parse_time
+            elif isinstance(field, DateField):
+                decoder = dateparse.parse_date
+            elif isinstance(field, BinaryField):
+                self.encoders[field.attname] = _encode_binary
+                decoder = _decode_binary
+            if decoder:
+                self.decoders[field.name] = decoder
+                self.decoders[field.attname] = decoder
+
+    def serialize(self, instance):
+        data = {}
+        encoders = self.encoders
+        for k, v in instance.__dict__.items():
+            if k.startswith('_') or callable(v):
+                continue
+            if k in self.descriptor_fields:
+                v = getattr(instance, k)
+            data[k] = encoders.get(k, _encode_json)(v)
+        return data
+
+    def deserialize(self, data):
+        ret = self.model()
+        decoders = self.decoders
+        for k, v in data.items():
+            if v is not None:
+                decoder = decoders.get(k)
+                if decoder:
+                    v = decoder(v)
+            setattr(ret, k, v)
+        return ret
+
+
+_serializer_plans = {}
+
+
+def get_serializer_plan(model):
+    plan = _serializer_plans.get(model)
+    if plan is None:
+        plan = _serializer_plans[model] = SerializerPlan(model)
+    return plan
+
+
 def serialize_instance(instance):
     """
     Since Django 1.6 items added to the session are no longer pickled,
@@ -181,39 +545,11 @@ def serialize_instance(instance):
     Django serialization, as these are models are not "complete" yet.
     Serialization will start complaining about missing relations et al.
     """
-    data = {}
-    for k, v in instance.__dict__.items():
-        if k.startswith('_') or callable(v):
-            continue
-        try:
-            if isinstance(instance._meta.get_field(k), BinaryField):
-                v = force_text(base64.b64encode(v))
-        except FieldDoesNotExist:
-            pass
-        data[k] = v
-    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+    return get_serializer_plan(type(instance)).serialize(instance)
 
 
 def deserialize_instance(model, data):
-    ret = model()
-    for k, v in data.items():
-        if v is not None:
-            try:
-                f = model._meta.get_field(k)
-                if isinstance(f, DateTimeField):
-                    v = dateparse.parse_datetime(v)
-                elif isinstance(f, TimeField):
-                    v = dateparse.parse_time(v)
-                elif isinstance(f, DateField):
-                    v = dateparse.parse_date(v)
-                elif isinstance(f, BinaryField):
-                    v = force_bytes(
-                        base64.b64decode(
-                            force_bytes(v)))
-            except FieldDoesNotExist:
-                pass
-        setattr(ret, k, v)
-    return ret
+    return get_serializer_plan(model).deserialize(data)
 
 
 def set_form_field_order(form, fields_order):
@@ -0,0 +1,65 @@
+"""
+Microbenchmark of app settings lookups, comparing the snapshot served
+by `SettingsSnapshotMixin._setting()` with resolving every lookup
+through `django.conf.settings` (as done when a dynamic
+`ALLAUTH_SETTING_GETTER` is configured).
+
+Run from the project root::
+
+    DJANGO_SETTINGS_MODULE=test_settings python benchmarks/app_settings.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_settings')
+
+import django  # noqa
+if hasattr(django, 'setup'):
+    django.setup()
+
+from django.conf import settings  # noqa
+from django.test.utils import override_settings  # noqa
+
+from allauth.account import app_settings  # noqa
+
+
+# Roughly the settings consulted while handling a login POST.
+NAMES = ['AUTHENTICATION_METHOD', 'UNIQUE_EMAIL', 'EMAIL_VERIFICATION',
+         'EMAIL_REQUIRED', 'USER_MODEL_USERNAME_FIELD',
+         'USER_MODEL_EMAIL_FIELD', 'ADAPTER', 'FORMS', 'RATE_LIMITS',
+         'SESSION_REMEMBER', 'LOGIN_ON_EMAIL_CONFIRMATION',
+         'USERNAME_REQUIRED'] * 4
+
+NUMBER = 10000
+
+
+def request():
+    for name in NAMES:
+        getattr(app_settings, name)
+
+
+def dynamic_getter(name, dflt):
+    return getattr(settings, name, dflt)
+
+
+dynamic_getter.dynamic = True
+
+
+def main():
+    cached = min(timeit.repeat(request, number=NUMBER, repeat=3))
+    with override_settings(ALLAUTH_SETTING_GETTER=dynamic_getter):
+        uncached = min(timeit.repeat(request, number=NUMBER, repeat=3))
+    print('%d lookups per request' % len(NAMES))
+    print('uncached: %.1f us/request' % (uncached / NUMBER * 1e6))
+    print('snapshot: %.1f us/request' % (cached / NUMBER * 1e6))
+    print('saving:   %.1f us/request (%.1fx)' % (
+        (uncached - cached) / NUMBER * 1e6, uncached / cached))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Runs the test suite against PostgreSQL, storing extra_data natively:
+
+    DJANGO_SETTINGS_MODULE=test_postgresql_settings \
+        python manage.py test allauth
+"""
+import os
+
+from test_settings import *  # noqa
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': os.environ.get('POSTGRES_DB', 'allauth'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', ''),
+        'PORT': os.environ.get('POSTGRES_PORT', ''),
+        'TEST': {
+            'SERIALIZE': False,
+        }
+    }
+}
+
+SOCIALACCOUNT_JSON_STORAGE = 'native'